@@ -5,6 +5,7 @@ Responsável por informar limites e processar solicitações.
 Versão refatorada usando LLM para conversação natural e empática.
 """
 
+from functools import partial
 from typing import Dict, Optional, Tuple
 from agents.base_agent import BaseAgent
 from tools.agent_tools import get_tools_for_agent
@@ -114,7 +115,13 @@ class CreditoAgentLLM(BaseAgent):
             self.novo_limite_solicitado = valor_detectado
 
             # Usa DataManager diretamente ao invés do tool
-            from tools.data_manager import DataManager
+            from tools.data_manager import (
+                UPDATE_APPLIED,
+                UPDATE_CONFLICT,
+                UPDATE_ERROR,
+                UPDATE_NOT_FOUND,
+                DataManager,
+            )
 
             # Valida que novo limite é maior que atual
             if valor_detectado <= self.cliente["limite_credito"]:
@@ -136,20 +143,31 @@ class CreditoAgentLLM(BaseAgent):
                         "limite_maximo_permitido": None
                     }
                 elif valor_detectado <= limite_maximo:
-                    # Aprovado
-                    DataManager.register_limit_request(
-                        cpf=self.cliente["cpf"],
-                        limite_atual=self.cliente["limite_credito"],
-                        novo_limite=valor_detectado,
-                        status="aprovado"
-                    )
-                    resultado = {
-                        "success": True,
-                        "status": "aprovado",
-                        "message": f"Solicitação APROVADA! Novo limite: R$ {valor_detectado:,.2f}",
-                        "limite_maximo_permitido": limite_maximo,
-                        "novo_limite": valor_detectado
-                    }
+                    # Aprovado: grava condicionado à versão lida do cliente,
+                    # revalidando se outra sessão o alterou nesse meio tempo
+                    limite_anterior = self.cliente["limite_credito"]
+                    gravacao = self._gravar_limite(valor_detectado, estado)
+                    if gravacao == UPDATE_APPLIED:
+                        DataManager.register_limit_request(
+                            cpf=self.cliente["cpf"],
+                            limite_atual=limite_anterior,
+                            novo_limite=valor_detectado,
+                            status="aprovado"
+                        )
+                        resultado = {
+                            "success": True,
+                            "status": "aprovado",
+                            "message": f"Solicitação APROVADA! Novo limite: R$ {valor_detectado:,.2f}",
+                            "limite_maximo_permitido": limite_maximo,
+                            "novo_limite": valor_detectado
+                        }
+                    else:
+                        resultado = {
+                            "success": False,
+                            "status": gravacao,
+                            "message": self._mensagem_falha_gravacao(gravacao, valor_detectado),
+                            "limite_maximo_permitido": None
+                        }
                 else:
                     # Rejeitado
                     DataManager.register_limit_request(
@@ -170,10 +188,15 @@ class CreditoAgentLLM(BaseAgent):
                     }
 
             if not resultado["success"]:
-                # Erro na validação
+                # Erro na validação ou na gravação
+                if resultado["status"] == UPDATE_CONFLICT:
+                    instrucao = "Explique ao cliente e peça que repita a solicitação em instantes."
+                elif resultado["status"] in (UPDATE_ERROR, UPDATE_NOT_FOUND):
+                    instrucao = "Peça desculpas ao cliente e peça que tente novamente mais tarde."
+                else:
+                    instrucao = "Explique ao cliente e peça um novo valor válido."
                 resposta = self.invoke(
-                    f"Erro ao processar: {resultado['message']}. "
-                    "Explique ao cliente e peça um novo valor válido.",
+                    f"Erro ao processar: {resultado['message']}. {instrucao}",
                     context=context
                 )
                 self.solicitacao_em_andamento = False
@@ -187,12 +210,6 @@ class CreditoAgentLLM(BaseAgent):
                 context["valor"] = valor_detectado
                 context["valor_solicitado"] = valor_detectado
 
-                # Atualiza limite no CSV
-                DataManager.update_client_limit(self.cliente["cpf"], valor_detectado)
-
-                # Atualiza limite no estado
-                estado["cliente_autenticado"]["limite_credito"] = valor_detectado
-
                 # IMPORTANTE: Redireciona para triagem após aprovação
                 estado["proximo_passo"] = "triagem"
                 estado["contexto_agente"]["agente_anterior"] = "triagem"
@@ -272,20 +289,31 @@ class CreditoAgentLLM(BaseAgent):
             if eh_opcao_2 or eh_aceitar_limite:
                 limite_maximo = estado["dados_temporarios"].get("limite_maximo_disponivel")
                 if limite_maximo:
-                    # Aprova com limite máximo
-                    from tools.data_manager import DataManager
+                    # Aprova com limite máximo, condicionado à versão lida do cliente
+                    from tools.data_manager import UPDATE_APPLIED, DataManager
+                    limite_anterior = self.cliente["limite_credito"]
+                    gravacao = self._gravar_limite(limite_maximo, estado)
+                    if gravacao != UPDATE_APPLIED:
+                        estado["dados_temporarios"]["pode_fazer_entrevista"] = False
+                        estado["dados_temporarios"]["limite_maximo_disponivel"] = None
+                        estado["proximo_passo"] = "triagem"
+                        estado["contexto_agente"]["agente_anterior"] = "triagem"
+                        estado["dados_temporarios"]["voltou_ao_menu"] = True  # Flag para evitar loop
+                        context["limite_atual"] = self.cliente["limite_credito"]
+                        resposta = self.invoke(
+                            f"{self._mensagem_falha_gravacao(gravacao, limite_maximo)} "
+                            "Explique ao cliente e informe que ele será redirecionado ao "
+                            "menu principal.",
+                            context=context
+                        )
+                        return resposta, estado
+
                     DataManager.register_limit_request(
                         cpf=self.cliente["cpf"],
-                        limite_atual=self.cliente["limite_credito"],
+                        limite_atual=limite_anterior,
                         novo_limite=limite_maximo,
                         status="aprovado"
                     )
-
-                    # Atualiza limite no CSV
-                    DataManager.update_client_limit(self.cliente["cpf"], limite_maximo)
-
-                    # Atualiza limite no estado
-                    estado["cliente_autenticado"]["limite_credito"] = limite_maximo
                     estado["dados_temporarios"]["pode_fazer_entrevista"] = False
                     estado["dados_temporarios"]["limite_maximo_disponivel"] = None
 
@@ -351,6 +379,70 @@ class CreditoAgentLLM(BaseAgent):
         resposta = self.invoke(mensagem_usuario, context=context)
         return resposta, estado
 
+    @staticmethod
+    def _limite_aprovavel(novo_limite: float, cliente: Dict) -> Optional[float]:
+        """
+        Revalida um aumento sobre os dados atuais do cliente.
+
+        Returns:
+            O novo limite, se ainda for um aumento permitido pelo score
+            atual; None caso contrário
+        """
+        from tools.data_manager import DataManager
+
+        if novo_limite <= cliente["limite_credito"]:
+            return None
+        limite_maximo = DataManager.get_limit_by_score(cliente["score_credito"])
+        if limite_maximo is None or novo_limite > limite_maximo:
+            return None
+        return novo_limite
+
+    def _gravar_limite(self, novo_limite: float, estado: EstadoConversacao) -> str:
+        """
+        Grava o novo limite condicionado à versão do cliente lida na sessão.
+
+        Se outra sessão alterou o cliente, o aumento é revalidado sobre os
+        dados atuais e regravado (DataManager.update_client_with_retry).
+        Os dados do cliente na sessão recebem os mais recentes lidos.
+
+        Returns:
+            Resultado de update_client_with_retry (UPDATE_APPLIED se o
+            limite foi gravado)
+        """
+        from tools.data_manager import DataManager
+
+        resultado, atualizado = DataManager.update_client_with_retry(
+            self.cliente["cpf"],
+            "limite_credito",
+            partial(self._limite_aprovavel, novo_limite),
+            cliente=self.cliente,
+        )
+        if atualizado is not None:
+            self.cliente.update(atualizado)
+            estado["cliente_autenticado"].update(atualizado)
+        return resultado
+
+    def _mensagem_falha_gravacao(self, resultado: str, novo_limite: float) -> str:
+        """Descreve por que o limite não foi gravado, conforme o resultado."""
+        from tools.data_manager import UPDATE_CONFLICT, UPDATE_DECLINED
+
+        if resultado == UPDATE_DECLINED:
+            return (
+                "O cadastro do cliente foi alterado em outra sessão e o limite de "
+                f"R$ {novo_limite:,.2f} não pode mais ser aprovado sobre os dados atuais "
+                f"(limite atual: R$ {self.cliente['limite_credito']:,.2f}, "
+                f"score: {self.cliente['score_credito']:.0f})."
+            )
+        if resultado == UPDATE_CONFLICT:
+            return (
+                "O cadastro do cliente está sendo alterado por outra sessão neste momento "
+                f"e o limite de R$ {novo_limite:,.2f} não pôde ser gravado; nada foi alterado."
+            )
+        return (
+            f"Erro ao gravar o limite de R$ {novo_limite:,.2f}; "
+            "nada foi alterado."
+        )
+
     def _extrair_valor(self, texto: str) -> Optional[float]:
         """
         Extrai valor monetário de um texto de forma rigorosa.
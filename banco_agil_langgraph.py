@@ -8,7 +8,8 @@ um grafo de estados com LangGraph para orquestração de agentes com LLM.
 
 from typing import Dict, Any, Literal
 from langgraph.graph import StateGraph, END
-from state import EstadoConversacao, criar_estado_inicial
+from state import EstadoConversacao, aplicar_alteracoes_cliente, criar_estado_inicial
+from tools.data_manager import DataManager
 from agents.triagem_agent_llm import TriagemAgentLLM
 from agents.credito_agent_llm import CreditoAgentLLM
 from agents.entrevista_credito_agent_llm import EntrevistaCreditoAgentLLM
@@ -45,6 +46,10 @@ class BancoAgilLangGraph:
         # Estado atual
         self.estado: EstadoConversacao = criar_estado_inicial()
 
+        # Alterações de clientes feitas por qualquer worker (ex: score
+        # atualizado na entrevista), aplicadas ao cliente da sessão
+        self._alteracoes = DataManager.subscribe_changes()
+
     def _criar_grafo(self) -> Any:
         """
         Cria o grafo de estados com LangGraph.
@@ -437,6 +442,9 @@ class BancoAgilLangGraph:
         # Atualiza mensagem atual
         self.estado["mensagem_atual"] = mensagem
 
+        # Sincroniza o cliente autenticado com alterações de outros workers
+        if self._alteracoes is not None:
+            aplicar_alteracoes_cliente(self.estado, self._alteracoes.poll())
 
         # Executa o grafo
         try:
@@ -60,6 +60,7 @@ class DadosCliente(TypedDict):
     data_nascimento: str
     limite_credito: float
     score_credito: float
+    versao: int  # Versão do registro, para gravações condicionadas
 
 
 # Estrutura de dados temporários para operações específicas
@@ -197,6 +198,45 @@ def autenticar_cliente(
     return estado
 
 
+def aplicar_alteracoes_cliente(
+    estado: EstadoConversacao,
+    eventos: List[Dict[str, Any]]
+) -> bool:
+    """
+    Aplica ao cliente autenticado as alterações publicadas no feed de
+    alterações de clientes (ex: score recalculado em outro worker).
+
+    O dicionário do cliente é atualizado no lugar, de modo que os agentes
+    que guardam uma referência a ele também veem os novos valores. Eventos
+    com versão igual ou anterior à do cliente (já refletidos, ou
+    publicados fora de ordem por outro worker) são ignorados, e os demais
+    avançam a versão do cliente junto com os campos.
+
+    Args:
+        estado: Estado atual da conversa
+        eventos: Eventos obtidos com ChangeSubscription.poll()
+
+    Returns:
+        True se algum evento se referia ao cliente autenticado
+    """
+    cliente = estado.get("cliente_autenticado")
+    if not cliente:
+        return False
+
+    alterado = False
+    for evento in eventos:
+        if evento["cpf"] != cliente["cpf"]:
+            continue
+        versao = evento.get("versao")
+        if versao is not None:
+            if versao <= cliente.get("versao", 0):
+                continue
+            cliente["versao"] = versao
+        cliente.update(evento["campos"])
+        alterado = True
+    return alterado
+
+
 def incrementar_tentativa_autenticacao(
     estado: EstadoConversacao
 ) -> EstadoConversacao:
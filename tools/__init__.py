@@ -1,6 +1,7 @@
 """Tools para o sistema bancário de agentes de IA."""
 
 from .data_manager import DataManager
+from .async_data_manager import AsyncDataManager
 from .score_calculator import ScoreCalculator
 from .currency_fetcher import CurrencyFetcher
 from .agent_tools import (
@@ -17,6 +18,7 @@ from .agent_tools import (
 
 __all__ = [
     "DataManager",
+    "AsyncDataManager",
     "ScoreCalculator",
     "CurrencyFetcher",
     "authenticate_client",
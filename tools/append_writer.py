@@ -0,0 +1,136 @@
+"""
+Escritor CSV append-only com buffer.
+Mantém o arquivo aberto, acumula linhas em memória e as grava em lote
+quando o buffer enche, quando o intervalo máximo expira ou na saída do
+processo.
+"""
+
+import atexit
+import csv
+import io
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from tools.file_lock import FileLock
+
+# Política de flush das solicitações de aumento de limite
+REQUESTS_FLUSH_ROWS = int(os.getenv("BANCO_REQUESTS_FLUSH_ROWS", "64"))
+REQUESTS_FLUSH_INTERVAL_MS = float(os.getenv("BANCO_REQUESTS_FLUSH_INTERVAL_MS", "1000"))
+
+
+class BufferedAppendWriter:
+    """Escritor de linhas CSV em lote sobre um arquivo mantido aberto."""
+
+    def __init__(
+        self,
+        filepath: Path,
+        fieldnames: List[str],
+        max_rows: int = REQUESTS_FLUSH_ROWS,
+        max_delay: float = REQUESTS_FLUSH_INTERVAL_MS / 1000
+    ):
+        self.filepath = Path(filepath)
+        self.fieldnames = fieldnames
+        self.max_rows = max(1, max_rows)
+        self.max_delay = max_delay
+
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(self.filepath)
+        self._buffer: List[Dict] = []
+        self._file = None
+        # Tamanho do arquivo (bytes) após a última gravação deste processo
+        self.size = 0
+        self._closed = False
+        self._wakeup = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+        atexit.register(self.close)
+
+    def _open(self):
+        """Abre o arquivo em modo append, escrevendo o cabeçalho se estiver vazio."""
+        if self._file is None:
+            self._file = open(self.filepath, "a", encoding="utf-8", newline="")
+            if self._file.tell() == 0:
+                writer = csv.DictWriter(self._file, fieldnames=self.fieldnames)
+                writer.writeheader()
+                self._file.flush()
+            self.size = self._file.tell()
+        return self._file
+
+    def append(self, row: Dict) -> None:
+        """
+        Adiciona uma linha ao buffer, gravando o lote se ele estiver cheio.
+
+        Args:
+            row: Linha com as chaves de fieldnames
+        """
+        with self._lock:
+            if self._closed:
+                raise ValueError(f"Escritor fechado: {self.filepath}")
+            self._buffer.append(row)
+            if len(self._buffer) >= self.max_rows:
+                self._flush_locked()
+            else:
+                self._ensure_flusher()
+
+    def flush(self) -> None:
+        """Grava imediatamente as linhas pendentes."""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        """Grava o buffer com uma única escrita. Requer self._lock."""
+        if not self._buffer:
+            return
+
+        data = io.StringIO()
+        writer = csv.DictWriter(data, fieldnames=self.fieldnames)
+        writer.writerows(self._buffer)
+
+        # O lock entre processos garante que o cabeçalho e cada lote sejam
+        # gravados inteiros, sem intercalar com outros processos
+        with self._file_lock:
+            f = self._open()
+            f.write(data.getvalue())
+            f.flush()
+            self.size = f.tell()
+        self._buffer = []
+
+    def _ensure_flusher(self) -> None:
+        """Inicia a thread que grava o buffer após max_delay. Requer self._lock."""
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        self._flusher = threading.Thread(
+            target=self._flush_periodically,
+            name=f"append-writer-{self.filepath.name}",
+            daemon=True,
+        )
+        self._flusher.start()
+
+    def _flush_periodically(self) -> None:
+        """Grava o buffer a cada max_delay segundos enquanto houver linhas."""
+        while not self._wakeup.wait(self.max_delay):
+            with self._lock:
+                try:
+                    self._flush_locked()
+                except Exception as e:
+                    print(f"Erro ao gravar {self.filepath.name}: {e}")
+                if not self._buffer:
+                    self._flusher = None
+                    return
+
+    def close(self) -> None:
+        """Grava as linhas pendentes e fecha o arquivo."""
+        self._wakeup.set()
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            try:
+                self._flush_locked()
+            finally:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+        atexit.unregister(self.close)
@@ -0,0 +1,350 @@
+"""
+Fachada assíncrona do DataManager para servidores baseados em asyncio.
+Cada operação é executada em um pool limitado de threads de I/O, de modo
+que o event loop nunca bloqueia em leitura ou escrita de arquivos. Um
+semáforo limita quantas operações ficam em andamento ao mesmo tempo e o
+cancelamento de uma chamada ainda na fila evita que ela seja executada.
+"""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+from tools.data_manager import VERSION_CONFLICT_RETRIES, DataManager
+from tools.storage import Statuses, Timestamp
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from tools.portfolio import PortfolioSnapshot
+
+# Threads do pool de I/O
+ASYNC_MAX_WORKERS = int(os.getenv("BANCO_ASYNC_MAX_WORKERS", "16"))
+
+# Operações em andamento ao mesmo tempo (as demais aguardam na fila)
+ASYNC_MAX_CONCURRENCY = int(os.getenv("BANCO_ASYNC_MAX_CONCURRENCY", "64"))
+
+# Itens buscados por vez nas iterações assíncronas
+ASYNC_ITER_BATCH = 1000
+
+T = TypeVar("T")
+
+
+class AsyncDataManager:
+    """Versões awaitable das operações do DataManager."""
+
+    def __init__(
+        self,
+        max_workers: int = ASYNC_MAX_WORKERS,
+        max_concurrency: int = ASYNC_MAX_CONCURRENCY
+    ):
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="banco-io"
+        )
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "AsyncDataManager":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Aguarda as operações em andamento e encerra o pool de I/O."""
+        await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self._executor.shutdown, wait=True)
+        )
+
+    def _limit(self) -> asyncio.Semaphore:
+        """Semáforo de concorrência, criado no event loop em uso."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Executa uma função bloqueante no pool de I/O.
+
+        Se a chamada for cancelada enquanto aguarda o semáforo, a função
+        não chega a ser executada; se for cancelada durante a execução, o
+        resultado é descartado (a operação em disco não é interrompida).
+        """
+        async with self._limit():
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, functools.partial(func, *args, **kwargs)
+            )
+
+    async def _iterate(self, iterator: Iterator[T]) -> AsyncIterator[T]:
+        """Consome um iterador bloqueante em lotes no pool de I/O."""
+
+        def proximo_lote() -> List[T]:
+            lote = []
+            for item in iterator:
+                lote.append(item)
+                if len(lote) >= ASYNC_ITER_BATCH:
+                    break
+            return lote
+
+        try:
+            while True:
+                lote = await self._run(proximo_lote)
+                if not lote:
+                    return
+                for item in lote:
+                    yield item
+        finally:
+            # Interrompido ou cancelado: fecha o arquivo/cursor do iterador
+            # (operação rápida, sem I/O bloqueante relevante)
+            fechar = getattr(iterator, "close", None)
+            if fechar is not None:
+                try:
+                    fechar()
+                except ValueError:
+                    # Lote ainda em execução no pool: o iterador é
+                    # finalizado pelo coletor quando o lote terminar
+                    pass
+
+    # ------------------------------------------------------------------
+    # Clientes
+    # ------------------------------------------------------------------
+
+    async def authenticate_client(self, cpf: str, data_nascimento: str) -> Optional[Dict]:
+        """Versão assíncrona de DataManager.authenticate_client."""
+        return await self._run(DataManager.authenticate_client, cpf, data_nascimento)
+
+    async def get_client_by_cpf(self, cpf: str) -> Optional[Dict]:
+        """Versão assíncrona de DataManager.get_client_by_cpf."""
+        return await self._run(DataManager.get_client_by_cpf, cpf)
+
+    async def iter_clients(self, fields: Optional[Sequence[str]] = None) -> AsyncIterator[Tuple]:
+        """Versão assíncrona de DataManager.iter_clients (lida em lotes)."""
+        async for cliente in self._iterate(DataManager.iter_clients(fields)):
+            yield cliente
+
+    async def update_client_score(
+        self,
+        cpf: str,
+        novo_score: float,
+        versao_esperada: Optional[int] = None
+    ) -> bool:
+        """Versão assíncrona de DataManager.update_client_score."""
+        return await self._run(DataManager.update_client_score, cpf, novo_score, versao_esperada)
+
+    async def update_client_limit(
+        self,
+        cpf: str,
+        novo_limite: float,
+        versao_esperada: Optional[int] = None
+    ) -> bool:
+        """Versão assíncrona de DataManager.update_client_limit."""
+        return await self._run(DataManager.update_client_limit, cpf, novo_limite, versao_esperada)
+
+    async def update_client_with_retry(
+        self,
+        cpf: str,
+        campo: str,
+        calcular: Callable[[Dict], Optional[float]],
+        cliente: Optional[Dict] = None,
+        tentativas: int = VERSION_CONFLICT_RETRIES
+    ) -> Tuple[str, Optional[Dict]]:
+        """
+        Versão assíncrona de DataManager.update_client_with_retry.
+        calcular é executado na thread de I/O, junto com as gravações.
+        """
+        return await self._run(
+            DataManager.update_client_with_retry, cpf, campo, calcular, cliente, tentativas
+        )
+
+    async def bulk_update(self, mapping: Mapping[str, Mapping[str, float]]) -> Optional[List[str]]:
+        """Versão assíncrona de DataManager.bulk_update."""
+        return await self._run(DataManager.bulk_update, mapping)
+
+    async def rescore_clients(
+        self,
+        funcao: Callable[["pd.DataFrame"], Mapping[str, Mapping[str, float]]],
+        fields: Optional[Sequence[str]] = None
+    ) -> Optional[int]:
+        """Versão assíncrona de DataManager.rescore_clients."""
+        return await self._run(DataManager.rescore_clients, funcao, fields)
+
+    async def compact_client_journal(self) -> int:
+        """Versão assíncrona de DataManager.compact_client_journal."""
+        return await self._run(DataManager.compact_client_journal)
+
+    # ------------------------------------------------------------------
+    # Política de crédito e carteira
+    # ------------------------------------------------------------------
+
+    async def get_limit_by_score(self, score: float, produto: Optional[str] = None) -> Optional[float]:
+        """Versão assíncrona de DataManager.get_limit_by_score."""
+        return await self._run(DataManager.get_limit_by_score, score, produto)
+
+    async def get_portfolio_snapshot(self) -> Optional["PortfolioSnapshot"]:
+        """Versão assíncrona de DataManager.get_portfolio_snapshot."""
+        return await self._run(DataManager.get_portfolio_snapshot)
+
+    async def get_exposure_by_score_band(self, produto: Optional[str] = None) -> Optional["pd.DataFrame"]:
+        """Versão assíncrona de DataManager.get_exposure_by_score_band."""
+        return await self._run(DataManager.get_exposure_by_score_band, produto)
+
+    # ------------------------------------------------------------------
+    # Solicitações de aumento de limite
+    # ------------------------------------------------------------------
+
+    async def register_limit_request(
+        self,
+        cpf: str,
+        limite_atual: float,
+        novo_limite: float,
+        status: str = "pendente"
+    ) -> bool:
+        """Versão assíncrona de DataManager.register_limit_request."""
+        return await self._run(
+            DataManager.register_limit_request, cpf, limite_atual, novo_limite, status
+        )
+
+    async def get_all_requests(self) -> List[Dict]:
+        """Versão assíncrona de DataManager.get_all_requests."""
+        return await self._run(DataManager.get_all_requests)
+
+    async def get_requests_by_period(self, inicio: Timestamp = None, fim: Timestamp = None) -> List[Dict]:
+        """Versão assíncrona de DataManager.get_requests_by_period."""
+        return await self._run(DataManager.get_requests_by_period, inicio, fim)
+
+    async def iter_requests(
+        self,
+        *,
+        cpf: Optional[str] = None,
+        status: Statuses = None,
+        inicio: Timestamp = None,
+        fim: Timestamp = None,
+        valor_min: Optional[float] = None,
+        valor_max: Optional[float] = None,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[Dict]:
+        """Versão assíncrona de DataManager.iter_requests (lida em lotes)."""
+        iterator = DataManager.iter_requests(
+            cpf=cpf,
+            status=status,
+            inicio=inicio,
+            fim=fim,
+            valor_min=valor_min,
+            valor_max=valor_max,
+            limit=limit,
+        )
+        async for solicitacao in self._iterate(iterator):
+            yield solicitacao
+
+
+    async def get_request_stats(self, faixa: Optional[str] = None) -> Optional[Dict]:
+        """Versão assíncrona de DataManager.get_request_stats."""
+        return await self._run(DataManager.get_request_stats, faixa)
+
+    async def get_request_stats_by_band(self) -> Dict[str, Dict]:
+        """Versão assíncrona de DataManager.get_request_stats_by_band."""
+        return await self._run(DataManager.get_request_stats_by_band)
+
+    async def get_request_volume_by_hour(
+        self,
+        inicio: Timestamp = None,
+        fim: Timestamp = None
+    ) -> Dict[str, int]:
+        """Versão assíncrona de DataManager.get_request_volume_by_hour."""
+        return await self._run(DataManager.get_request_volume_by_hour, inicio, fim)
+
+    async def verify_request_stats(self) -> Optional[bool]:
+        """Versão assíncrona de DataManager.verify_request_stats."""
+        return await self._run(DataManager.verify_request_stats)
+
+    async def rebuild_request_stats(self) -> bool:
+        """Versão assíncrona de DataManager.rebuild_request_stats."""
+        return await self._run(DataManager.rebuild_request_stats)
+
+    async def compact_request_log(self, retencao_dias: Optional[int] = None) -> int:
+        """Versão assíncrona de DataManager.compact_request_log."""
+        return await self._run(DataManager.compact_request_log, retencao_dias)
+
+    async def get_request_summaries(
+        self,
+        cpf: Optional[str] = None,
+        inicio: Timestamp = None,
+        fim: Timestamp = None
+    ) -> List[Dict]:
+        """Versão assíncrona de DataManager.get_request_summaries."""
+        return await self._run(DataManager.get_request_summaries, cpf, inicio, fim)
+
+
+if __name__ == "__main__":
+    # Mede o atraso do event loop durante 500 autenticações simultâneas,
+    # chamando o DataManager diretamente (bloqueante) e pela fachada
+    import statistics
+    import sys
+    import tempfile
+    import time
+    from pathlib import Path
+
+    from tools.csv_storage import CSVStorage
+
+    CONCORRENTES = 500
+    CLIENTES = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+    async def medir_atraso(parar: asyncio.Event, atrasos: List[float]) -> None:
+        """Acorda a cada 1 ms e registra quanto o loop demorou a responder."""
+        while not parar.is_set():
+            inicio = time.perf_counter()
+            await asyncio.sleep(0.001)
+            atrasos.append((time.perf_counter() - inicio - 0.001) * 1000)
+
+    async def autenticar_bloqueante(cpf: str) -> Optional[Dict]:
+        return DataManager.authenticate_client(cpf, "1990-01-01")
+
+    async def rodada(nome: str, autenticar: Callable, cpfs: List[str]) -> None:
+        # Base nova a cada rodada: o primeiro acesso carrega o índice do disco
+        DataManager.set_backend(CSVStorage(pasta))
+        atrasos: List[float] = []
+        parar = asyncio.Event()
+        medidor = asyncio.create_task(medir_atraso(parar, atrasos))
+        await asyncio.sleep(0.05)
+
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(*(autenticar(cpf) for cpf in cpfs))
+        total = time.perf_counter() - inicio
+
+        parar.set()
+        await medidor
+        ok = sum(1 for r in resultados if r)
+        print(
+            f"{nome:<11} {total * 1000:8.1f} ms | autenticados: {ok} | "
+            f"atraso do loop: p50 {statistics.median(atrasos):6.2f} ms, "
+            f"máx {max(atrasos):7.2f} ms"
+        )
+
+    async def main() -> None:
+        cpfs = [f"{i * (CLIENTES // CONCORRENTES):011d}" for i in range(CONCORRENTES)]
+        await rodada("Bloqueante:", autenticar_bloqueante, cpfs)
+        async with AsyncDataManager() as dados:
+            await rodada("Assíncrono:", lambda cpf: dados.authenticate_client(cpf, "1990-01-01"), cpfs)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pasta = Path(tmp)
+        with open(pasta / "clientes.csv", "w", encoding="utf-8") as f:
+            f.write("cpf,data_nascimento,nome,limite_credito,score_credito\n")
+            for i in range(CLIENTES):
+                f.write(f"{i:011d},1990-01-01,Cliente {i},5000.0,650.0\n")
+        asyncio.run(main())
@@ -0,0 +1,85 @@
+"""
+Escrita atômica de arquivos.
+O conteúdo é gravado em um arquivo temporário no mesmo diretório,
+sincronizado em disco e renomeado sobre o destino, de modo que leitores
+e falhas no meio da escrita nunca observam um arquivo truncado.
+"""
+
+import os
+import stat
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator
+
+# Permissão de arquivos novos: a mesma de open(), respeitando a umask do processo.
+# Lida uma única vez: os.umask altera a máscara e não é seguro entre threads
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+_NEW_FILE_MODE = 0o666 & ~_UMASK
+
+
+def fsync_directory(directory: Path) -> None:
+    """Sincroniza a entrada de diretório (necessário para o rename ser durável)."""
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_write(
+    filepath: Path,
+    mode: str = "w",
+    encoding: str = "utf-8",
+    fsync: bool = True,
+    **kwargs
+) -> Iterator[IO]:
+    """
+    Abre um arquivo temporário que substitui filepath ao fim do bloco.
+
+    Se o bloco lançar exceção, o destino permanece intacto e o
+    temporário é removido.
+
+    Args:
+        filepath: Arquivo de destino
+        mode: Modo de abertura ("w" ou "wb")
+        encoding: Codificação (ignorada em modo binário)
+        fsync: Se True, sincroniza o arquivo e o diretório em disco
+        **kwargs: Argumentos adicionais para open() (ex: newline="")
+
+    Yields:
+        Objeto de arquivo aberto para escrita
+    """
+    filepath = Path(filepath)
+    fd, tmp_name = tempfile.mkstemp(
+        dir=filepath.parent, prefix=f".{filepath.name}.", suffix=".tmp"
+    )
+    if "b" in mode:
+        encoding = None
+
+    try:
+        with os.fdopen(fd, mode, encoding=encoding, **kwargs) as f:
+            # mkstemp cria o arquivo com permissão 0600; preserva a do destino
+            # ou, para arquivos novos, usa a permissão padrão de open()
+            if filepath.exists():
+                os.chmod(tmp_name, stat.S_IMODE(os.stat(filepath).st_mode))
+            else:
+                os.chmod(tmp_name, _NEW_FILE_MODE)
+            yield f
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_name, filepath)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+
+    if fsync:
+        fsync_directory(filepath.parent)
@@ -0,0 +1,394 @@
+"""
+Snapshot binário de clientes.csv e score_limite.csv para partida rápida.
+
+O snapshot de clientes guarda registros de tamanho fixo, um heap com os
+nomes e uma tabela hash (endereçamento aberto) de CPF -> registro já
+pronta. Ele é aberto com um único mmap, sem interpretar nenhuma linha:
+cada consulta lê apenas o registro encontrado. O snapshot da política
+guarda as faixas de cada produto como números já convertidos.
+
+Cada snapshot registra tamanho, mtime e CRC32 do CSV de origem e é
+regenerado automaticamente quando o conteúdo do CSV muda.
+
+Formato (little-endian): cabeçalho SNAPSHOT_HEADER seguido das seções
+descritas em build_client_snapshot e build_policy_snapshot.
+"""
+
+import mmap
+import os
+import struct
+import tempfile
+import zlib
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from tools.atomic_file import atomic_write
+from tools.client_record import ClientRecord
+from tools.file_lock import FileLock
+from tools.mmap_scanner import ClientFileScanner
+
+# Usa snapshots binários na carga dos índices (true/false)
+SNAPSHOT_ENABLED = os.getenv("BANCO_BINARY_SNAPSHOT", "true").lower() in ("1", "true", "sim")
+
+# Tempo máximo (s) de espera enquanto outro processo gera o snapshot
+SNAPSHOT_BUILD_TIMEOUT_S = float(os.getenv("BANCO_SNAPSHOT_BUILD_TIMEOUT_S", "600"))
+
+SNAPSHOT_SUFFIX = ".snap"
+SNAPSHOT_MAGIC = b"BANCOSNP"
+SNAPSHOT_VERSION = 2
+
+TIPO_CLIENTES = 1
+TIPO_POLITICA = 2
+
+# magic, versão, tipo, crc32, tamanho e mtime (ns) do CSV de origem
+SNAPSHOT_HEADER = struct.Struct("<8sHHIQq")
+
+# Clientes: total de registros, capacidade da tabela hash e offsets das seções
+CLIENTES_HEADER = struct.Struct("<QQQQQ")
+
+# cpf, data de nascimento, limite, score, versão, offset e tamanho do nome no heap
+CPF_BYTES = 11
+DATA_BYTES = 10
+CLIENT_STRUCT = struct.Struct(f"<{CPF_BYTES}s{DATA_BYTES}sddQQH")
+
+# Política: produto, score mínimo, score máximo, limite máximo
+PRODUTO_BYTES = 32
+BAND_STRUCT = struct.Struct(f"<{PRODUTO_BYTES}sddd")
+
+# Ocupação máxima da tabela hash
+_CARGA_MAXIMA = 0.7
+
+_ENTRADA = struct.Struct("<I")
+
+
+def snapshot_path_for(csv_path: Path) -> Path:
+    """Caminho do snapshot binário de um CSV (ex: clientes.snap)."""
+    return csv_path.with_suffix(SNAPSHOT_SUFFIX)
+
+
+def file_crc32(path: Path) -> int:
+    """CRC32 do conteúdo de um arquivo, lido em blocos."""
+    crc = 0
+    with open(path, "rb") as f:
+        while True:
+            bloco = f.read(1024 * 1024)
+            if not bloco:
+                return crc
+            crc = zlib.crc32(bloco, crc)
+
+
+def _source_header(tipo: int, csv_path: Path) -> bytes:
+    """Cabeçalho comum com a identificação do CSV de origem."""
+    stat = os.stat(csv_path)
+    return SNAPSHOT_HEADER.pack(
+        SNAPSHOT_MAGIC, SNAPSHOT_VERSION, tipo,
+        file_crc32(csv_path), stat.st_size, stat.st_mtime_ns
+    )
+
+
+def _is_current(snap_path: Path, csv_path: Path, tipo: int) -> bool:
+    """
+    Verifica se o snapshot corresponde ao conteúdo atual do CSV.
+
+    Tamanho e mtime iguais bastam; se só o mtime mudou, o CRC32 decide
+    (e o cabeçalho é atualizado para evitar recalcular na próxima vez).
+    """
+    try:
+        with open(snap_path, "rb") as f:
+            dados = f.read(SNAPSHOT_HEADER.size)
+    except FileNotFoundError:
+        return False
+    if len(dados) < SNAPSHOT_HEADER.size:
+        return False
+
+    magic, versao, tipo_snap, crc, tamanho, mtime = SNAPSHOT_HEADER.unpack(dados)
+    if magic != SNAPSHOT_MAGIC or versao != SNAPSHOT_VERSION or tipo_snap != tipo:
+        return False
+
+    stat = os.stat(csv_path)
+    if stat.st_size != tamanho:
+        return False
+    if stat.st_mtime_ns == mtime:
+        return True
+    if file_crc32(csv_path) != crc:
+        return False
+
+    with open(snap_path, "r+b") as f:
+        f.write(SNAPSHOT_HEADER.pack(magic, versao, tipo, crc, tamanho, stat.st_mtime_ns))
+    return True
+
+
+def _ensure_snapshot(csv_path: Path, tipo: int, build) -> Path:
+    """Regenera o snapshot se estiver ausente ou desatualizado."""
+    snap_path = snapshot_path_for(csv_path)
+    if _is_current(snap_path, csv_path, tipo):
+        return snap_path
+
+    # Apenas um processo gera o snapshot; os demais aguardam e reaproveitam
+    with FileLock(snap_path, timeout=SNAPSHOT_BUILD_TIMEOUT_S):
+        if not _is_current(snap_path, csv_path, tipo):
+            build(csv_path, snap_path)
+    return snap_path
+
+
+# ----------------------------------------------------------------------
+# Clientes
+# ----------------------------------------------------------------------
+
+def build_client_snapshot(csv_path: Path, snap_path: Optional[Path] = None) -> Path:
+    """
+    Gera o snapshot binário de clientes.csv (sem aplicar o journal).
+
+    Seções após os cabeçalhos: registros (CLIENT_STRUCT), heap de nomes
+    em UTF-8 e tabela hash de uint32 (índice do registro + 1, 0 = vazio).
+
+    Args:
+        csv_path: Caminho de clientes.csv
+        snap_path: Destino (padrão: snapshot_path_for(csv_path))
+
+    Returns:
+        Caminho do snapshot gerado
+
+    Raises:
+        ValueError: Se algum CPF ou data não couber no formato fixo
+    """
+    snap_path = snap_path or snapshot_path_for(csv_path)
+    cabecalho = _source_header(TIPO_CLIENTES, csv_path)
+    inicio_registros = SNAPSHOT_HEADER.size + CLIENTES_HEADER.size
+
+    with atomic_write(snap_path, "wb") as f, tempfile.TemporaryFile() as heap:
+        f.write(b"\0" * inicio_registros)
+
+        total = 0
+        tamanho_heap = 0
+        campos = ["cpf", "data_nascimento", "nome", "limite_credito", "score_credito", "versao"]
+        for cpf, nascimento, nome, limite, score, versao in ClientFileScanner(
+            csv_path, apply_journal=False
+        ).scan(campos):
+            cpf_b = cpf.encode("ascii")
+            nascimento_b = nascimento.encode("ascii")
+            if len(cpf_b) != CPF_BYTES or len(nascimento_b) != DATA_BYTES:
+                raise ValueError(f"Registro fora do formato do snapshot: CPF {cpf!r}")
+            nome_b = nome.encode("utf-8")
+            f.write(CLIENT_STRUCT.pack(
+                cpf_b, nascimento_b, limite, score, versao, tamanho_heap, len(nome_b)
+            ))
+            heap.write(nome_b)
+            tamanho_heap += len(nome_b)
+            total += 1
+
+        inicio_heap = inicio_registros + total * CLIENT_STRUCT.size
+        heap.seek(0)
+        while True:
+            bloco = heap.read(1024 * 1024)
+            if not bloco:
+                break
+            f.write(bloco)
+        inicio_tabela = inicio_heap + tamanho_heap
+
+        capacidade = 8
+        while capacidade * _CARGA_MAXIMA < total:
+            capacidade *= 2
+        mascara = capacidade - 1
+        tabela = array("I", bytes(4 * capacidade))
+
+        # A tabela é montada relendo os CPFs já gravados, sem mantê-los em memória
+        f.flush()
+        if total:
+            with mmap.mmap(f.fileno(), inicio_heap, access=mmap.ACCESS_READ) as mm:
+                tamanho_registro = CLIENT_STRUCT.size
+                for i in range(total):
+                    pos = inicio_registros + i * tamanho_registro
+                    cpf_b = mm[pos:pos + CPF_BYTES]
+                    slot = zlib.crc32(cpf_b) & mascara
+                    while tabela[slot]:
+                        outro = inicio_registros + (tabela[slot] - 1) * tamanho_registro
+                        if mm[outro:outro + CPF_BYTES] == cpf_b:
+                            break  # CPF repetido: mantém a primeira ocorrência
+                        slot = (slot + 1) & mascara
+                    else:
+                        tabela[slot] = i + 1
+
+        f.seek(inicio_tabela)
+        f.write(tabela.tobytes())
+        f.seek(0)
+        f.write(cabecalho)
+        f.write(CLIENTES_HEADER.pack(total, capacidade, inicio_registros, inicio_heap, inicio_tabela))
+
+    return snap_path
+
+
+class ClientSnapshot:
+    """Snapshot binário de clientes aberto via mmap (somente leitura)."""
+
+    def __init__(self, snap_path: Path):
+        self.path = Path(snap_path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            self._total,
+            capacidade,
+            self._inicio_registros,
+            self._inicio_heap,
+            self._inicio_tabela,
+        ) = CLIENTES_HEADER.unpack_from(self._mm, SNAPSHOT_HEADER.size)
+        self._mascara = capacidade - 1
+
+    @classmethod
+    def open(cls, csv_path: Path) -> "ClientSnapshot":
+        """Abre o snapshot de clientes.csv, regenerando-o se necessário."""
+        return cls(_ensure_snapshot(Path(csv_path), TIPO_CLIENTES, build_client_snapshot))
+
+    def __len__(self) -> int:
+        return self._total
+
+    @property
+    def source_signature(self) -> Tuple[int, int]:
+        """(mtime em ns, tamanho) do CSV de origem, como em file_signature."""
+        *_, tamanho, mtime = SNAPSHOT_HEADER.unpack_from(self._mm, 0)
+        return mtime, tamanho
+
+    def get(self, cpf: str) -> Optional[ClientRecord]:
+        """
+        Busca um cliente pelo CPF na tabela hash, em O(1).
+
+        Args:
+            cpf: CPF do cliente
+
+        Returns:
+            ClientRecord ou None se não encontrado
+        """
+        cpf_b = cpf.encode("ascii", "replace")
+        if len(cpf_b) != CPF_BYTES:
+            return None
+
+        mm = self._mm
+        slot = zlib.crc32(cpf_b) & self._mascara
+        while True:
+            (indice,) = _ENTRADA.unpack_from(mm, self._inicio_tabela + 4 * slot)
+            if not indice:
+                return None
+            pos = self._inicio_registros + (indice - 1) * CLIENT_STRUCT.size
+            if mm[pos:pos + CPF_BYTES] == cpf_b:
+                _, nascimento, limite, score, versao, nome_pos, nome_len = CLIENT_STRUCT.unpack_from(mm, pos)
+                inicio_nome = self._inicio_heap + nome_pos
+                return ClientRecord(
+                    cpf,
+                    mm[inicio_nome:inicio_nome + nome_len].decode("utf-8"),
+                    limite,
+                    score,
+                    nascimento.decode("ascii"),
+                    versao,
+                )
+            slot = (slot + 1) & self._mascara
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+# ----------------------------------------------------------------------
+# Política de score x limite
+# ----------------------------------------------------------------------
+
+def build_policy_snapshot(csv_path: Path, snap_path: Optional[Path] = None) -> Path:
+    """
+    Gera o snapshot binário de score_limite.csv.
+
+    Seção após o cabeçalho: total de faixas (uint32) e as faixas
+    (BAND_STRUCT), já validadas e ordenadas por produto e score mínimo.
+
+    Args:
+        csv_path: Caminho de score_limite.csv
+        snap_path: Destino (padrão: snapshot_path_for(csv_path))
+
+    Returns:
+        Caminho do snapshot gerado
+    """
+    # Importação tardia: score_limit_index usa este módulo na carga
+    from tools.score_limit_index import read_policy_csv
+
+    snap_path = snap_path or snapshot_path_for(csv_path)
+    cabecalho = _source_header(TIPO_POLITICA, csv_path)
+    por_produto = read_policy_csv(csv_path)
+
+    with atomic_write(snap_path, "wb") as f:
+        f.write(cabecalho)
+        f.write(_ENTRADA.pack(sum(len(b.minimos) for b in por_produto.values())))
+        for produto in sorted(por_produto):
+            produto_b = produto.encode("utf-8")
+            if len(produto_b) > PRODUTO_BYTES:
+                raise ValueError(f"Nome de produto longo demais para o snapshot: {produto!r}")
+            for faixa in por_produto[produto].as_tuples():
+                f.write(BAND_STRUCT.pack(produto_b, *faixa))
+
+    return snap_path
+
+
+def load_policy_snapshot(csv_path: Path) -> Dict[str, List[Tuple[float, float, float]]]:
+    """
+    Carrega as faixas da política a partir do snapshot, regenerando-o se necessário.
+
+    Args:
+        csv_path: Caminho de score_limite.csv
+
+    Returns:
+        Dicionário {produto: [(score_minimo, score_maximo, limite_maximo), ...]}
+    """
+    snap_path = _ensure_snapshot(Path(csv_path), TIPO_POLITICA, build_policy_snapshot)
+    with open(snap_path, "rb") as f:
+        dados = f.read()
+
+    pos = SNAPSHOT_HEADER.size
+    (total,) = _ENTRADA.unpack_from(dados, pos)
+    pos += _ENTRADA.size
+
+    faixas: Dict[str, List[Tuple[float, float, float]]] = {}
+    for produto_b, score_min, score_max, limite in BAND_STRUCT.iter_unpack(
+        dados[pos:pos + total * BAND_STRUCT.size]
+    ):
+        produto = produto_b.rstrip(b"\0").decode("utf-8")
+        faixas.setdefault(produto, []).append((score_min, score_max, limite))
+    return faixas
+
+
+if __name__ == "__main__":
+    # Compara a partida a frio do índice de clientes: CSV interpretado linha
+    # a linha (dicionário de ClientRecord) x snapshot binário via mmap
+    import csv
+    import random
+    import sys
+    import time
+
+    TOTAL = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        arquivo = Path(tmp) / "clientes.csv"
+        with open(arquivo, "w", encoding="utf-8") as f:
+            f.write("cpf,data_nascimento,nome,limite_credito,score_credito\n")
+            for i in range(TOTAL):
+                f.write(f"{i:011d},19{50 + i % 50}-01-15,Cliente {i},{1000 + i % 90 * 500}.0,{i % 1000}.0\n")
+        amostra = [f"{random.randrange(TOTAL):011d}" for _ in range(1000)]
+
+        inicio = time.perf_counter()
+        with open(arquivo, "r", encoding="utf-8") as f:
+            indice = {row["cpf"]: ClientRecord.from_row(row) for row in csv.DictReader(f)}
+        tempo_csv = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        build_client_snapshot(arquivo)
+        tempo_build = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        snapshot = ClientSnapshot.open(arquivo)
+        tempo_snap = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        assert all(snapshot.get(cpf) == indice[cpf] for cpf in amostra)
+        tempo_busca = (time.perf_counter() - inicio) / len(amostra)
+        snapshot.close()
+
+        print(f"{TOTAL:,} clientes")
+        print(f"Partida via CSV:      {tempo_csv:8.3f}s")
+        print(f"Geração do snapshot:  {tempo_build:8.3f}s (uma vez por alteração do CSV)")
+        print(f"Partida via snapshot: {tempo_snap:8.3f}s (busca: {tempo_busca * 1e6:.1f} µs)")
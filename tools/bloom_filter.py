@@ -0,0 +1,254 @@
+"""
+Filtro de Bloom para rejeitar rapidamente CPFs inexistentes.
+Responde "certamente ausente" ou "possivelmente presente" em tempo
+constante, apenas em memória; a taxa de falsos positivos é escolhida na
+criação e determina o tamanho do filtro e o número de funções hash.
+KnownCpfFilter mantém o filtro sincronizado com o conjunto de CPFs da base
+e confere na engine toda resposta negativa antes de rejeitar um CPF.
+"""
+
+import hashlib
+import math
+import os
+import threading
+from typing import TYPE_CHECKING, Hashable, Iterable, Optional
+
+if TYPE_CHECKING:
+    from tools.storage import StorageBackend
+
+# Taxa de falsos positivos desejada para o filtro de CPFs
+BLOOM_FP_RATE = float(os.getenv("BANCO_BLOOM_FP_RATE", "0.01"))
+
+# Intervalo (s) entre verificações de mudança na base de clientes (em segundo plano)
+BLOOM_REFRESH_S = float(os.getenv("BANCO_BLOOM_REFRESH_S", "1"))
+
+# Assinatura inicial, diferente de qualquer assinatura de engine
+_NAO_VERIFICADO = object()
+
+
+class BloomFilter:
+    """Filtro de Bloom com hashing duplo sobre blake2b."""
+
+    __slots__ = ("num_bits", "num_hashes", "count", "_bits")
+
+    def __init__(self, capacity: int, fp_rate: float = BLOOM_FP_RATE):
+        """
+        Args:
+            capacity: Número de elementos esperado
+            fp_rate: Taxa de falsos positivos desejada (0 < fp_rate < 1)
+        """
+        if not 0 < fp_rate < 1:
+            raise ValueError(f"Taxa de falsos positivos inválida: {fp_rate}")
+        capacity = max(capacity, 1)
+        self.num_bits = max(8, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        """Posições dos bits do item (h1 + i * h2, técnica de Kirsch-Mitzenmacher)."""
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        m = self.num_bits
+        return ((h1 + i * h2) % m for i in range(self.num_hashes))
+
+    def add(self, item: str) -> None:
+        """Adiciona um item ao filtro."""
+        bits = self._bits
+        for pos in self._positions(item):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def update(self, items: Iterable[str]) -> None:
+        """Adiciona vários itens ao filtro."""
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def estimated_fp_rate(self) -> float:
+        """Taxa de falsos positivos esperada para a quantidade atual de itens."""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+
+class KnownCpfFilter:
+    """
+    Filtro de Bloom dos CPFs cadastrados na engine de armazenamento.
+
+    O filtro é montado em segundo plano, em uma única varredura dimensionada
+    pela estimativa de clientes da engine. A assinatura da engine
+    (clients_signature) muda apenas quando o conjunto de CPFs muda; uma
+    thread de vigilância a compara a cada refresh_interval segundos e,
+    quando ela muda, os CPFs ausentes são acrescentados ao filtro publicado,
+    que só é recriado se a base crescer além da capacidade.
+
+    CPFs presentes no filtro são respondidos em memória. Uma resposta
+    negativa só rejeita o CPF depois de conferir que a assinatura da
+    engine ainda é a do filtro; se mudou (clientes incluídos por outro
+    processo), o CPF segue para a engine e a vigilância é acordada.
+    Enquanto o filtro não está pronto, ou durante uma conferência
+    pendente, CPFs fora dele seguem para a engine, e os encontrados nela
+    entram no filtro na hora (confirm).
+    """
+
+    def __init__(
+        self,
+        fp_rate: float = BLOOM_FP_RATE,
+        refresh_interval: float = BLOOM_REFRESH_S
+    ):
+        self.fp_rate = fp_rate
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._filter: Optional[BloomFilter] = None
+        self._signature: Hashable = _NAO_VERIFICADO
+        # Assinatura nova ainda não conferida: negativas do filtro não valem
+        self._pendente = True
+        self._backend: Optional["StorageBackend"] = None
+        self._watcher: Optional[threading.Thread] = None
+        self._parar = threading.Event()
+        # Antecipa a próxima verificação da vigilância
+        self._acordar = threading.Event()
+
+    def might_exist(self, backend: "StorageBackend", cpf: str) -> bool:
+        """
+        Indica se o CPF pode existir na base. CPFs do filtro são
+        respondidos em memória; negativas conferem a assinatura da engine.
+
+        Args:
+            backend: Engine de armazenamento vigiada pelo filtro
+            cpf: CPF a verificar
+
+        Returns:
+            False se o CPF certamente não existe; True caso contrário
+        """
+        if backend is not self._backend:
+            self._watch(backend)
+
+        # Assinatura lida antes do filtro: a sincronização acrescenta os CPFs
+        # ao filtro antes de publicar a nova assinatura
+        signature = self._signature
+        filtro = self._filter
+        if filtro is None or self._pendente or cpf in filtro:
+            return True
+        return self._signature_changed(backend, signature)
+
+    def _signature_changed(self, backend: "StorageBackend", signature: Hashable) -> bool:
+        """
+        Confere se o conjunto de CPFs da engine mudou desde a assinatura do
+        filtro, acordando a vigilância nesse caso (ou em caso de erro).
+        """
+        try:
+            mudou = backend.clients_signature() != signature
+        except Exception as e:
+            print(f"Erro ao verificar a base de clientes: {e}")
+            mudou = True
+        if mudou:
+            self._acordar.set()
+        return mudou
+
+    def confirm(self, cpf: str) -> None:
+        """
+        Registra um CPF encontrado na engine. Durante uma conferência
+        pendente ele entra no filtro imediatamente, sem esperar a varredura.
+        """
+        if self._pendente:
+            self.add(cpf)
+
+    def add(self, cpf: str) -> None:
+        """Acrescenta um CPF incluído na base ao filtro publicado."""
+        with self._lock:
+            filtro = self._filter
+            if filtro is not None and cpf not in filtro:
+                filtro.add(cpf)
+
+    def _watch(self, backend: "StorageBackend") -> None:
+        """Inicia a vigilância da engine (uma thread por engine)."""
+        with self._lock:
+            if backend is self._backend:
+                return
+            self._backend = backend
+            parar = self._parar = threading.Event()
+            acordar = self._acordar = threading.Event()
+            self._watcher = threading.Thread(
+                target=self._run,
+                args=(backend, parar, acordar),
+                name="bloom-cpfs",
+                daemon=True,
+            )
+            self._watcher.start()
+
+    def _run(
+        self,
+        backend: "StorageBackend",
+        parar: threading.Event,
+        acordar: threading.Event
+    ) -> None:
+        """Confere a assinatura da base periodicamente (em segundo plano)."""
+        while not parar.is_set():
+            try:
+                signature = backend.clients_signature()
+            except Exception as e:
+                print(f"Erro ao verificar a base de clientes: {e}")
+                signature = self._signature
+            if signature is None:
+                # Engine sem assinatura: filtro desativado
+                return
+            if signature != self._signature:
+                with self._lock:
+                    if backend is not self._backend:
+                        return
+                    self._pendente = True
+                self._sync(backend, signature)
+            acordar.wait(self.refresh_interval)
+            acordar.clear()
+
+    def _build(self, backend: "StorageBackend") -> BloomFilter:
+        """Monta um filtro novo com os CPFs da engine em uma única varredura."""
+        estimativa = backend.estimate_client_count()
+        cpfs = (cpf for (cpf,) in backend.iter_clients(["cpf"]))
+        if estimativa is None:
+            cpfs = list(cpfs)
+            estimativa = len(cpfs)
+        filtro = BloomFilter(estimativa, self.fp_rate)
+        filtro.update(cpfs)
+        return filtro
+
+    def _sync(self, backend: "StorageBackend", signature: Hashable) -> None:
+        """Traz o filtro para a assinatura atual da base."""
+        try:
+            filtro = self._filter
+            if filtro is None:
+                filtro = self._build(backend)
+            else:
+                # Só inclusões mudam o conjunto de CPFs: acrescenta os novos
+                novos = [cpf for (cpf,) in backend.iter_clients(["cpf"]) if cpf not in filtro]
+                with self._lock:
+                    for cpf in novos:
+                        if cpf not in filtro:
+                            filtro.add(cpf)
+                if filtro.estimated_fp_rate() > 2 * self.fp_rate:
+                    filtro = self._build(backend)
+        except Exception as e:
+            print(f"Erro ao montar filtro de CPFs: {e}")
+            return
+
+        with self._lock:
+            if backend is not self._backend:
+                return
+            self._filter = filtro
+            self._signature = signature
+            self._pendente = False
+
+    def invalidate(self) -> None:
+        """Descarta o filtro; ele é remontado ao vigiar a próxima engine."""
+        with self._lock:
+            self._parar.set()
+            self._acordar.set()
+            self._backend = None
+            self._watcher = None
+            self._filter = None
+            self._signature = _NAO_VERIFICADO
+            self._pendente = True
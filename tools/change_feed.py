@@ -0,0 +1,177 @@
+"""
+Feed de alterações de clientes para invalidação de caches entre processos.
+Cada alteração feita pelo DataManager é anexada a um log append-only (uma
+linha JSON por evento) com número de sequência crescente. Assinantes
+acompanham o log a partir da sua última posição e recebem apenas os
+eventos novos, podendo invalidar com precisão os dados que mantêm em
+cache (ex: o cliente autenticado de uma sessão em outro worker).
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional
+
+from tools.file_lock import FileLock
+
+# Bytes lidos do fim do log para encontrar o último evento
+_TAIL_BLOCK = 4096
+
+
+def read_last_seq(path: Path) -> int:
+    """
+    Número de sequência do último evento completo do log.
+
+    Lê apenas o fim do arquivo, em blocos, até encontrar uma linha completa.
+
+    Returns:
+        Último número de sequência, ou 0 se o log estiver vazio
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return 0
+
+    with f:
+        fim = f.seek(0, os.SEEK_END)
+        bloco = _TAIL_BLOCK
+        while True:
+            inicio = max(0, fim - bloco)
+            f.seek(inicio)
+            dados = f.read(fim - inicio)
+            # Descarta uma última linha incompleta (escrita interrompida)
+            dados = dados[:dados.rfind(b"\n") + 1]
+            linhas = dados.splitlines()
+            if len(linhas) >= 2 or (linhas and inicio == 0):
+                return json.loads(linhas[-1])["seq"]
+            if inicio == 0:
+                return 0
+            bloco *= 2
+
+
+class ChangeSubscription:
+    """Posição de um assinante no feed de alterações."""
+
+    def __init__(self, path: Path, offset: int, seq: int):
+        self.path = path
+        self._offset = offset
+        # Último evento entregue ao assinante
+        self.seq = seq
+        self._lock = threading.Lock()
+
+    def poll(self, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Retorna os eventos publicados desde a última consulta.
+
+        Quando nada mudou, custa apenas um stat do arquivo.
+
+        Args:
+            limit: Número máximo de eventos (os demais ficam para a próxima)
+
+        Returns:
+            Eventos {"seq", "timestamp", "cpf", "campos"} (mais "versao", quando
+            conhecida) em ordem de sequência
+        """
+        with self._lock:
+            try:
+                tamanho = os.stat(self.path).st_size
+            except FileNotFoundError:
+                return []
+            if tamanho <= self._offset:
+                return []
+
+            eventos = []
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                for linha in f:
+                    if not linha.endswith(b"\n"):
+                        break  # Escrita em andamento; será lida depois
+                    self._offset += len(linha)
+                    evento = json.loads(linha)
+                    if evento["seq"] <= self.seq:
+                        continue
+                    self.seq = evento["seq"]
+                    eventos.append(evento)
+                    if limit is not None and len(eventos) >= limit:
+                        break
+            return eventos
+
+
+class ChangeFeed:
+    """Log append-only e numerado das alterações de clientes."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file_lock = FileLock(self.path)
+
+    def publish(
+        self,
+        alteracoes: Mapping[str, Mapping[str, float]],
+        versoes: Optional[Mapping[str, int]] = None
+    ) -> int:
+        """
+        Publica as alterações de um ou mais clientes (um evento por CPF).
+
+        Os números de sequência são atribuídos sob o lock entre processos,
+        de modo que são únicos e crescentes mesmo com vários workers.
+
+        Args:
+            alteracoes: Mapeamento {cpf: {campo: novo_valor}}
+            versoes: Versão do registro após cada alteração ({cpf: versao}),
+                incluída no evento quando conhecida
+
+        Returns:
+            Número de sequência do último evento publicado
+        """
+        if not alteracoes:
+            return read_last_seq(self.path)
+
+        timestamp = datetime.now().isoformat()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._file_lock:
+            seq = read_last_seq(self.path)
+            linhas = []
+            for cpf, campos in alteracoes.items():
+                seq += 1
+                evento = {"seq": seq, "timestamp": timestamp, "cpf": cpf, "campos": dict(campos)}
+                if versoes and versoes.get(cpf) is not None:
+                    evento["versao"] = versoes[cpf]
+                linhas.append(json.dumps(evento, ensure_ascii=False))
+            dados = ("\n".join(linhas) + "\n").encode("utf-8")
+
+            # Uma única escrita em modo append: leitores nunca veem eventos
+            # de lotes diferentes intercalados
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, dados)
+            finally:
+                os.close(fd)
+        return seq
+
+    def subscribe(self, desde: Optional[int] = None) -> ChangeSubscription:
+        """
+        Cria um assinante do feed.
+
+        Args:
+            desde: Último número de sequência já conhecido; os eventos
+                posteriores serão entregues. None assina apenas os eventos
+                publicados a partir de agora.
+
+        Returns:
+            ChangeSubscription posicionada conforme pedido
+        """
+        if desde is None:
+            with self._file_lock:
+                try:
+                    offset = os.stat(self.path).st_size
+                except FileNotFoundError:
+                    offset = 0
+                return ChangeSubscription(self.path, offset, read_last_seq(self.path))
+        # Lê desde o início e descarta os eventos já conhecidos
+        return ChangeSubscription(self.path, 0, desde)
+
+    def last_seq(self) -> int:
+        """Número de sequência do último evento publicado."""
+        return read_last_seq(self.path)
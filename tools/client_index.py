@@ -0,0 +1,368 @@
+"""
+Índice em memória da base de clientes (clientes.csv).
+Carrega o arquivo uma única vez por processo e só o relê quando a
+assinatura do arquivo (mtime + tamanho) muda. Atualizações registradas
+no journal são aplicadas incrementalmente sobre o arquivo base.
+Os clientes ficam em memória como ClientRecord (compactos e imutáveis).
+
+Com o snapshot binário habilitado, a base é consultada diretamente no
+snapshot mapeado em memória e apenas os clientes alterados pelo journal
+ficam no dicionário.
+
+O índice publica versões imutáveis (ClientVersion): cada leitura usa a
+versão atual inteira, e novas versões são montadas à parte (cópia na
+escrita) e publicadas com uma única atribuição. Quando o arquivo base é
+trocado (compactação ou atualização em lote), a nova versão é carregada
+em segundo plano enquanto os leitores continuam na anterior, sem esperar
+pela recarga.
+
+Uso (benchmark de latência de login durante uma atualização em lote):
+    python -m tools.client_index [clientes]
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from tools.binary_snapshot import SNAPSHOT_ENABLED, ClientSnapshot
+from tools.client_journal import JournalEntry, journal_path_for, open_base, read_journal
+from tools.client_record import CLIENT_RECORD_FIELDS, ClientRecord
+from tools.mmap_scanner import ClientFileScanner
+
+# Tentativas de carregar a base sem que ela seja trocada no meio da carga
+_LOAD_ATTEMPTS = 5
+
+
+def file_signature(filepath: Path) -> Tuple[int, int]:
+    """Retorna (mtime em ns, tamanho em bytes) do arquivo."""
+    stat = os.stat(filepath)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ClientVersion:
+    """
+    Versão publicada (imutável) da base: arquivo base mais o journal até
+    journal_offset.
+
+    Quem guarda a referência continua lendo a mesma versão, consistente,
+    enquanto outras são publicadas; a versão (e o mmap do snapshot, quando
+    nenhuma outra o usa) é liberada quando a última referência é solta.
+    """
+
+    __slots__ = ("numero", "filepath", "signature", "journal_offset", "_base", "_snapshot", "_alterados")
+
+    def __init__(
+        self,
+        filepath: Path,
+        signature: Tuple[int, int],
+        journal_offset: int,
+        base: Dict[str, ClientRecord],
+        snapshot: Optional[ClientSnapshot],
+        alterados: Dict[str, ClientRecord]
+    ):
+        # Atribuído na publicação (crescente por índice)
+        self.numero = 0
+        self.filepath = filepath
+        self.signature = signature
+        self.journal_offset = journal_offset
+        # Clientes do CSV (vazio com snapshot), nunca alterados após a carga
+        self._base = base
+        self._snapshot = snapshot
+        # Clientes alterados pelo journal; copiado a cada nova versão
+        self._alterados = alterados
+
+    def get_record(self, cpf: str) -> Optional[ClientRecord]:
+        """
+        Busca o registro (imutável) de um cliente pelo CPF em O(1).
+
+        Args:
+            cpf: CPF do cliente
+
+        Returns:
+            ClientRecord ou None se não encontrado
+        """
+        cliente = self._alterados.get(cpf)
+        if cliente is None:
+            cliente = self._base.get(cpf)
+        if cliente is None and self._snapshot is not None:
+            cliente = self._snapshot.get(cpf)
+        return cliente
+
+    @property
+    def client_count(self) -> int:
+        """Número de clientes da versão (o journal só altera clientes existentes)."""
+        return len(self._base) + (len(self._snapshot) if self._snapshot is not None else 0)
+
+    def get(self, cpf: str) -> Optional[Dict]:
+        """Busca um cliente pelo CPF; dicionário novo (formato dos agentes) ou None."""
+        cliente = self.get_record(cpf)
+        return cliente.to_dict() if cliente is not None else None
+
+    def advance(self, entries: List[JournalEntry], journal_offset: int) -> "ClientVersion":
+        """
+        Nova versão com registros do journal aplicados, sem alterar esta.
+
+        Apenas o dicionário de alterados é copiado; base e snapshot são
+        compartilhados entre as versões. Registros com versão já presente
+        no cliente (journal relido após uma compactação) são ignorados;
+        os sem versão (journals antigos) mantêm a versão do cliente.
+        """
+        alterados = dict(self._alterados)
+        for cpf, campo, valor, versao in entries:
+            cliente = alterados.get(cpf)
+            if cliente is None:
+                cliente = self.get_record(cpf)
+            if cliente is None or (versao and versao <= cliente.versao):
+                continue
+            alterados[cpf] = cliente.replace(**{campo: float(valor), "versao": versao or cliente.versao})
+        return ClientVersion(
+            self.filepath, self.signature, journal_offset,
+            self._base, self._snapshot, alterados,
+        )
+
+
+class ClientIndex:
+    """Índice CPF -> dados do cliente com invalidação por mtime/tamanho."""
+
+    def __init__(self):
+        # Publicação de versões (trecho curto; leituras não o usam)
+        self._lock = threading.Lock()
+        # Cargas completas da base, uma por vez
+        self._load_lock = threading.Lock()
+        self._loader_lock = threading.Lock()
+        self._loader: Optional[threading.Thread] = None
+        self._versao: Optional[ClientVersion] = None
+        self._numero = 0
+
+    @staticmethod
+    def _open_snapshot(filepath: Path) -> Optional[ClientSnapshot]:
+        """Abre o snapshot binário da base, ou None para carregar o CSV."""
+        if not SNAPSHOT_ENABLED:
+            return None
+        try:
+            return ClientSnapshot.open(filepath)
+        except (OSError, ValueError) as e:
+            print(f"Snapshot de clientes indisponível, lendo o CSV: {e}")
+            return None
+
+    @staticmethod
+    def _journal_size(filepath: Path) -> int:
+        """Tamanho atual do journal associado ao arquivo base."""
+        try:
+            return os.path.getsize(journal_path_for(filepath))
+        except FileNotFoundError:
+            return 0
+
+    def _load(self, filepath: Path) -> ClientVersion:
+        """
+        Relê o arquivo base e o journal inteiros em uma nova versão (ainda
+        não publicada). A carga é refeita se a base for trocada no meio.
+        """
+        for _ in range(_LOAD_ATTEMPTS):
+            f, entries, offset = open_base(filepath)
+            with f:
+                stat = os.fstat(f.fileno())
+            signature = stat.st_mtime_ns, stat.st_size
+
+            base: Dict[str, ClientRecord] = {}
+            snapshot = self._open_snapshot(filepath)
+            if snapshot is not None and snapshot.source_signature != signature:
+                continue  # Snapshot de outra versão da base
+            if snapshot is None:
+                # Varredura via mmap (sem pandas no caminho do login); o
+                # journal é aplicado abaixo
+                scanner = ClientFileScanner(filepath, apply_journal=False)
+                for campos in scanner.scan(CLIENT_RECORD_FIELDS):
+                    # Mantém a primeira ocorrência, como a varredura linear fazia
+                    if campos[0] and campos[0] not in base:
+                        base[campos[0]] = ClientRecord(*campos)
+                if file_signature(filepath) != signature:
+                    continue
+
+            vazia = ClientVersion(filepath, signature, 0, base, snapshot, {})
+            return vazia.advance(entries, offset)
+        raise RuntimeError(f"Base de clientes trocada durante a carga: {filepath}")
+
+    def _publish(self, versao: ClientVersion) -> ClientVersion:
+        """Publica uma versão carregada. Requer self._lock."""
+        self._numero += 1
+        versao.numero = self._numero
+        self._versao = versao
+        return versao
+
+    def _advance(self, filepath: Path) -> ClientVersion:
+        """Publica a versão atual acrescida dos registros novos do journal."""
+        with self._lock:
+            versao = self._versao
+            if versao is not None and versao.filepath == filepath:
+                entries, offset = read_journal(journal_path_for(filepath), versao.journal_offset)
+                if file_signature(filepath) != versao.signature:
+                    # Base trocada durante a leitura: o journal lido é de outra versão
+                    self._load_async(filepath)
+                    return versao
+                if offset == versao.journal_offset:
+                    return versao
+                return self._publish(versao.advance(entries, offset))
+        # Índice invalidado nesse meio tempo
+        return self.refresh(filepath)
+
+    def refresh(self, filepath: Path) -> ClientVersion:
+        """
+        Publica uma versão que reflete os arquivos atuais e a retorna,
+        aguardando a recarga se a base foi trocada.
+
+        Usado por quem escreve, para ler as próprias escritas; leitores
+        usam pin(), que nunca espera por uma recarga em andamento.
+        """
+        with self._load_lock:
+            versao = self._versao
+            if (
+                versao is None
+                or versao.filepath != filepath
+                or file_signature(filepath) != versao.signature
+                or self._journal_size(filepath) < versao.journal_offset
+            ):
+                nova = self._load(filepath)
+                with self._lock:
+                    versao = self._publish(nova)
+        if self._journal_size(filepath) > versao.journal_offset:
+            versao = self._advance(filepath)
+        return versao
+
+    @property
+    def loaded(self) -> bool:
+        """Indica se alguma versão já foi publicada."""
+        return self._versao is not None
+
+    def _load_async(self, filepath: Path) -> None:
+        """Dispara a recarga da base em uma thread de segundo plano, se ociosa."""
+        with self._loader_lock:
+            if self._loader is not None and self._loader.is_alive():
+                return
+            self._loader = threading.Thread(
+                target=self._refresh_safely,
+                args=(filepath,),
+                name="client-index-loader",
+                daemon=True,
+            )
+            self._loader.start()
+
+    def _refresh_safely(self, filepath: Path) -> None:
+        """Executa a recarga registrando falhas sem propagá-las."""
+        try:
+            self.refresh(filepath)
+        except Exception as e:
+            print(f"Erro ao recarregar índice de clientes: {e}")
+
+    def pin(self, filepath: Path) -> ClientVersion:
+        """
+        Retorna a versão atual da base para uma ou mais leituras consistentes.
+
+        Registros novos do journal são aplicados na hora (trecho curto). Se
+        o arquivo base foi trocado, a recarga é feita em segundo plano e a
+        versão anterior continua sendo servida até a nova ser publicada;
+        apenas a primeira carga é aguardada.
+
+        Args:
+            filepath: Caminho de clientes.csv
+
+        Returns:
+            ClientVersion imutável
+        """
+        versao = self._versao
+        if versao is None or versao.filepath != filepath:
+            return self.refresh(filepath)
+
+        journal_size = self._journal_size(filepath)
+        if file_signature(filepath) != versao.signature or journal_size < versao.journal_offset:
+            # Base trocada ou journal compactado: recarga sem bloquear leitores
+            self._load_async(filepath)
+            return versao
+        if journal_size > versao.journal_offset:
+            return self._advance(filepath)
+        return versao
+
+    def get_record(self, filepath: Path, cpf: str) -> Optional[ClientRecord]:
+        """
+        Busca o registro (imutável) de um cliente pelo CPF em O(1).
+
+        Args:
+            filepath: Caminho de clientes.csv
+            cpf: CPF do cliente
+
+        Returns:
+            ClientRecord ou None se não encontrado
+        """
+        return self.pin(filepath).get_record(cpf)
+
+    def get(self, filepath: Path, cpf: str) -> Optional[Dict]:
+        """
+        Busca um cliente pelo CPF em O(1).
+
+        Args:
+            filepath: Caminho de clientes.csv
+            cpf: CPF do cliente
+
+        Returns:
+            Dicionário novo do cliente (formato dos agentes) ou None
+        """
+        return self.pin(filepath).get(cpf)
+
+    def invalidate(self) -> None:
+        """Força a reconstrução do índice no próximo acesso."""
+        with self._lock:
+            self._versao = None
+
+
+if __name__ == "__main__":
+    # Latência de authenticate_client em uma thread enquanto outra grava
+    # uma atualização em lote de 10% da base
+    import random
+    import sys
+    import tempfile
+    import time
+    from datetime import date
+
+    from tools.csv_storage import CSVStorage
+    from tools.generate_synthetic_data import generate
+
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generate(Path(tmp), total, 0, dias=1, data_final=date.today())
+        backend = CSVStorage(Path(tmp))
+        clientes = list(backend.iter_clients(["cpf", "data_nascimento"]))
+        backend.authenticate_client(*clientes[0])
+
+        latencias: List[float] = []
+        parar = threading.Event()
+
+        def logins() -> None:
+            sorteio = random.Random(0)
+            while not parar.is_set():
+                cpf, nascimento = sorteio.choice(clientes)
+                inicio = time.perf_counter()
+                backend.authenticate_client(cpf, nascimento)
+                latencias.append(time.perf_counter() - inicio)
+                time.sleep(0.0005)
+
+        leitor = threading.Thread(target=logins)
+        leitor.start()
+        time.sleep(0.3)
+        lote = {cpf: {"score_credito": 500.0} for cpf, _ in clientes[::10]}
+        inicio = time.perf_counter()
+        backend.bulk_update(lote)
+        duracao = time.perf_counter() - inicio
+        time.sleep(0.5)
+        parar.set()
+        leitor.join()
+        backend.close()
+
+    latencias.sort()
+    ms = [1000 * latencias[min(len(latencias) - 1, int(p * len(latencias)))] for p in (0.5, 0.99)]
+    print(f"Lote de {len(lote):,} clientes gravado em {duracao:.2f}s")
+    print(
+        f"{len(latencias):,} logins: p50 {ms[0]:.3f}ms  p99 {ms[1]:.3f}ms  "
+        f"máximo {1000 * latencias[-1]:.1f}ms"
+    )
@@ -0,0 +1,607 @@
+"""
+Journal de atualizações da base de clientes.
+Atualizações de score e limite são anexadas como registros pequenos
+(cpf, campo, valor, timestamp, versao) em vez de reescrever clientes.csv
+inteiro. Atualizações simultâneas são agrupadas em uma única escrita
+(group commit) e uma compactação em segundo plano incorpora o journal ao
+arquivo base.
+
+Cada registro gravado leva a nova versão do cliente; a escrita pode ser
+condicionada à versão lida (controle otimista), conferida sob o mesmo
+lock que já serializa os lotes.
+
+Uso (teste de carga: processos atualizando CPFs distintos enquanto o
+journal é compactado):
+    python -m tools.client_journal [processos] [atualizacoes_por_processo]
+"""
+
+import csv
+import io
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, List, Mapping, Optional, Set, Tuple
+
+from tools.atomic_file import atomic_write
+from tools.file_lock import FileLock
+from tools.storage import CLIENT_FIELDNAMES, VERSION_FIELD, VersionConflictError
+
+# versao: versão do cliente após o registro (0 em journals antigos)
+JOURNAL_FIELDNAMES = ["cpf", "campo", "valor", "timestamp", VERSION_FIELD]
+
+# Campos de clientes.csv que podem ser alterados via journal
+CAMPOS_ATUALIZAVEIS = ("limite_credito", "score_credito")
+
+# Tamanho do journal (bytes) a partir do qual a compactação é disparada
+JOURNAL_MAX_BYTES = int(os.getenv("BANCO_JOURNAL_MAX_BYTES", str(1024 * 1024)))
+
+# Política de flush do group commit
+FLUSH_MAX_DELAY_MS = float(os.getenv("BANCO_FLUSH_MAX_DELAY_MS", "5"))
+FLUSH_MAX_BATCH = int(os.getenv("BANCO_FLUSH_MAX_BATCH", "256"))
+FLUSH_FSYNC = os.getenv("BANCO_FLUSH_FSYNC", "true").lower() in ("1", "true", "sim")
+
+# Tentativas de abrir a base e o journal na mesma versão (ver open_base)
+_OPEN_ATTEMPTS = 5
+
+JournalEntry = Tuple[str, str, str, int]
+
+# Versão atual de um cliente (None se não existir); usada sob o lock da base
+VersionSource = Callable[[str], Optional[int]]
+
+
+def journal_path_for(base_path: Path) -> Path:
+    """Retorna o caminho do journal associado a um arquivo base."""
+    return base_path.with_name(f"{base_path.stem}_journal.csv")
+
+
+def retired_marker_for(base_path: Path) -> Path:
+    """Marcador de arquivo base aposentado por um reparticionamento da base."""
+    return base_path.with_name(base_path.name + ".retired")
+
+
+class RetiredBaseError(RuntimeError):
+    """Escrita em um arquivo base substituído por outro conjunto de shards."""
+
+
+def read_journal(journal_path: Path, offset: int = 0) -> Tuple[List[JournalEntry], int]:
+    """
+    Lê registros do journal a partir de um deslocamento em bytes.
+
+    Apenas linhas completas são consumidas, de modo que uma escrita em
+    andamento nunca é lida pela metade.
+
+    Args:
+        journal_path: Caminho do journal
+        offset: Posição (bytes) a partir da qual ler
+
+    Returns:
+        Tupla (lista de (cpf, campo, valor, versao), nova posição em bytes)
+    """
+    if not journal_path.exists():
+        return [], 0
+
+    with open(journal_path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+
+    fim = data.rfind(b"\n") + 1
+    if fim == 0:
+        return [], offset
+
+    entries = []
+    reader = csv.reader(io.StringIO(data[:fim].decode("utf-8")))
+    for row in reader:
+        if len(row) < 3 or row == JOURNAL_FIELDNAMES:
+            continue
+        cpf, campo, valor = row[0], row[1], row[2]
+        versao = int(row[4]) if len(row) > 4 and row[4] else 0
+        if campo in CAMPOS_ATUALIZAVEIS:
+            entries.append((cpf, campo, valor, versao))
+    return entries, offset + fim
+
+
+def open_base(base_path: Path) -> Tuple[BinaryIO, List[JournalEntry], int]:
+    """
+    Abre o arquivo base junto com o journal da mesma versão.
+
+    O journal é lido depois da abertura e a leitura só é aceita se o
+    caminho ainda apontar para o arquivo aberto; se uma compactação ou
+    atualização em lote trocou o arquivo (rename) no meio do caminho, a
+    abertura é refeita. Registros do journal já incorporados ao arquivo
+    aberto podem ser relidos, o que é idempotente.
+
+    Args:
+        base_path: Caminho de clientes.csv
+
+    Returns:
+        Tupla (arquivo base aberto em modo binário, registros do journal,
+        posição lida do journal)
+
+    Raises:
+        RuntimeError: Se a base for trocada em todas as tentativas
+    """
+    for _ in range(_OPEN_ATTEMPTS):
+        f = open(base_path, "rb")
+        try:
+            entries, offset = read_journal(journal_path_for(base_path))
+            if os.fstat(f.fileno()).st_ino == os.stat(base_path).st_ino:
+                return f, entries, offset
+        except BaseException:
+            f.close()
+            raise
+        f.close()
+    raise RuntimeError(f"Arquivo base trocado durante a leitura: {base_path}")
+
+
+def pending_updates(entries: List[JournalEntry]) -> Dict[str, Dict[str, str]]:
+    """
+    Consolida registros do journal no último valor de cada campo por CPF.
+
+    Args:
+        entries: Registros lidos com read_journal
+
+    Returns:
+        Dicionário {cpf: {campo: valor}} com os valores mais recentes,
+        incluindo "versao" quando os registros a informam
+    """
+    pendentes: Dict[str, Dict[str, str]] = {}
+    for cpf, campo, valor, versao in entries:
+        campos = pendentes.setdefault(cpf, {})
+        campos[campo] = valor
+        if versao:
+            campos[VERSION_FIELD] = str(versao)
+    return pendentes
+
+
+def normalize_updates(
+    atualizacoes: Mapping[str, Mapping[str, float]]
+) -> Dict[str, Dict[str, float]]:
+    """
+    Valida e normaliza um lote de atualizações de clientes.
+
+    Args:
+        atualizacoes: Mapeamento {cpf: {campo: valor}} com campos de
+            CAMPOS_ATUALIZAVEIS
+
+    Returns:
+        Cópia do lote com os valores convertidos para float
+
+    Raises:
+        ValueError: Se algum campo não for atualizável ou algum valor
+            não for numérico
+    """
+    normalizadas: Dict[str, Dict[str, float]] = {}
+    for cpf, campos in atualizacoes.items():
+        invalidos = set(campos) - set(CAMPOS_ATUALIZAVEIS)
+        if invalidos:
+            raise ValueError(f"Campos não atualizáveis para {cpf}: {sorted(invalidos)}")
+        normalizadas[cpf] = {campo: float(valor) for campo, valor in campos.items()}
+    return normalizadas
+
+
+class _Ticket:
+    """Registro aguardando commit; recebe a versão gravada ou o erro da escrita."""
+
+    __slots__ = ("row", "versao_esperada", "versao_atual", "versao", "error")
+
+    def __init__(
+        self,
+        row: List[str],
+        versao_esperada: Optional[int],
+        versao_atual: Optional[VersionSource]
+    ):
+        self.row = row
+        self.versao_esperada = versao_esperada
+        self.versao_atual = versao_atual
+        self.versao: Optional[int] = None
+        self.error: Optional[BaseException] = None
+
+
+class ClientJournal:
+    """
+    Journal append-only das atualizações de clientes com group commit.
+
+    A primeira atualização de uma janela vira líder: espera até max_delay
+    segundos (ou até max_batch registros) e grava todos os registros
+    pendentes com uma única escrita e um único fsync. As demais apenas
+    aguardam o commit do lote em que entraram.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = JOURNAL_MAX_BYTES,
+        max_delay: float = FLUSH_MAX_DELAY_MS / 1000,
+        max_batch: int = FLUSH_MAX_BATCH,
+        fsync: bool = FLUSH_FSYNC
+    ):
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.max_batch = max(1, max_batch)
+        self.fsync = fsync
+        self._file_locks: Dict[Path, FileLock] = {}
+        self._compactor_lock = threading.Lock()
+        self._compactor = None
+
+        self._cond = threading.Condition()
+        self._pending: List[_Ticket] = []
+        self._leader_active = False
+        self._batch_seq = 0
+        self._committed_seq = 0
+
+    def append(
+        self,
+        base_path: Path,
+        cpf: str,
+        campo: str,
+        valor: float,
+        versao_atual: Optional[VersionSource] = None,
+        versao_esperada: Optional[int] = None
+    ) -> Optional[int]:
+        """
+        Anexa uma atualização ao journal em O(1).
+
+        Retorna apenas depois que o lote contendo a atualização foi gravado
+        (e sincronizado em disco, se fsync estiver habilitado). A versão do
+        cliente é resolvida e conferida no momento da gravação, sob o lock
+        do arquivo base, e não na entrada na fila.
+
+        Args:
+            base_path: Caminho de clientes.csv
+            cpf: CPF do cliente
+            campo: Campo alterado ("score_credito" ou "limite_credito")
+            valor: Novo valor do campo
+            versao_atual: Consulta a versão atual do cliente; sem ela o
+                registro é gravado sem versão (0)
+            versao_esperada: Grava apenas se o cliente estiver nesta versão
+
+        Returns:
+            Versão gravada, ou None se o cliente não existe ou o registro
+            foi gravado sem versão
+
+        Raises:
+            VersionConflictError: Se o cliente não estiver em versao_esperada
+        """
+        if campo not in CAMPOS_ATUALIZAVEIS:
+            raise ValueError(f"Campo não atualizável: {campo}")
+
+        ticket = _Ticket(
+            [cpf, campo, str(valor), datetime.now().isoformat()],
+            versao_esperada,
+            versao_atual,
+        )
+        with self._cond:
+            self._pending.append(ticket)
+            batch_id = self._batch_seq
+            leader = not self._leader_active
+            if leader:
+                self._leader_active = True
+            elif len(self._pending) >= self.max_batch:
+                self._cond.notify_all()
+
+            if not leader:
+                while self._committed_seq <= batch_id:
+                    self._cond.wait()
+                if ticket.error is not None:
+                    raise ticket.error
+                return ticket.versao
+
+            # Líder: aguarda a janela de agrupamento ou o lote encher
+            deadline = time.monotonic() + self.max_delay
+            while len(self._pending) < self.max_batch:
+                restante = deadline - time.monotonic()
+                if restante <= 0:
+                    break
+                self._cond.wait(restante)
+
+            batch, self._pending = self._pending, []
+            self._batch_seq += 1
+            self._leader_active = False
+
+            # Preserva a ordem dos lotes no arquivo
+            while self._committed_seq < batch_id:
+                self._cond.wait()
+
+        tamanho = 0
+        error = None
+        try:
+            tamanho = self._write_batch(base_path, batch)
+        except BaseException as e:
+            error = e
+
+        with self._cond:
+            if error is not None:
+                for t in batch:
+                    t.error = error
+            self._committed_seq = batch_id + 1
+            self._cond.notify_all()
+
+        if ticket.error is not None:
+            raise ticket.error
+        if tamanho >= self.max_bytes:
+            self.compact_async(base_path)
+        return ticket.versao
+
+    def _lock_for(self, base_path: Path) -> FileLock:
+        """
+        Retorna o lock entre processos do arquivo base.
+
+        O mesmo lock protege a escrita no journal e a compactação, de modo
+        que nenhum registro anexado por outro processo se perde quando o
+        journal é esvaziado.
+        """
+        with self._compactor_lock:
+            lock = self._file_locks.get(base_path)
+            if lock is None:
+                lock = self._file_locks[base_path] = FileLock(base_path)
+            return lock
+
+    @staticmethod
+    def _check_active(base_path: Path) -> None:
+        """
+        Recusa escritas em um arquivo base aposentado. Requer o lock do
+        arquivo base, sob o qual o marcador é criado.
+
+        Raises:
+            RetiredBaseError: Se a base foi reparticionada
+        """
+        if retired_marker_for(base_path).exists():
+            raise RetiredBaseError(f"Arquivo base reparticionado: {base_path}")
+
+    @staticmethod
+    def _versioned_rows(tickets: List[_Ticket]) -> List[List[str]]:
+        """
+        Atribui as versões do lote e descarta registros recusados.
+
+        A versão atual de cada CPF é consultada uma vez por lote e encadeada
+        entre os registros do mesmo CPF, na ordem de chegada. Registros de
+        clientes inexistentes são descartados; os de versão divergente
+        recebem VersionConflictError. Requer o lock do arquivo base.
+        """
+        atuais: Dict[str, Optional[int]] = {}
+        rows = []
+        for t in tickets:
+            if t.versao_atual is None:
+                rows.append(t.row + ["0"])
+                continue
+            cpf = t.row[0]
+            if cpf not in atuais:
+                atuais[cpf] = t.versao_atual(cpf)
+            atual = atuais[cpf]
+            if atual is None:
+                continue
+            if t.versao_esperada is not None and t.versao_esperada != atual:
+                t.error = VersionConflictError(cpf, t.versao_esperada, atual)
+                continue
+            t.versao = atuais[cpf] = atual + 1
+            rows.append(t.row + [str(t.versao)])
+        return rows
+
+    def _write_batch(self, base_path: Path, tickets: List[_Ticket]) -> int:
+        """Grava um lote de registros no journal e retorna o novo tamanho."""
+        journal_path = journal_path_for(base_path)
+        with self._lock_for(base_path):
+            self._check_active(base_path)
+            rows = self._versioned_rows(tickets)
+            with open(journal_path, "a", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                if f.tell() == 0:
+                    writer.writerow(JOURNAL_FIELDNAMES)
+                writer.writerows(rows)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+                return f.tell()
+
+    def _rewrite_base(self, base_path: Path, alteracoes: Dict[str, Dict]) -> Set[str]:
+        """
+        Reescreve o arquivo base aplicando as alterações em uma única passada.
+
+        O arquivo é gravado em um temporário sincronizado e renomeado sobre
+        o original; linhas não alteradas são copiadas sem conversão. Cada
+        cliente alterado avança uma versão, ou assume a versão informada
+        na alteração (registros do journal) se ela for mais nova que a da
+        base. Requer o lock do arquivo base.
+
+        Returns:
+            CPFs do arquivo base que receberam alterações
+        """
+        encontrados: Set[str] = set()
+        with open(base_path, "r", encoding="utf-8", newline="") as src, \
+                atomic_write(base_path, newline="", fsync=self.fsync) as dst:
+            cabecalho = next(csv.reader([src.readline()]))
+            colunas = {campo: i for i, campo in enumerate(cabecalho)}
+            i_cpf = colunas["cpf"]
+            writer = csv.writer(dst, lineterminator="\n")
+            writer.writerow(CLIENT_FIELDNAMES)
+            mesma_ordem = cabecalho == CLIENT_FIELDNAMES
+
+            for line in src:
+                if not line.strip():
+                    continue
+                if i_cpf == 0 and '"' not in line:
+                    cpf = line[:line.find(",")]
+                else:
+                    valores = next(csv.reader([line]), [])
+                    cpf = valores[i_cpf] if len(valores) > i_cpf else ""
+
+                alteracao = alteracoes.get(cpf)
+                if alteracao is None and mesma_ordem:
+                    dst.write(line if line.endswith("\n") else line + "\n")
+                    continue
+
+                valores = next(csv.reader([line]), [])
+                if not valores:
+                    continue
+                row = dict(zip(cabecalho, valores))
+                versao = int(row.get(VERSION_FIELD) or 0)
+                if alteracao is not None:
+                    nova = int(alteracao.get(VERSION_FIELD) or 0)
+                    if nova <= versao:
+                        # Registro do journal já incorporado é ignorado;
+                        # alteração sem versão avança uma
+                        nova = versao if VERSION_FIELD in alteracao else versao + 1
+                    if nova > versao:
+                        row.update(alteracao)
+                    versao = nova
+                    encontrados.add(cpf)
+                row[VERSION_FIELD] = str(versao)
+                writer.writerow([row.get(campo, "") for campo in CLIENT_FIELDNAMES])
+        return encontrados
+
+    def _truncate(self, base_path: Path) -> None:
+        """Esvazia o journal depois que ele foi incorporado ao arquivo base."""
+        # Leitores entre a reescrita e esta operação apenas reaplicam
+        # valores já incorporados, o que é idempotente
+        with open(journal_path_for(base_path), "w", encoding="utf-8", newline=""):
+            pass
+
+    def compact(self, base_path: Path) -> int:
+        """
+        Incorpora o journal ao arquivo base e esvazia o journal.
+
+        Args:
+            base_path: Caminho de clientes.csv
+
+        Returns:
+            Número de registros do journal incorporados
+        """
+        with self._lock_for(base_path):
+            entries, _ = read_journal(journal_path_for(base_path))
+            if not entries or retired_marker_for(base_path).exists():
+                # Base aposentada: o journal já foi levado aos novos shards
+                return 0
+
+            self._rewrite_base(base_path, pending_updates(entries))
+            self._truncate(base_path)
+            return len(entries)
+
+    def bulk_update(
+        self,
+        base_path: Path,
+        atualizacoes: Mapping[str, Mapping[str, float]]
+    ) -> List[str]:
+        """
+        Aplica um lote de atualizações reescrevendo o arquivo base uma vez.
+
+        A troca do arquivo é atômica: ou todo o lote é gravado, ou o
+        arquivo base permanece como estava. Se o journal tiver registros
+        pendentes, ele é incorporado antes, em uma passada separada; assim
+        uma falha entre a reescrita e o esvaziamento do journal não
+        reaplica valores antigos sobre os do lote.
+
+        Args:
+            base_path: Caminho de clientes.csv
+            atualizacoes: Mapeamento {cpf: {campo: valor}}
+
+        Returns:
+            CPFs do lote que não existem no arquivo base (ordenados)
+
+        Raises:
+            ValueError: Se o lote tiver campos não atualizáveis
+            RetiredBaseError: Se a base foi reparticionada
+        """
+        lote = normalize_updates(atualizacoes)
+        if not lote:
+            return []
+
+        with self._lock_for(base_path):
+            self._check_active(base_path)
+            self.compact(base_path)
+            alteracoes = {
+                cpf: {campo: str(valor) for campo, valor in campos.items()}
+                for cpf, campos in lote.items()
+            }
+            encontrados = self._rewrite_base(base_path, alteracoes)
+
+        return sorted(set(lote) - encontrados)
+
+    def compact_async(self, base_path: Path) -> None:
+        """Dispara a compactação em uma thread de segundo plano, se ociosa."""
+        with self._compactor_lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            self._compactor = threading.Thread(
+                target=self._compact_safely,
+                args=(base_path,),
+                name="client-journal-compactor",
+                daemon=True,
+            )
+            self._compactor.start()
+
+    def _compact_safely(self, base_path: Path) -> None:
+        """Executa a compactação registrando falhas sem propagá-las."""
+        try:
+            self.compact(base_path)
+        except Exception as e:
+            print(f"Erro ao compactar journal de clientes: {e}")
+
+
+def _stress_updates(base_path: Path, alteracoes: List[Tuple[str, float]], max_bytes: int) -> int:
+    """Processo do teste de carga: grava as alterações com um journal próprio."""
+    journal = ClientJournal(max_bytes=max_bytes)
+    for cpf, valor in alteracoes:
+        journal.append(base_path, cpf, "limite_credito", valor)
+    # Aguarda a compactação disparada por este processo, se houver
+    if journal._compactor is not None:
+        journal._compactor.join()
+    return len(alteracoes)
+
+
+if __name__ == "__main__":
+    # Vários processos atualizam CPFs distintos, com compactações
+    # disparadas por eles e pelo processo principal no meio das escritas;
+    # ao final, toda atualização precisa estar no arquivo base
+    import importlib
+    import sys
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+    from datetime import date
+
+    from tools.generate_synthetic_data import generate
+    from tools.mmap_scanner import ClientFileScanner
+
+    # Pelo módulo importável: funções de __main__ não chegam aos processos do pool
+    worker = importlib.import_module("tools.client_journal")._stress_updates
+
+    processos = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    por_processo = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generate(Path(tmp), processos * por_processo, 0, dias=1, data_final=date.today(), workers=1)
+        base_path = Path(tmp) / "clientes.csv"
+        cpfs = [cpf for (cpf,) in ClientFileScanner(base_path).scan(["cpf"])]
+        esperado = {cpf: float(1_000 + i) for i, cpf in enumerate(cpfs)}
+
+        inicio = time.perf_counter()
+        compactacoes = 0
+        with ProcessPoolExecutor(max_workers=processos) as pool:
+            futuros = [
+                pool.submit(
+                    worker,
+                    base_path,
+                    [(cpf, esperado[cpf]) for cpf in cpfs[i::processos]],
+                    16 * 1024,
+                )
+                for i in range(processos)
+            ]
+            principal = ClientJournal()
+            while not all(f.done() for f in futuros):
+                compactacoes += principal.compact(base_path) > 0
+                time.sleep(0.01)
+            total = sum(f.result() for f in futuros)
+        ClientJournal().compact(base_path)
+        duracao = time.perf_counter() - inicio
+
+        gravado = dict(ClientFileScanner(base_path, apply_journal=False).scan(["cpf", "limite_credito"]))
+        perdidas = [cpf for cpf, valor in esperado.items() if gravado.get(cpf) != valor]
+        pendentes, _ = read_journal(journal_path_for(base_path))
+
+    print(
+        f"{total:,} atualizações de {processos} processos em {duracao:.2f}s "
+        f"({compactacoes} compactações concorrentes no processo principal)"
+    )
+    assert not pendentes, f"{len(pendentes)} registros ainda no journal após a compactação"
+    assert not perdidas, f"{len(perdidas)} atualizações perdidas (ex: {perdidas[:5]})"
+    print("Nenhuma atualização perdida")
@@ -0,0 +1,131 @@
+"""
+Registro compacto e imutável de cliente para as estruturas em memória.
+Usa __slots__ em vez de um dicionário por cliente e compartilha as datas
+de nascimento repetidas; o formato em dicionário usado pelos agentes
+(state.DadosCliente) só é montado na saída, por to_dict().
+"""
+
+import sys
+from typing import Dict
+
+# Campos do registro, na ordem de DadosCliente
+CLIENT_RECORD_FIELDS = ("cpf", "nome", "limite_credito", "score_credito", "data_nascimento", "versao")
+
+_set = object.__setattr__
+
+
+class ClientRecord:
+    """Dados de um cliente (somente leitura)."""
+
+    __slots__ = CLIENT_RECORD_FIELDS
+
+    def __init__(
+        self,
+        cpf: str,
+        nome: str,
+        limite_credito: float,
+        score_credito: float,
+        data_nascimento: str,
+        versao: int = 0
+    ):
+        _set(self, "cpf", cpf)
+        _set(self, "nome", nome)
+        _set(self, "limite_credito", limite_credito)
+        _set(self, "score_credito", score_credito)
+        # Muitos clientes compartilham a data: guarda uma única cópia do texto
+        _set(self, "data_nascimento", sys.intern(data_nascimento))
+        _set(self, "versao", versao)
+
+    @classmethod
+    def from_row(cls, row: Dict[str, str]) -> "ClientRecord":
+        """Cria o registro a partir de uma linha de clientes.csv."""
+        return cls(
+            row["cpf"],
+            row["nome"],
+            float(row["limite_credito"]),
+            float(row["score_credito"]),
+            row["data_nascimento"],
+            int(row.get("versao") or 0),
+        )
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ClientRecord é imutável; use replace()")
+
+    def __delattr__(self, name):
+        raise AttributeError("ClientRecord é imutável")
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ClientRecord):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in CLIENT_RECORD_FIELDS)
+
+    __hash__ = None  # Comparável por valor, mas não usado como chave
+
+    def __repr__(self) -> str:
+        campos = ", ".join(f"{f}={getattr(self, f)!r}" for f in CLIENT_RECORD_FIELDS)
+        return f"ClientRecord({campos})"
+
+    def replace(self, **campos) -> "ClientRecord":
+        """Retorna uma cópia do registro com os campos informados alterados."""
+        valores = {f: getattr(self, f) for f in CLIENT_RECORD_FIELDS}
+        valores.update(campos)
+        return ClientRecord(**valores)
+
+    def to_dict(self) -> Dict:
+        """Converte no dicionário usado pelos agentes (DadosCliente)."""
+        return {
+            "cpf": self.cpf,
+            "nome": self.nome,
+            "limite_credito": self.limite_credito,
+            "score_credito": self.score_credito,
+            "data_nascimento": self.data_nascimento,
+            "versao": self.versao,
+        }
+
+
+if __name__ == "__main__":
+    # Compara a memória ocupada por 1M clientes como dicionários e como
+    # ClientRecord (mesmos valores de origem, lidos como texto do CSV)
+    import gc
+    import time
+    import tracemalloc
+
+    TOTAL = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    def linhas():
+        for i in range(TOTAL):
+            yield {
+                "cpf": f"{i:011d}",
+                "nome": f"Cliente {i}",
+                "limite_credito": f"{1000 + i % 50 * 500}.0",
+                "score_credito": f"{300 + i % 700}.0",
+                "data_nascimento": f"{1950 + i % 50}-{1 + i % 12:02d}-{1 + i % 28:02d}",
+            }
+
+    def como_dict(row: Dict[str, str]) -> Dict:
+        # Formato usado pelo índice antes do ClientRecord
+        return {
+            "cpf": row["cpf"],
+            "nome": row["nome"],
+            "limite_credito": float(row["limite_credito"]),
+            "score_credito": float(row["score_credito"]),
+            "data_nascimento": row["data_nascimento"],
+        }
+
+    def medir(nome: str, construtor) -> None:
+        gc.collect()
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        indice = {row["cpf"]: construtor(row) for row in linhas()}
+        tempo = time.perf_counter() - inicio
+        atual, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(
+            f"{nome:<13} {atual / 1024 ** 2:8.1f} MiB "
+            f"({atual / len(indice):6.1f} bytes/cliente, carga em {tempo:.2f}s)"
+        )
+        del indice
+
+    print(f"{TOTAL:,} clientes indexados por CPF")
+    medir("dict:", como_dict)
+    medir("ClientRecord:", ClientRecord.from_row)
@@ -0,0 +1,440 @@
+"""
+Particionamento da base de clientes por prefixo de CPF.
+
+A base pode ser dividida em N arquivos (shards) com o mesmo formato de
+clientes.csv, cada um com seu journal, índice e snapshot binário. O shard
+de um CPF é dado pelos seus três primeiros dígitos, divididos em N faixas
+contíguas; buscas por CPF abrem apenas o shard correspondente e as
+varreduras da carteira inteira são distribuídas entre processos, um shard
+por worker.
+
+O conjunto atual de shards é descrito em data/clientes/manifest.json; sem
+o manifesto, a base é o arquivo único data/clientes.csv. Cada
+reparticionamento grava um novo conjunto (versão) e o publica trocando o
+manifesto, sem parar leitores e escritores (ver reshard).
+
+Uso:
+    python -m tools.client_shards --shards 8 [--data-dir data]
+"""
+
+import argparse
+import csv
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+from tools.atomic_file import atomic_write
+from tools.client_index import ClientIndex, file_signature
+from tools.client_journal import (
+    FLUSH_FSYNC,
+    JOURNAL_FIELDNAMES,
+    ClientJournal,
+    journal_path_for,
+    normalize_updates,
+    read_journal,
+    retired_marker_for,
+)
+from tools.file_lock import FileLock
+from tools.storage import CLIENT_FIELDNAMES
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+SHARDS_DIRNAME = "clientes"
+MANIFEST_FILENAME = "manifest.json"
+LEGACY_FILENAME = "clientes.csv"
+
+# Dígitos iniciais do CPF que definem o shard (limita N a 10 ** PREFIX_DIGITS)
+PREFIX_DIGITS = 3
+MAX_SHARDS = 10 ** PREFIX_DIGITS
+
+# Processos usados nas varreduras paralelas (0 = um por CPU)
+SHARD_WORKERS = int(os.getenv("BANCO_SHARD_WORKERS", "0")) or os.cpu_count() or 1
+
+# Tentativas de reparticionamento quando a base é reescrita durante a cópia
+_RESHARD_ATTEMPTS = 3
+
+T = TypeVar("T")
+
+
+def shard_of(cpf: str, num_shards: int) -> int:
+    """Índice do shard de um CPF entre num_shards faixas de prefixo."""
+    prefixo = cpf[:PREFIX_DIGITS]
+    if not prefixo.isdigit():
+        return 0
+    return int(prefixo) * num_shards // MAX_SHARDS
+
+
+class ClientShard:
+    """Um arquivo da base com seu índice e journal."""
+
+    __slots__ = ("path", "index", "journal")
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.index = ClientIndex()
+        self.journal = ClientJournal()
+
+
+class ClientShardSet:
+    """Conjunto de shards de uma versão do manifesto."""
+
+    def __init__(self, versao: int, paths: Sequence[Path]):
+        self.versao = versao
+        self.shards = [ClientShard(path) for path in paths]
+
+    def __len__(self) -> int:
+        return len(self.shards)
+
+    @property
+    def paths(self) -> List[Path]:
+        return [shard.path for shard in self.shards]
+
+    def route(self, cpf: str) -> ClientShard:
+        """Shard responsável pelo CPF."""
+        return self.shards[shard_of(cpf, len(self.shards))]
+
+    def split(self, por_cpf: Mapping[str, T]) -> List[Tuple[ClientShard, Dict[str, T]]]:
+        """Separa um mapeamento {cpf: valor} pelos shards responsáveis."""
+        partes: Dict[int, Dict[str, T]] = {}
+        for cpf, valor in por_cpf.items():
+            partes.setdefault(shard_of(cpf, len(self.shards)), {})[cpf] = valor
+        return [(self.shards[i], parte) for i, parte in sorted(partes.items())]
+
+
+def read_manifest(data_dir: Path) -> Optional[Dict]:
+    """Manifesto dos shards, ou None se a base não é particionada."""
+    try:
+        with open(Path(data_dir) / SHARDS_DIRNAME / MANIFEST_FILENAME, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def client_shard_paths(data_dir: Path) -> List[Path]:
+    """Arquivos da base de clientes atual, na ordem dos shards."""
+    data_dir = Path(data_dir)
+    manifest = read_manifest(data_dir)
+    if manifest is None:
+        return [data_dir / LEGACY_FILENAME]
+    return [data_dir / SHARDS_DIRNAME / arquivo for arquivo in manifest["arquivos"]]
+
+
+class ClientShardRouter:
+    """
+    Conjunto de shards vigente, recarregado quando o manifesto muda.
+
+    A verificação custa um stat do manifesto por operação.
+    """
+
+    def __init__(self, data_dir: Path):
+        self.data_dir = Path(data_dir)
+        self.manifest_path = self.data_dir / SHARDS_DIRNAME / MANIFEST_FILENAME
+        self._lock = threading.Lock()
+        self._signature: Optional[Tuple[int, int]] = None
+        self._atual: Optional[ClientShardSet] = None
+
+    def _manifest_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            return file_signature(self.manifest_path)
+        except FileNotFoundError:
+            return None
+
+    def current(self) -> ClientShardSet:
+        """Retorna o conjunto de shards publicado no manifesto."""
+        signature = self._manifest_signature()
+        atual = self._atual
+        if atual is not None and signature == self._signature:
+            return atual
+
+        with self._lock:
+            signature = self._manifest_signature()
+            if self._atual is None or signature != self._signature:
+                manifest = read_manifest(self.data_dir)
+                versao = manifest["versao"] if manifest else 0
+                self._atual = ClientShardSet(versao, client_shard_paths(self.data_dir))
+                self._signature = signature
+            return self._atual
+
+
+# ----------------------------------------------------------------------
+# Varreduras paralelas (executadas nos processos do pool)
+# ----------------------------------------------------------------------
+
+def _map_shard(path: Path, fields: Optional[Sequence[str]], func: Callable) -> object:
+    """Aplica func ao conteúdo de um shard (com o journal aplicado)."""
+    from tools.csv_ingest import read_clients
+
+    return func(read_clients(path, fields))
+
+
+def _update_shard(
+    path: Path,
+    fields: Optional[Sequence[str]],
+    func: Callable
+) -> Dict[str, Dict[str, float]]:
+    """Calcula e grava as alterações de um shard em uma única reescrita."""
+    lote = normalize_updates(_map_shard(path, fields, func))
+    nao_encontrados = set(ClientJournal(fsync=FLUSH_FSYNC).bulk_update(path, lote))
+    return {cpf: campos for cpf, campos in lote.items() if campos and cpf not in nao_encontrados}
+
+
+def _fan_out(
+    paths: Sequence[Path],
+    worker: Callable,
+    fields: Optional[Sequence[str]],
+    func: Callable,
+    workers: int
+) -> List:
+    """Executa worker(path, fields, func) por shard, um shard por processo."""
+    workers = max(1, min(workers, len(paths)))
+    if workers == 1:
+        return [worker(path, fields, func) for path in paths]
+    n = len(paths)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(worker, paths, [fields] * n, [func] * n))
+
+
+def map_shards(
+    paths: Sequence[Path],
+    func: Callable[["pd.DataFrame"], T],
+    fields: Optional[Sequence[str]] = None,
+    workers: int = SHARD_WORKERS
+) -> List[T]:
+    """
+    Aplica func ao conteúdo de cada shard (DataFrame com os campos pedidos
+    e o journal aplicado), um shard por processo do pool.
+
+    func deve ser serializável: uma função de módulo ou um
+    functools.partial de uma.
+
+    Returns:
+        Resultados na ordem dos shards
+    """
+    return _fan_out(paths, _map_shard, fields, func, workers)
+
+
+def update_shards(
+    paths: Sequence[Path],
+    func: Callable[["pd.DataFrame"], Mapping[str, Mapping[str, float]]],
+    fields: Optional[Sequence[str]] = None,
+    workers: int = SHARD_WORKERS
+) -> Dict[str, Dict[str, float]]:
+    """
+    Calcula com func as alterações de cada shard e as grava com uma
+    reescrita por shard, um shard por processo do pool.
+
+    Returns:
+        Alterações gravadas {cpf: {campo: valor}}
+    """
+    alteracoes: Dict[str, Dict[str, float]] = {}
+    for parcial in _fan_out(paths, _update_shard, fields, func, workers):
+        alteracoes.update(parcial)
+    return alteracoes
+
+
+# ----------------------------------------------------------------------
+# Reparticionamento
+# ----------------------------------------------------------------------
+
+def _journal_size(base_path: Path) -> int:
+    try:
+        return os.path.getsize(journal_path_for(base_path))
+    except FileNotFoundError:
+        return 0
+
+
+def _copy_shards(origem: Sequence[Path], destino: Sequence[Path]) -> int:
+    """Redistribui os clientes (com journal aplicado) nos novos arquivos."""
+    import numpy as np
+
+    from tools.csv_ingest import iter_client_frames
+
+    total = 0
+    with ExitStack() as stack:
+        saidas = [stack.enter_context(atomic_write(path, newline="")) for path in destino]
+        for f in saidas:
+            f.write(",".join(CLIENT_FIELDNAMES) + "\n")
+
+        for path in origem:
+            if not path.exists():
+                continue
+            for bloco in iter_client_frames(path, CLIENT_FIELDNAMES):
+                prefixos = bloco["cpf"].str[:PREFIX_DIGITS]
+                numericos = prefixos.str.fullmatch(r"\d+").to_numpy(dtype=bool)
+                indices = np.zeros(len(bloco), dtype=np.int64)
+                indices[numericos] = prefixos[numericos].astype(np.int64).to_numpy()
+                indices = indices * len(destino) // MAX_SHARDS
+                for i in np.unique(indices):
+                    bloco[indices == i].to_csv(saidas[i], header=False, index=False, lineterminator="\n")
+                total += len(bloco)
+    return total
+
+
+def _replay_journals(
+    origem: Sequence[Path],
+    offsets: Mapping[Path, int],
+    destino: Sequence[Path]
+) -> int:
+    """
+    Leva ao journal dos novos shards os registros anexados aos antigos
+    depois do início da cópia. Requer os locks dos shards antigos.
+    """
+    por_shard: Dict[int, List[List[str]]] = {}
+    agora = datetime.now().isoformat()
+    total = 0
+    for path in origem:
+        entries, _ = read_journal(journal_path_for(path), offsets[path])
+        for cpf, campo, valor, versao in entries:
+            por_shard.setdefault(shard_of(cpf, len(destino)), []).append(
+                [cpf, campo, valor, agora, str(versao)]
+            )
+            total += 1
+
+    for i, rows in por_shard.items():
+        with open(journal_path_for(destino[i]), "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(JOURNAL_FIELDNAMES)
+            writer.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+    return total
+
+
+def reshard(data_dir: Path, num_shards: int) -> Dict[str, int]:
+    """
+    Reparticiona a base de clientes em num_shards arquivos, online.
+
+    Os clientes são copiados para um novo conjunto de shards sem bloquear
+    leitores ou escritores. Ao final, com os locks dos shards antigos, os
+    registros de journal anexados durante a cópia são levados aos novos
+    shards, o manifesto é trocado atomicamente e os arquivos antigos são
+    marcados como aposentados: escritas que chegarem a eles são recusadas
+    e refeitas no conjunto novo. Se algum shard antigo for reescrito
+    durante a cópia (compactação ou atualização em lote), a cópia é refeita.
+
+    O conjunto anterior é mantido até o reparticionamento seguinte, para
+    leitores que ainda o estejam percorrendo; o clientes.csv original
+    nunca é apagado.
+
+    Args:
+        data_dir: Diretório de dados
+        num_shards: Número de shards (1 a MAX_SHARDS)
+
+    Returns:
+        Dicionário com versao, shards, clientes e registros de journal
+        transferidos no fechamento
+
+    Raises:
+        ValueError: Se num_shards estiver fora do intervalo
+        RuntimeError: Se a base mudar em todas as tentativas
+    """
+    if not 1 <= num_shards <= MAX_SHARDS:
+        raise ValueError(f"Número de shards deve estar entre 1 e {MAX_SHARDS}: {num_shards}")
+
+    data_dir = Path(data_dir)
+    shards_dir = data_dir / SHARDS_DIRNAME
+    shards_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = shards_dir / MANIFEST_FILENAME
+
+    # Um reparticionamento por vez
+    with FileLock(manifest_path):
+        manifest = read_manifest(data_dir)
+        versao = (manifest["versao"] if manifest else 0) + 1
+        origem = client_shard_paths(data_dir)
+        largura = len(str(num_shards - 1))
+        arquivos = [f"v{versao:04d}/clientes_{i:0{largura}d}.csv" for i in range(num_shards)]
+        destino = [shards_dir / arquivo for arquivo in arquivos]
+
+        for _ in range(_RESHARD_ATTEMPTS):
+            shutil.rmtree(shards_dir / f"v{versao:04d}", ignore_errors=True)
+            (shards_dir / f"v{versao:04d}").mkdir()
+
+            # Posição de cada shard antigo no início da cópia
+            inicio: Dict[Path, Tuple[Optional[Tuple[int, int]], int]] = {}
+            for path in origem:
+                with FileLock(path):
+                    inicio[path] = (
+                        file_signature(path) if path.exists() else None,
+                        _journal_size(path),
+                    )
+
+            clientes = _copy_shards(origem, destino)
+
+            with ExitStack() as stack:
+                for path in origem:
+                    stack.enter_context(FileLock(path))
+                alterados = [
+                    path for path, (signature, tamanho) in inicio.items()
+                    if (file_signature(path) if path.exists() else None) != signature
+                    or _journal_size(path) < tamanho
+                ]
+                if alterados:
+                    continue  # Base reescrita durante a cópia: refaz
+
+                transferidos = _replay_journals(
+                    origem, {path: tamanho for path, (_, tamanho) in inicio.items()}, destino
+                )
+                with atomic_write(manifest_path) as f:
+                    json.dump({
+                        "versao": versao,
+                        "prefixo_digitos": PREFIX_DIGITS,
+                        "arquivos": arquivos,
+                    }, f, indent=2)
+                for path in origem:
+                    retired_marker_for(path).touch()
+            break
+        else:
+            shutil.rmtree(shards_dir / f"v{versao:04d}", ignore_errors=True)
+            raise RuntimeError("A base de clientes mudou durante todas as tentativas de reparticionamento")
+
+        # Mantém apenas o conjunto anterior, que ainda pode estar em leitura
+        for antigo in shards_dir.glob("v*"):
+            if antigo.is_dir() and antigo.name < f"v{versao - 1:04d}":
+                shutil.rmtree(antigo, ignore_errors=True)
+
+    return {
+        "versao": versao,
+        "shards": num_shards,
+        "clientes": clientes,
+        "journal_transferido": transferidos,
+    }
+
+
+def main() -> None:
+    """Ponto de entrada de linha de comando (reparticionamento)."""
+    default_data_dir = Path(__file__).parent.parent / "data"
+
+    parser = argparse.ArgumentParser(
+        description="Reparticiona a base de clientes por prefixo de CPF"
+    )
+    parser.add_argument("--data-dir", type=Path, default=default_data_dir)
+    parser.add_argument("--shards", type=int, required=True, help="Novo número de shards")
+    args = parser.parse_args()
+
+    resultado = reshard(args.data_dir, args.shards)
+    print(
+        f"✅ {resultado['clientes']} clientes em {resultado['shards']} shards "
+        f"(versão {resultado['versao']}, {resultado['journal_transferido']} "
+        "atualizações transferidas no fechamento)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Leitura vetorizada dos arquivos CSV do sistema via pandas.
+Converte clientes.csv, score_limite.csv e os segmentos de solicitações
+em colunas tipadas (dtypes explícitos, sem inferência) de uma só vez,
+em vez de montar um dicionário por linha e converter cada campo em
+Python. Arquivos grandes são lidos em blocos de linhas, limitando a
+memória ocupada.
+
+Apenas processamentos em lote (migração, carteira, reparticionamento)
+importam este módulo, sempre dentro das funções: login e chat leem a base
+pelo snapshot ou pelo ClientFileScanner, sem carregar pandas.
+
+Uso (benchmark):
+    python -m tools.csv_ingest [100k 1M 10M]
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from tools.client_journal import open_base, pending_updates
+from tools.request_log import open_segment
+from tools.score_limit_index import PRODUTO_PADRAO
+from tools.storage import VERSION_FIELD
+
+# Tipos das colunas de cada arquivo (texto como object: CPFs mantêm os zeros)
+CLIENT_DTYPES = {
+    "cpf": object,
+    "data_nascimento": object,
+    "nome": object,
+    "limite_credito": np.float64,
+    "score_credito": np.float64,
+    VERSION_FIELD: np.int64,
+}
+POLICY_DTYPES = {
+    "produto": object,
+    "score_minimo": np.float64,
+    "score_maximo": np.float64,
+    "limite_maximo": np.float64,
+}
+REQUEST_DTYPES = {
+    "cpf_cliente": object,
+    "data_hora_solicitacao": object,
+    "limite_atual": np.float64,
+    "novo_limite_solicitado": np.float64,
+    "status_pedido": object,
+}
+
+# Linhas lidas por bloco nas leituras em fluxo
+CHUNK_ROWS = 200_000
+
+
+def _read_csv(source, dtypes: Dict, usecols: Sequence[str], **kwargs):
+    """read_csv com as colunas e tipos pedidos, sem detecção de nulos."""
+    return pd.read_csv(
+        source,
+        usecols=list(usecols),
+        dtype={coluna: dtypes[coluna] for coluna in usecols},
+        na_filter=False,
+        engine="c",
+        **kwargs,
+    )
+
+
+def iter_client_frames(
+    filepath: Path,
+    fields: Optional[Sequence[str]] = None,
+    chunksize: int = CHUNK_ROWS,
+    apply_journal: bool = True
+) -> Iterator[pd.DataFrame]:
+    """
+    Lê clientes.csv em blocos de colunas tipadas.
+
+    Args:
+        filepath: Caminho de clientes.csv
+        fields: Colunas desejadas, na ordem de saída (padrão: todas)
+        chunksize: Linhas por bloco
+        apply_journal: Aplica as atualizações pendentes do journal
+
+    Yields:
+        DataFrames com as colunas pedidas (numéricas como float64, versão
+        como int64; 0 em arquivos sem a coluna de versão)
+
+    Raises:
+        ValueError: Se alguma coluna pedida não existir
+    """
+    fields = list(fields) if fields else list(CLIENT_DTYPES)
+    invalidos = set(fields) - set(CLIENT_DTYPES)
+    if invalidos:
+        raise ValueError(f"Campos inválidos: {sorted(invalidos)}")
+
+    # Base e journal da mesma versão (ver open_base)
+    f, entries, _ = open_base(Path(filepath))
+    with f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        pendentes = pending_updates(entries) if apply_journal else {}
+        # O CPF é necessário para descartar linhas vazias e aplicar o journal
+        colunas = fields if "cpf" in fields else ["cpf", *fields]
+        # Arquivos anteriores ao versionamento não têm a coluna de versão
+        sem_versao = VERSION_FIELD.encode("utf-8") not in f.readline().rstrip(b"\r\n").split(b",")
+        f.seek(0)
+        if sem_versao:
+            colunas = [coluna for coluna in colunas if coluna != VERSION_FIELD]
+
+        with _read_csv(f, CLIENT_DTYPES, colunas, chunksize=chunksize) as reader:
+            for bloco in reader:
+                bloco = bloco[bloco["cpf"] != ""]
+                if sem_versao and VERSION_FIELD in fields:
+                    bloco = bloco.assign(**{VERSION_FIELD: np.int64(0)})
+                if pendentes:
+                    alterados = bloco.index[bloco["cpf"].isin(pendentes.keys())]
+                    for i in alterados:
+                        for campo, valor in pendentes[bloco.at[i, "cpf"]].items():
+                            if campo in bloco.columns:
+                                bloco.at[i, campo] = CLIENT_DTYPES[campo](valor)
+                yield bloco[fields].reset_index(drop=True)
+
+
+def read_clients(
+    filepath: Path,
+    fields: Optional[Sequence[str]] = None,
+    apply_journal: bool = True
+) -> pd.DataFrame:
+    """Lê clientes.csv inteiro em colunas tipadas (ver iter_client_frames)."""
+    blocos = list(iter_client_frames(filepath, fields, apply_journal=apply_journal))
+    if not blocos:
+        return pd.DataFrame({
+            campo: pd.Series(dtype=CLIENT_DTYPES[campo])
+            for campo in (fields or CLIENT_DTYPES)
+        })
+    return pd.concat(blocos, ignore_index=True)
+
+
+def read_policy(filepath: Path) -> Dict[str, List[Tuple[float, float, float]]]:
+    """
+    Lê score_limite.csv em colunas tipadas.
+
+    A coluna produto é opcional; sem ela (ou vazia), as faixas pertencem
+    ao produto padrão.
+
+    Returns:
+        Dicionário {produto: [(score_minimo, score_maximo, limite_maximo)]}
+        na ordem do arquivo, ainda sem validação
+    """
+    with open(filepath, "r", encoding="utf-8") as f:
+        cabecalho = f.readline().strip().split(",")
+    colunas = [coluna for coluna in POLICY_DTYPES if coluna in cabecalho]
+    df = _read_csv(filepath, POLICY_DTYPES, colunas, skip_blank_lines=True)
+    if "produto" not in df.columns:
+        df["produto"] = PRODUTO_PADRAO
+    df["produto"] = df["produto"].replace("", PRODUTO_PADRAO)
+
+    faixas: Dict[str, List[Tuple[float, float, float]]] = {}
+    for produto, score_min, score_max, limite in zip(
+        df["produto"].tolist(),
+        df["score_minimo"].tolist(),
+        df["score_maximo"].tolist(),
+        df["limite_maximo"].tolist(),
+    ):
+        faixas.setdefault(produto, []).append((score_min, score_max, limite))
+    return faixas
+
+
+def iter_request_frames(path: Path, chunksize: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Lê um segmento de solicitações (texto ou gzip) em blocos tipados.
+
+    Indicado para segmentos selados: a linha final de um segmento em
+    escrita por outro processo não é descartada, como em iter_segment_rows.
+
+    Yields:
+        DataFrames com as colunas de REQUEST_DTYPES
+    """
+    try:
+        f = open_segment(path)
+    except FileNotFoundError:
+        return
+
+    with f:
+        with _read_csv(f, REQUEST_DTYPES, REQUEST_DTYPES, chunksize=chunksize) as reader:
+            for bloco in reader:
+                yield bloco[bloco["cpf_cliente"] != ""].reset_index(drop=True)
+
+
+def _parse_size(texto: str) -> int:
+    """Converte "100k", "1M" ou "10000" em número de linhas."""
+    texto = texto.strip().lower()
+    multiplicador = {"k": 1_000, "m": 1_000_000}.get(texto[-1:], 1)
+    if multiplicador > 1:
+        texto = texto[:-1]
+    return int(float(texto) * multiplicador)
+
+
+if __name__ == "__main__":
+    # Compara a leitura atual (csv.DictReader + float() por campo) com a
+    # leitura vetorizada, para clientes e solicitações
+    import csv
+    import sys
+    import tempfile
+    import time
+    from datetime import date
+
+    from tools.generate_synthetic_data import generate
+    from tools.request_log import SegmentedRequestLog
+
+    tamanhos = [_parse_size(t) for t in sys.argv[1:]] or [100_000, 1_000_000, 10_000_000]
+
+    def medir(funcao) -> Tuple[float, float]:
+        inicio = time.perf_counter()
+        resultado = funcao()
+        return time.perf_counter() - inicio, resultado
+
+    def clientes_dictreader(arquivo: Path) -> float:
+        total = 0.0
+        with open(arquivo, "r", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                total += float(row["limite_credito"]) + float(row["score_credito"])
+        return total
+
+    def clientes_vetorizado(arquivo: Path) -> float:
+        total = 0.0
+        for bloco in iter_client_frames(arquivo, ["limite_credito", "score_credito"]):
+            total += float(bloco["limite_credito"].sum() + bloco["score_credito"].sum())
+        return total
+
+    def solicitacoes_dictreader(segmentos: List[Path]) -> float:
+        total = 0.0
+        for path in segmentos:
+            with open_segment(path) as f:
+                for row in csv.DictReader(f):
+                    total += float(row["novo_limite_solicitado"])
+        return total
+
+    def solicitacoes_vetorizado(segmentos: List[Path]) -> float:
+        total = 0.0
+        for path in segmentos:
+            for bloco in iter_request_frames(path):
+                total += float(bloco["novo_limite_solicitado"].sum())
+        return total
+
+    print(f"{'linhas':>12} {'arquivo':<13} {'DictReader':>11} {'vetorizado':>11} {'ganho':>7}")
+    for tamanho in tamanhos:
+        with tempfile.TemporaryDirectory() as tmp:
+            saida = Path(tmp)
+            generate(saida, tamanho, tamanho, dias=30, data_final=date.today())
+            segmentos = SegmentedRequestLog(saida).segments()
+
+            casos = [
+                ("clientes", clientes_dictreader, clientes_vetorizado, saida / "clientes.csv"),
+                ("solicitações", solicitacoes_dictreader, solicitacoes_vetorizado, segmentos),
+            ]
+            for nome, atual, vetorizado, entrada in casos:
+                tempo_atual, total_atual = medir(lambda: atual(entrada))
+                tempo_vet, total_vet = medir(lambda: vetorizado(entrada))
+                assert np.isclose(total_atual, total_vet), (total_atual, total_vet)
+                print(
+                    f"{tamanho:>12,} {nome:<13} {tempo_atual:>10.2f}s "
+                    f"{tempo_vet:>10.2f}s {tempo_atual / tempo_vet:>6.1f}x"
+                )
@@ -0,0 +1,327 @@
+"""
+Engine de armazenamento em arquivos CSV.
+Mantém os arquivos em DATA_DIR como fonte da verdade, com índices em
+memória para consultas, journal para atualizações, a base de clientes
+opcionalmente particionada por prefixo de CPF e o histórico de
+solicitações particionado em segmentos diários.
+"""
+
+import math
+import os
+from datetime import date
+from functools import partial
+from itertools import chain
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from tools.client_journal import RetiredBaseError, normalize_updates
+from tools.client_shards import ClientShard, ClientShardRouter, map_shards, update_shards
+from tools.mmap_scanner import ClientFileScanner
+from tools.request_log import SegmentedRequestLog
+from tools.score_limit_index import ScoreLimitIndex
+from tools.storage import (
+    CHANGE_FEED_FILENAME,
+    REQUEST_STATS_FILENAME,
+    Statuses,
+    StorageBackend,
+    Timestamp,
+    VersionConflictError,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Tentativas de uma escrita que encontra a base sendo reparticionada
+_RESHARD_RETRIES = 3
+
+# Bytes lidos do início do arquivo para estimar o tamanho médio das linhas
+_ROW_SAMPLE_BYTES = 64 * 1024
+
+
+def _estimate_rows(filepath: Path) -> int:
+    """Estima as linhas de dados do CSV pelo tamanho do arquivo e das linhas iniciais."""
+    tamanho = os.path.getsize(filepath)
+    with open(filepath, "rb") as f:
+        f.readline()  # Cabeçalho
+        inicio = f.tell()
+        amostra = f.read(_ROW_SAMPLE_BYTES)
+    linhas = amostra.count(b"\n")
+    if linhas == 0:
+        return 1 if amostra.strip() else 0
+    return math.ceil((tamanho - inicio) * linhas / len(amostra))
+
+
+class CSVStorage(StorageBackend):
+    """Armazenamento em clientes.csv (ou shards), score_limite.csv e solicitações CSV."""
+
+    def __init__(self, data_dir: Path):
+        self.data_dir = Path(data_dir)
+        self._client_shards = ClientShardRouter(self.data_dir)
+        self._score_limit_index = ScoreLimitIndex()
+        self._request_log = SegmentedRequestLog(self.data_dir)
+
+    def _ensure_file_exists(self, filename: str) -> Path:
+        """Garante que o arquivo existe."""
+        filepath = self.data_dir / filename
+        if not filepath.exists():
+            raise FileNotFoundError(f"Arquivo não encontrado: {filepath}")
+        return filepath
+
+    @staticmethod
+    def _ensure_shard_exists(shard: ClientShard) -> ClientShard:
+        """Garante que o arquivo do shard existe."""
+        if not shard.path.exists():
+            raise FileNotFoundError(f"Arquivo não encontrado: {shard.path}")
+        return shard
+
+    def _client_shard(self, cpf: str) -> ClientShard:
+        """Shard da base de clientes responsável pelo CPF."""
+        return self._ensure_shard_exists(self._client_shards.current().route(cpf))
+
+    def _client_files(self) -> List[Path]:
+        """Arquivos da base de clientes, na ordem dos shards."""
+        return [
+            self._ensure_shard_exists(shard).path
+            for shard in self._client_shards.current().shards
+        ]
+
+    def authenticate_client(self, cpf: str, data_nascimento: str) -> Optional[Dict]:
+        shard = self._client_shard(cpf)
+
+        # Compara no registro e só monta o dicionário se autenticar; a versão
+        # publicada do índice é lida sem esperar por escritores
+        cliente = shard.index.get_record(shard.path, cpf)
+        if cliente is not None and cliente.data_nascimento == data_nascimento:
+            return cliente.to_dict()
+        return None
+
+    def get_client_by_cpf(self, cpf: str) -> Optional[Dict]:
+        shard = self._client_shard(cpf)
+
+        return shard.index.get(shard.path, cpf)
+
+    def get_current_client(self, cpf: str) -> Optional[Dict]:
+        shard = self._client_shard(cpf)
+
+        # Como nas escritas: aguarda a recarga da base e o journal mais recente
+        return shard.index.refresh(shard.path).get(cpf)
+
+    def clients_signature(self) -> Optional[Hashable]:
+        # Clientes não são excluídos e o journal só altera os existentes:
+        # o conjunto de CPFs muda com o número de clientes das versões
+        # servidas (compactações e atualizações em lote o mantêm)
+        conjunto = self._client_shards.current()
+        return conjunto.versao, tuple(
+            shard.index.pin(shard.path).client_count for shard in conjunto.shards
+        )
+
+    def estimate_client_count(self) -> Optional[int]:
+        return sum(_estimate_rows(path) for path in self._client_files())
+
+    def iter_clients(self, fields: Optional[Sequence[str]] = None) -> Iterator[Tuple]:
+        return chain.from_iterable(
+            ClientFileScanner(filepath).scan(fields) for filepath in self._client_files()
+        )
+
+    def iter_client_frames(
+        self,
+        fields: Optional[Sequence[str]] = None,
+        chunksize: Optional[int] = None
+    ) -> Iterator["pd.DataFrame"]:
+        # Importação tardia: pandas só é carregado quando usado
+        from tools.csv_ingest import CHUNK_ROWS, iter_client_frames
+
+        return chain.from_iterable(
+            iter_client_frames(filepath, fields, chunksize or CHUNK_ROWS)
+            for filepath in self._client_files()
+        )
+
+    def client_partitions(self) -> int:
+        return len(self._client_shards.current())
+
+    def map_client_partitions(
+        self,
+        func: Callable[["pd.DataFrame"], object],
+        fields: Optional[Sequence[str]] = None
+    ) -> List:
+        paths = self._client_files()
+        if len(paths) == 1:
+            return super().map_client_partitions(func, fields)
+        return map_shards(paths, func, fields)
+
+    def update_client_partitions(
+        self,
+        func: Callable[["pd.DataFrame"], Mapping[str, Mapping[str, float]]],
+        fields: Optional[Sequence[str]] = None
+    ) -> Dict[str, Dict[str, float]]:
+        paths = self._client_files()
+        if len(paths) == 1:
+            return super().update_client_partitions(func, fields)
+
+        alteracoes = update_shards(paths, func, fields)
+        # Gravado por outros processos: publica aqui as versões novas dos
+        # índices já carregados, como os demais escritores
+        for shard in self._client_shards.current().shards:
+            if shard.index.loaded:
+                shard.index.refresh(shard.path)
+        return alteracoes
+
+    @staticmethod
+    def _current_version(shard: ClientShard, cpf: str) -> Optional[int]:
+        """
+        Versão atual do cliente, incluindo escritas de outros processos.
+        Chamada pelo journal sob o lock do shard, ao gravar o lote.
+        """
+        cliente = shard.index.refresh(shard.path).get_record(cpf)
+        return cliente.versao if cliente is not None else None
+
+    def _update_client_field(
+        self,
+        cpf: str,
+        campo: str,
+        valor: float,
+        versao_esperada: Optional[int] = None
+    ) -> Optional[int]:
+        """Anexa a alteração ao journal em vez de reescrever a base inteira."""
+        for _ in range(_RESHARD_RETRIES):
+            shard = self._client_shard(cpf)
+            cliente = shard.index.get_record(shard.path, cpf)
+            if cliente is None:
+                return None
+            if versao_esperada is not None and cliente.versao > versao_esperada:
+                # Versão publicada já passou da esperada: recusa sem entrar no lote
+                raise VersionConflictError(cpf, versao_esperada, cliente.versao)
+            try:
+                versao = shard.journal.append(
+                    shard.path, cpf, campo, valor,
+                    versao_atual=partial(self._current_version, shard),
+                    versao_esperada=versao_esperada,
+                )
+            except RetiredBaseError:
+                continue  # Base reparticionada: refaz no conjunto novo
+            # Publica a versão com a escrita antes de retornar (lê as próprias escritas)
+            shard.index.refresh(shard.path)
+            return versao
+        raise RetiredBaseError(f"Base de clientes reparticionada durante a escrita: {cpf}")
+
+    def update_client_score(
+        self,
+        cpf: str,
+        novo_score: float,
+        versao_esperada: Optional[int] = None
+    ) -> Optional[int]:
+        return self._update_client_field(cpf, "score_credito", novo_score, versao_esperada)
+
+    def update_client_limit(
+        self,
+        cpf: str,
+        novo_limite: float,
+        versao_esperada: Optional[int] = None
+    ) -> Optional[int]:
+        return self._update_client_field(cpf, "limite_credito", novo_limite, versao_esperada)
+
+    def bulk_update(self, atualizacoes: Mapping[str, Mapping[str, float]]) -> List[str]:
+        # Com a base particionada, cada shard é reescrito atomicamente
+        pendentes = normalize_updates(atualizacoes)
+        nao_encontrados: List[str] = []
+        for _ in range(_RESHARD_RETRIES):
+            try:
+                for shard, parte in self._client_shards.current().split(pendentes):
+                    self._ensure_shard_exists(shard)
+                    nao_encontrados.extend(shard.journal.bulk_update(shard.path, parte))
+                    for cpf in parte:
+                        del pendentes[cpf]
+                    # O escritor paga a recarga; leitores seguem na versão anterior
+                    shard.index.refresh(shard.path)
+                return sorted(nao_encontrados)
+            except RetiredBaseError:
+                continue  # Base reparticionada: grava o restante no conjunto novo
+        raise RetiredBaseError("Base de clientes reparticionada durante a atualização em lote")
+
+    def get_limit_by_score(self, score: float, produto: Optional[str] = None) -> Optional[float]:
+        filepath = self._ensure_file_exists("score_limite.csv")
+
+        return self._score_limit_index.get_limit(filepath, score, produto)
+
+    def get_score_bands(self, produto: Optional[str] = None) -> List[Tuple[float, float, float]]:
+        filepath = self._ensure_file_exists("score_limite.csv")
+
+        return self._score_limit_index.get_bands(filepath, produto)
+
+    def register_limit_request(
+        self,
+        cpf: str,
+        limite_atual: float,
+        novo_limite: float,
+        status: str,
+        timestamp: str
+    ) -> None:
+        self._request_log.append({
+            "cpf_cliente": cpf,
+            "data_hora_solicitacao": timestamp,
+            "limite_atual": limite_atual,
+            "novo_limite_solicitado": novo_limite,
+            "status_pedido": status
+        })
+
+    def iter_requests(
+        self,
+        *,
+        cpf: Optional[str] = None,
+        status: Statuses = None,
+        inicio: Timestamp = None,
+        fim: Timestamp = None,
+        valor_min: Optional[float] = None,
+        valor_max: Optional[float] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[Dict]:
+        return self._request_log.query(
+            cpf=cpf,
+            status=status,
+            inicio=inicio,
+            fim=fim,
+            valor_min=valor_min,
+            valor_max=valor_max,
+            limit=limit,
+        )
+
+    def compact_requests(self, antes_de: date) -> int:
+        return self._request_log.compact(antes_de)
+
+    def iter_request_rollups(
+        self,
+        *,
+        cpf: Optional[str] = None,
+        inicio: Timestamp = None,
+        fim: Timestamp = None
+    ) -> Iterator[Dict]:
+        return self._request_log.iter_rollups(cpf=cpf, inicio=inicio, fim=fim)
+
+    def rollup_hourly_volume(self) -> Dict[str, int]:
+        return self._request_log.rollup_hourly_volume()
+
+    def request_stats_path(self) -> Optional[Path]:
+        return self._request_log.segments_dir / REQUEST_STATS_FILENAME
+
+    def change_feed_path(self) -> Optional[Path]:
+        return self.data_dir / CHANGE_FEED_FILENAME
+
+    def compact(self) -> int:
+        return sum(
+            shard.journal.compact(shard.path)
+            for shard in map(self._ensure_shard_exists, self._client_shards.current().shards)
+        )
+
+    def close(self) -> None:
+        self._request_log.close()
@@ -1,55 +1,203 @@
 """
-Gerenciador de dados CSV para o sistema bancário.
-Responsável por leitura e escrita de dados de clientes, scores e solicitações.
+Gerenciador de dados para o sistema bancário.
+Responsável por leitura e escrita de dados de clientes, scores e solicitações,
+delegando a persistência à engine de armazenamento configurada (CSV ou SQLite).
 """
 
-import csv
 import os
+import random
+import threading
+import time
 from datetime import datetime
+from functools import partial
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from tools.bloom_filter import KnownCpfFilter
+from tools.change_feed import ChangeFeed, ChangeSubscription
+from tools.client_journal import CAMPOS_ATUALIZAVEIS, normalize_updates
+from tools.request_rollup import retention_cutoff
+from tools.request_stats import RequestAggregates, RequestStats, band_label, build_aggregates
+from tools.storage import (
+    VERSION_FIELD,
+    Statuses,
+    StorageBackend,
+    Timestamp,
+    VersionConflictError,
+    create_backend,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from tools.portfolio import PortfolioSnapshot
 
 DATA_DIR = Path(__file__).parent.parent / "data"
 
+# Tentativas de update_client_with_retry quando outra sessão altera o
+# mesmo cliente entre a leitura e a gravação
+VERSION_CONFLICT_RETRIES = int(os.getenv("BANCO_VERSION_RETRIES", "3"))
+
+# Espera base (ms) antes de reler um cliente após um conflito de versão;
+# dobra a cada tentativa, com variação aleatória entre as sessões
+VERSION_RETRY_BACKOFF_MS = float(os.getenv("BANCO_VERSION_RETRY_BACKOFF_MS", "5"))
+
+# Resultados de update_client_with_retry
+UPDATE_APPLIED = "gravado"
+# calcular desistiu da alteração sobre os dados atuais do cliente
+UPDATE_DECLINED = "recusado"
+# Outra sessão alterou o cliente em todas as tentativas
+UPDATE_CONFLICT = "conflito"
+UPDATE_NOT_FOUND = "nao_encontrado"
+UPDATE_ERROR = "erro"
+
+# Engine de armazenamento compartilhada por todo o processo
+_backend: Optional[StorageBackend] = None
+_backend_lock = threading.Lock()
+
+# Snapshot colunar da carteira, descartado a cada escrita em clientes
+_portfolio: Optional["PortfolioSnapshot"] = None
+
+# Assinatura do feed usada para descartar o snapshot da carteira quando
+# outros processos alteram clientes
+_portfolio_changes: Optional[ChangeSubscription] = None
+
+# Feed de alterações de clientes da engine atual
+_change_feed: Optional[ChangeFeed] = None
+
+# Filtro de Bloom dos CPFs cadastrados, consultado antes da engine
+_known_cpfs = KnownCpfFilter()
+
+# Estatísticas materializadas das solicitações da engine atual
+_request_stats: Optional[RequestStats] = None
+_request_stats_lock = threading.Lock()
+
 
 class DataManager:
-    """Gerencia operações com arquivos CSV."""
+    """Gerencia operações de dados sobre a engine de armazenamento."""
+
+    @staticmethod
+    def get_backend() -> StorageBackend:
+        """Retorna a engine de armazenamento, criando-a no primeiro acesso."""
+        global _backend
+        if _backend is None:
+            with _backend_lock:
+                if _backend is None:
+                    _backend = create_backend(DATA_DIR)
+        return _backend
+
+    @staticmethod
+    def set_backend(backend: Optional[StorageBackend]) -> None:
+        """
+        Substitui a engine de armazenamento do processo.
+
+        Args:
+            backend: Nova engine, ou None para recriar a partir da configuração
+        """
+        global _backend, _request_stats, _change_feed
+        with _backend_lock:
+            _backend = backend
+            _change_feed = None
+        DataManager._invalidate_portfolio()
+        _known_cpfs.invalidate()
+
+        with _request_stats_lock:
+            stats, _request_stats = _request_stats, None
+        if stats is not None:
+            stats.close()
+
+    @staticmethod
+    def _invalidate_portfolio() -> None:
+        """Descarta o snapshot colunar da carteira."""
+        global _portfolio
+        _portfolio = None
+
+    @staticmethod
+    def _get_change_feed() -> Optional[ChangeFeed]:
+        """Feed de alterações da engine atual (None se a engine não publica)."""
+        global _change_feed
+        feed = _change_feed
+        if feed is None:
+            path = DataManager.get_backend().change_feed_path()
+            if path is None:
+                return None
+            feed = _change_feed = ChangeFeed(path)
+        return feed
+
+    @staticmethod
+    def _publish_changes(
+        alteracoes: Mapping[str, Mapping[str, float]],
+        versoes: Optional[Mapping[str, int]] = None
+    ) -> None:
+        """
+        Publica no feed alterações já gravadas na engine, com a versão
+        resultante de cada registro quando conhecida.
+
+        Uma falha aqui não desfaz a alteração; apenas os assinantes deixam
+        de ser avisados dela.
+        """
+        try:
+            feed = DataManager._get_change_feed()
+            if feed is not None:
+                feed.publish(alteracoes, versoes)
+        except Exception as e:
+            print(f"Erro ao publicar alterações de clientes: {e}")
 
     @staticmethod
-    def _ensure_file_exists(filename: str) -> Path:
-        """Garante que o arquivo existe."""
-        filepath = DATA_DIR / filename
-        if not filepath.exists():
-            raise FileNotFoundError(f"Arquivo não encontrado: {filepath}")
-        return filepath
+    def subscribe_changes(desde: Optional[int] = None) -> Optional[ChangeSubscription]:
+        """
+        Assina o feed de alterações de clientes (score e limite), publicado
+        por todos os processos que usam a mesma base.
+
+        Args:
+            desde: Último número de sequência já processado; None para
+                receber apenas as alterações feitas a partir de agora
+
+        Returns:
+            ChangeSubscription (use poll() para obter os eventos novos), ou
+            None se a engine não publica alterações ou em caso de erro
+        """
+        try:
+            feed = DataManager._get_change_feed()
+            return feed.subscribe(desde) if feed is not None else None
+        except Exception as e:
+            print(f"Erro ao assinar alterações de clientes: {e}")
+            return None
 
     @staticmethod
     def authenticate_client(cpf: str, data_nascimento: str) -> Optional[Dict]:
         """
         Autentica um cliente verificando CPF e data de nascimento.
-        
+
+        CPFs ausentes do filtro de Bloom da base são rejeitados em memória,
+        sem consultar a engine de armazenamento.
+
         Args:
             cpf: CPF do cliente (formato: 11 dígitos)
             data_nascimento: Data de nascimento (formato: YYYY-MM-DD)
-            
+
         Returns:
             Dict com dados do cliente se autenticado, None caso contrário
         """
         try:
-            filepath = DataManager._ensure_file_exists("clientes.csv")
-            
-            with open(filepath, "r", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    if row["cpf"] == cpf and row["data_nascimento"] == data_nascimento:
-                        return {
-                            "cpf": row["cpf"],
-                            "nome": row["nome"],
-                            "limite_credito": float(row["limite_credito"]),
-                            "score_credito": float(row["score_credito"]),
-                            "data_nascimento": row["data_nascimento"],
-                        }
-            return None
+            backend = DataManager.get_backend()
+            # CPF certamente inexistente: rejeita sem consultar a engine
+            if not _known_cpfs.might_exist(backend, cpf):
+                return None
+            cliente = backend.authenticate_client(cpf, data_nascimento)
+            if cliente is not None:
+                _known_cpfs.confirm(cpf)
+            return cliente
         except Exception as e:
             print(f"Erro ao autenticar cliente: {e}")
             return None
@@ -58,122 +206,334 @@ class DataManager:
     def get_client_by_cpf(cpf: str) -> Optional[Dict]:
         """Obtém dados do cliente pelo CPF."""
         try:
-            filepath = DataManager._ensure_file_exists("clientes.csv")
-            
-            with open(filepath, "r", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    if row["cpf"] == cpf:
-                        return {
-                            "cpf": row["cpf"],
-                            "nome": row["nome"],
-                            "limite_credito": float(row["limite_credito"]),
-                            "score_credito": float(row["score_credito"]),
-                            "data_nascimento": row["data_nascimento"],
-                        }
-            return None
+            backend = DataManager.get_backend()
+            if not _known_cpfs.might_exist(backend, cpf):
+                return None
+            cliente = backend.get_client_by_cpf(cpf)
+            if cliente is not None:
+                _known_cpfs.confirm(cpf)
+            return cliente
         except Exception as e:
             print(f"Erro ao obter cliente: {e}")
             return None
 
     @staticmethod
-    def update_client_score(cpf: str, novo_score: float) -> bool:
+    def iter_clients(fields: Optional[Sequence[str]] = None) -> Iterator[Tuple]:
+        """
+        Percorre toda a base de clientes para processamentos em lote.
+
+        Args:
+            fields: Campos desejados, na ordem de saída (padrão: todos)
+
+        Yields:
+            Tupla com os valores dos campos de cada cliente
+        """
+        try:
+            yield from DataManager.get_backend().iter_clients(fields)
+        except Exception as e:
+            print(f"Erro ao percorrer clientes: {e}")
+
+    @staticmethod
+    def update_client_score(
+        cpf: str,
+        novo_score: float,
+        versao_esperada: Optional[int] = None
+    ) -> bool:
         """
         Atualiza o score de crédito do cliente.
-        
+
         Args:
             cpf: CPF do cliente
             novo_score: Novo score de crédito (0-1000)
-            
-        Returns:
-            True se atualizado com sucesso, False caso contrário
-        """
-        try:
-            filepath = DataManager._ensure_file_exists("clientes.csv")
-            
-            # Lê todos os dados
-            rows = []
-            with open(filepath, "r", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    if row["cpf"] == cpf:
-                        row["score_credito"] = str(novo_score)
-                    rows.append(row)
-            
-            # Escreve os dados atualizados
-            with open(filepath, "w", encoding="utf-8", newline="") as f:
-                fieldnames = ["cpf", "data_nascimento", "nome", "limite_credito", "score_credito"]
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(rows)
-            
+            versao_esperada: Grava apenas se o cliente ainda estiver nesta
+                versão (campo "versao" dos dados lidos)
+
+        Returns:
+            True se atualizado com sucesso, False caso contrário (inclusive
+            em conflito de versão ou cliente inexistente)
+        """
+        try:
+            versao = DataManager.get_backend().update_client_score(cpf, novo_score, versao_esperada)
+            if versao is None:
+                return False
+            DataManager._invalidate_portfolio()
+            DataManager._publish_changes({cpf: {"score_credito": float(novo_score)}}, {cpf: versao})
             return True
         except Exception as e:
             print(f"Erro ao atualizar score: {e}")
             return False
 
     @staticmethod
-    def update_client_limit(cpf: str, novo_limite: float) -> bool:
+    def update_client_limit(
+        cpf: str,
+        novo_limite: float,
+        versao_esperada: Optional[int] = None
+    ) -> bool:
         """
         Atualiza o limite de crédito do cliente.
 
         Args:
             cpf: CPF do cliente
             novo_limite: Novo limite de crédito
+            versao_esperada: Grava apenas se o cliente ainda estiver nesta
+                versão (campo "versao" dos dados lidos)
 
         Returns:
-            True se atualizado com sucesso, False caso contrário
+            True se atualizado com sucesso, False caso contrário (inclusive
+            em conflito de versão ou cliente inexistente)
         """
         try:
-            filepath = DataManager._ensure_file_exists("clientes.csv")
-
-            # Lê todos os dados
-            rows = []
-            with open(filepath, "r", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    if row["cpf"] == cpf:
-                        row["limite_credito"] = str(novo_limite)
-                    rows.append(row)
-
-            # Escreve os dados atualizados
-            with open(filepath, "w", encoding="utf-8", newline="") as f:
-                fieldnames = ["cpf", "data_nascimento", "nome", "limite_credito", "score_credito"]
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(rows)
-
+            versao = DataManager.get_backend().update_client_limit(cpf, novo_limite, versao_esperada)
+            if versao is None:
+                return False
+            DataManager._invalidate_portfolio()
+            DataManager._publish_changes({cpf: {"limite_credito": float(novo_limite)}}, {cpf: versao})
             return True
         except Exception as e:
             print(f"Erro ao atualizar limite: {e}")
             return False
 
     @staticmethod
-    def get_limit_by_score(score: float) -> Optional[float]:
+    def update_client_with_retry(
+        cpf: str,
+        campo: str,
+        calcular: Callable[[Dict], Optional[float]],
+        cliente: Optional[Dict] = None,
+        tentativas: int = VERSION_CONFLICT_RETRIES
+    ) -> Tuple[str, Optional[Dict]]:
+        """
+        Lê, recalcula e grava score ou limite com controle otimista.
+
+        O novo valor é calculado sobre os dados lidos do cliente e gravado
+        apenas se o registro ainda estiver na versão lida. Se outra sessão
+        o alterou nesse meio tempo, o cliente é relido (após uma espera
+        crescente, com variação aleatória) e o valor recalculado, sem
+        bloquear as demais sessões. As releituras usam get_current_client,
+        que reflete a escrita que causou o conflito.
+
+        Args:
+            cpf: CPF do cliente
+            campo: "score_credito" ou "limite_credito"
+            calcular: Recebe os dados atuais do cliente e retorna o novo
+                valor do campo, ou None para desistir da alteração
+            cliente: Dados já lidos (com "versao"), usados na primeira
+                tentativa em vez de uma nova leitura
+            tentativas: Máximo de gravações tentadas
+
+        Returns:
+            (resultado, cliente): UPDATE_APPLIED com os dados após a
+            gravação; UPDATE_DECLINED (calcular desistiu) ou
+            UPDATE_CONFLICT (conflito em todas as tentativas) com os
+            dados mais recentes lidos; UPDATE_NOT_FOUND ou UPDATE_ERROR
+            com None
+        """
+        try:
+            if campo not in CAMPOS_ATUALIZAVEIS:
+                raise ValueError(f"Campo não atualizável: {campo}")
+            backend = DataManager.get_backend()
+            gravar = (
+                backend.update_client_score if campo == "score_credito"
+                else backend.update_client_limit
+            )
+
+            for tentativa in range(max(1, tentativas)):
+                if cliente is None or VERSION_FIELD not in cliente:
+                    cliente = backend.get_current_client(cpf)
+                    if cliente is None:
+                        return UPDATE_NOT_FOUND, None
+                valor = calcular(cliente)
+                if valor is None:
+                    return UPDATE_DECLINED, cliente
+                try:
+                    versao = gravar(cpf, valor, cliente[VERSION_FIELD])
+                except VersionConflictError:
+                    # Alterado por outra sessão: espera, relê e recalcula
+                    cliente = None
+                    if tentativa + 1 < tentativas:
+                        espera = VERSION_RETRY_BACKOFF_MS / 1000 * 2 ** tentativa
+                        time.sleep(random.uniform(0, espera))
+                    continue
+                if versao is None:
+                    # Cliente removido da base entre a leitura e a gravação
+                    return UPDATE_NOT_FOUND, None
+                DataManager._invalidate_portfolio()
+                DataManager._publish_changes({cpf: {campo: float(valor)}}, {cpf: versao})
+                return UPDATE_APPLIED, {**cliente, campo: float(valor), VERSION_FIELD: versao}
+
+            print(f"Conflito de versão persistente ao atualizar {campo} do cliente {cpf}")
+            return UPDATE_CONFLICT, backend.get_current_client(cpf)
+        except Exception as e:
+            print(f"Erro ao atualizar {campo}: {e}")
+            return UPDATE_ERROR, None
+
+    @staticmethod
+    def bulk_update(mapping: Mapping[str, Mapping[str, float]]) -> Optional[List[str]]:
+        """
+        Atualiza score e/ou limite de vários clientes de uma só vez.
+
+        Na engine CSV, a base é reescrita em uma única passada; na SQLite,
+        o lote é gravado em uma única transação. Em ambos os casos a
+        operação é atômica: ou todo o lote é aplicado, ou nada é. Com a
+        base CSV particionada, a atomicidade vale para cada shard.
+
+        Args:
+            mapping: Mapeamento {cpf: {campo: valor}}, com campos
+                "score_credito" e/ou "limite_credito". Ex:
+                {"12345678901": {"score_credito": 720, "limite_credito": 15000}}
+
+        Returns:
+            Lista (ordenada) dos CPFs não encontrados, vazia se todos
+            existirem, ou None em caso de erro (nada foi gravado)
+        """
+        try:
+            lote = normalize_updates(mapping)
+            nao_encontrados = DataManager.get_backend().bulk_update(lote)
+            DataManager._invalidate_portfolio()
+
+            ignorados = set(nao_encontrados)
+            DataManager._publish_changes({
+                cpf: campos for cpf, campos in lote.items()
+                if campos and cpf not in ignorados
+            })
+            return nao_encontrados
+        except Exception as e:
+            print(f"Erro ao atualizar clientes em lote: {e}")
+            return None
+
+    @staticmethod
+    def rescore_clients(
+        funcao: Callable[["pd.DataFrame"], Mapping[str, Mapping[str, float]]],
+        fields: Optional[Sequence[str]] = None
+    ) -> Optional[int]:
+        """
+        Recalcula score e/ou limite da carteira inteira em lote.
+
+        funcao recebe uma partição da base (DataFrame com os campos pedidos)
+        e retorna as alterações no formato de bulk_update. Com a base
+        particionada, cada partição é processada e gravada por um processo
+        (funcao deve ser uma função de módulo ou functools.partial de uma),
+        e cada partição é gravada atomicamente.
+
+        Args:
+            funcao: Cálculo das alterações de uma partição
+            fields: Campos da base passados a funcao (padrão: todos)
+
+        Returns:
+            Número de clientes alterados, ou None em caso de erro
+        """
+        try:
+            alteracoes = DataManager.get_backend().update_client_partitions(funcao, fields)
+            DataManager._invalidate_portfolio()
+            DataManager._publish_changes(alteracoes)
+            return len(alteracoes)
+        except Exception as e:
+            print(f"Erro ao recalcular carteira: {e}")
+            return None
+
+    @staticmethod
+    def compact_client_journal() -> int:
+        """
+        Executa a manutenção da engine (na engine CSV, incorpora o journal
+        de atualizações em clientes.csv).
+
+        Returns:
+            Número de registros incorporados (0 em caso de erro)
+        """
+        try:
+            return DataManager.get_backend().compact()
+        except Exception as e:
+            print(f"Erro ao compactar journal de clientes: {e}")
+            return 0
+
+    @staticmethod
+    def get_limit_by_score(score: float, produto: Optional[str] = None) -> Optional[float]:
         """
         Obtém o limite de crédito máximo permitido para um score.
-        
+
         Args:
             score: Score de crédito do cliente (0-1000)
-            
+            produto: Produto de crédito, quando a política tiver a coluna
+                "produto" (padrão: faixas sem produto)
+
         Returns:
             Limite máximo permitido ou None se score inválido
         """
         try:
-            filepath = DataManager._ensure_file_exists("score_limite.csv")
-            
-            with open(filepath, "r", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    score_min = float(row["score_minimo"])
-                    score_max = float(row["score_maximo"])
-                    if score_min <= score <= score_max:
-                        return float(row["limite_maximo"])
-            return None
+            return DataManager.get_backend().get_limit_by_score(score, produto)
         except Exception as e:
             print(f"Erro ao obter limite por score: {e}")
             return None
 
+    @staticmethod
+    def get_portfolio_snapshot() -> Optional["PortfolioSnapshot"]:
+        """
+        Obtém o snapshot colunar da carteira (CPF, limite, score, nascimento).
+
+        O snapshot fica em cache até a próxima atualização de score ou
+        limite, feita por este ou por outro processo (via feed de alterações).
+
+        Returns:
+            PortfolioSnapshot ou None em caso de erro
+        """
+        global _portfolio, _portfolio_changes
+        try:
+            snapshot = _portfolio
+            alteracoes = _portfolio_changes
+            if snapshot is not None and alteracoes is not None and alteracoes.poll():
+                snapshot = None
+
+            if snapshot is None:
+                # Importação tardia: NumPy/pandas só são carregados quando usados
+                from tools.portfolio import SNAPSHOT_FIELDS, PortfolioSnapshot
+
+                # Assina antes de ler: alterações durante a leitura descartam o snapshot
+                _portfolio_changes = DataManager.subscribe_changes()
+                snapshot = PortfolioSnapshot.from_frames(
+                    DataManager.get_backend().iter_client_frames(SNAPSHOT_FIELDS)
+                )
+                _portfolio = snapshot
+            return snapshot
+        except Exception as e:
+            print(f"Erro ao montar snapshot da carteira: {e}")
+            return None
+
+    @staticmethod
+    def get_exposure_by_score_band(produto: Optional[str] = None) -> Optional["pd.DataFrame"]:
+        """
+        Calcula a exposição da carteira por faixa de score da política.
+
+        Usa o snapshot da carteira; com a base particionada e sem snapshot
+        em cache, as partições são varridas em paralelo.
+
+        Args:
+            produto: Produto de crédito cujas faixas serão usadas
+
+        Returns:
+            DataFrame por faixa (clientes, exposição, utilização média)
+            ou None em caso de erro
+        """
+        try:
+            backend = DataManager.get_backend()
+            faixas = backend.get_score_bands(produto)
+            if _portfolio is None and backend.client_partitions() > 1:
+                from tools.portfolio import exposure_table, partition_band_totals
+
+                partes = backend.map_client_partitions(
+                    partial(partition_band_totals, faixas=faixas),
+                    ["limite_credito", "score_credito"],
+                )
+                clientes = sum(parte[0] for parte in partes)
+                exposicao = sum(parte[1] for parte in partes)
+                return exposure_table(faixas, clientes, exposicao)
+
+            snapshot = DataManager.get_portfolio_snapshot()
+            if snapshot is None:
+                return None
+            return snapshot.exposure_by_score_band(faixas)
+        except Exception as e:
+            print(f"Erro ao calcular exposição por faixa: {e}")
+            return None
+
     @staticmethod
     def register_limit_request(
         cpf: str,
@@ -183,65 +543,314 @@ class DataManager:
     ) -> bool:
         """
         Registra uma solicitação de aumento de limite.
-        
+
         Args:
             cpf: CPF do cliente
             limite_atual: Limite atual de crédito
             novo_limite: Novo limite solicitado
             status: Status da solicitação (pendente, aprovado, rejeitado)
-            
+
         Returns:
             True se registrado com sucesso, False caso contrário
         """
         try:
-            filepath = DataManager._ensure_file_exists("solicitacoes_aumento_limite.csv")
-            
+            # Obtidas antes do registro: se forem criadas agora a partir do
+            # histórico, a nova solicitação não pode ser contada duas vezes
+            stats = DataManager._get_request_stats()
+        except Exception as e:
+            print(f"Erro ao carregar estatísticas de solicitações: {e}")
+            stats = None
+
+        try:
             # ISO 8601 timestamp
             timestamp = datetime.now().isoformat()
-            
-            # Verifica se o arquivo está vazio (apenas cabeçalho)
-            file_empty = os.path.getsize(filepath) <= 50
-            
-            with open(filepath, "a", encoding="utf-8", newline="") as f:
-                fieldnames = [
-                    "cpf_cliente",
-                    "data_hora_solicitacao",
-                    "limite_atual",
-                    "novo_limite_solicitado",
-                    "status_pedido"
-                ]
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                
-                # Escreve cabeçalho se arquivo vazio
-                if file_empty:
-                    writer.writeheader()
-                
-                writer.writerow({
-                    "cpf_cliente": cpf,
-                    "data_hora_solicitacao": timestamp,
-                    "limite_atual": limite_atual,
-                    "novo_limite_solicitado": novo_limite,
-                    "status_pedido": status
-                })
-            
-            return True
+
+            backend = DataManager.get_backend()
+            backend.register_limit_request(
+                cpf, limite_atual, novo_limite, status, timestamp
+            )
         except Exception as e:
             print(f"Erro ao registrar solicitação: {e}")
             return False
 
+        # A solicitação já está no histórico: uma falha aqui não a desfaz
+        # (as estatísticas podem ser reconstruídas com rebuild_request_stats)
+        if stats is not None:
+            try:
+                cliente = backend.get_client_by_cpf(cpf)
+                faixa = band_label(
+                    backend.get_score_bands(),
+                    cliente["score_credito"] if cliente else None
+                )
+                stats.record(faixa, status, timestamp, float(limite_atual), float(novo_limite))
+            except Exception as e:
+                print(f"Erro ao atualizar estatísticas de solicitações: {e}")
+        return True
+
     @staticmethod
     def get_all_requests() -> List[Dict]:
-        """Obtém todas as solicitações de aumento de limite."""
-        try:
-            filepath = DataManager._ensure_file_exists("solicitacoes_aumento_limite.csv")
-            
-            requests = []
-            with open(filepath, "r", encoding="utf-8") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    if row.get("cpf_cliente"):  # Ignora linhas vazias
-                        requests.append(row)
-            return requests
+        """
+        Obtém todas as solicitações de aumento de limite mantidas linha a
+        linha. As já compactadas entram apenas nos resumos de
+        get_request_summaries.
+        """
+        try:
+            return DataManager.get_backend().get_all_requests()
         except Exception as e:
             print(f"Erro ao obter solicitações: {e}")
             return []
+
+    @staticmethod
+    def iter_requests(
+        *,
+        cpf: Optional[str] = None,
+        status: Statuses = None,
+        inicio: Timestamp = None,
+        fim: Timestamp = None,
+        valor_min: Optional[float] = None,
+        valor_max: Optional[float] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[Dict]:
+        """
+        Consulta as solicitações de aumento de limite em fluxo.
+
+        Os filtros são aplicados durante a leitura e a consulta para ao
+        atingir o limite, sem montar a lista completa em memória. Apenas
+        as solicitações mantidas linha a linha são percorridas; o histórico
+        completo, com os meses compactados, está em get_request_summaries.
+
+        Args:
+            cpf: CPF do cliente
+            status: Status aceito (ex: "aprovado") ou coleção de status
+            inicio: Início do período (inclusivo), como texto ISO 8601,
+                date ou datetime
+            fim: Fim do período (inclusivo); uma data sem horário cobre o
+                dia inteiro
+            valor_min: Menor novo limite solicitado
+            valor_max: Maior novo limite solicitado
+            limit: Número máximo de solicitações
+
+        Yields:
+            Solicitações em ordem cronológica (valores como texto)
+        """
+        try:
+            yield from DataManager.get_backend().iter_requests(
+                cpf=cpf,
+                status=status,
+                inicio=inicio,
+                fim=fim,
+                valor_min=valor_min,
+                valor_max=valor_max,
+                limit=limit,
+            )
+        except Exception as e:
+            print(f"Erro ao consultar solicitações: {e}")
+
+    @staticmethod
+    def get_requests_by_period(inicio: Timestamp = None, fim: Timestamp = None) -> List[Dict]:
+        """
+        Obtém as solicitações de aumento de limite feitas em um período.
+
+        Na engine CSV, apenas os segmentos do histórico que se sobrepõem
+        ao período são lidos.
+
+        Args:
+            inicio: Início do período (inclusivo), como texto ISO 8601,
+                date ou datetime; None para sem limite
+            fim: Fim do período (inclusivo); uma data sem horário cobre o
+                dia inteiro; None para sem limite
+
+        Returns:
+            Lista de solicitações em ordem cronológica (sem as já
+            compactadas; ver get_request_summaries)
+        """
+        try:
+            return DataManager.get_backend().get_requests_by_period(inicio, fim)
+        except Exception as e:
+            print(f"Erro ao obter solicitações do período: {e}")
+            return []
+
+    @staticmethod
+    def _build_request_aggregates(backend: StorageBackend) -> RequestAggregates:
+        """Recalcula os agregados das solicitações percorrendo o histórico."""
+
+        def score_of(cpf: str) -> Optional[float]:
+            cliente = backend.get_client_by_cpf(cpf)
+            return cliente["score_credito"] if cliente else None
+
+        return build_aggregates(
+            backend.iter_requests(),
+            backend.get_score_bands(),
+            score_of,
+            backend.iter_request_rollups(),
+            backend.rollup_hourly_volume(),
+        )
+
+    @staticmethod
+    def _get_request_stats() -> RequestStats:
+        """Estatísticas da engine atual, criadas a partir do histórico se necessário."""
+        global _request_stats
+        stats = _request_stats
+        if stats is None:
+            with _request_stats_lock:
+                stats = _request_stats
+                if stats is None:
+                    backend = DataManager.get_backend()
+                    stats = RequestStats(backend.request_stats_path())
+                    if not stats.exists():
+                        # Primeira execução: materializa o histórico existente
+                        stats.replace(DataManager._build_request_aggregates(backend))
+                    _request_stats = stats
+        return stats
+
+    @staticmethod
+    def get_request_stats(faixa: Optional[str] = None) -> Optional[Dict]:
+        """
+        Obtém as estatísticas das solicitações de aumento de limite sem
+        percorrer o histórico (agregados atualizados a cada solicitação).
+
+        Args:
+            faixa: Faixa de score da política, como "501-600" (ver
+                get_request_stats_by_band); None para todas as solicitações
+
+        Returns:
+            Dicionário com solicitacoes, por_status, taxa_aprovacao,
+            limite_atual_medio, solicitado_medio, concedido_medio (média
+            das aprovadas) e quantis estimados solicitado_p50/solicitado_p90,
+            ou None em caso de erro
+        """
+        try:
+            return DataManager._get_request_stats().summary(faixa)
+        except Exception as e:
+            print(f"Erro ao obter estatísticas de solicitações: {e}")
+            return None
+
+    @staticmethod
+    def get_request_stats_by_band() -> Dict[str, Dict]:
+        """
+        Obtém as estatísticas das solicitações por faixa de score do cliente
+        no momento da solicitação.
+
+        Returns:
+            Dicionário {faixa: estatísticas} (formato de get_request_stats)
+        """
+        try:
+            return DataManager._get_request_stats().summary_by_band()
+        except Exception as e:
+            print(f"Erro ao obter estatísticas por faixa: {e}")
+            return {}
+
+    @staticmethod
+    def get_request_volume_by_hour(inicio: Timestamp = None, fim: Timestamp = None) -> Dict[str, int]:
+        """
+        Obtém o número de solicitações por hora.
+
+        Args:
+            inicio: Início do período (inclusivo); None para sem limite
+            fim: Fim do período (inclusivo); None para sem limite
+
+        Returns:
+            Dicionário {"AAAA-MM-DDTHH": quantidade} em ordem cronológica
+        """
+        try:
+            return DataManager._get_request_stats().volume_by_hour(inicio, fim)
+        except Exception as e:
+            print(f"Erro ao obter volume de solicitações por hora: {e}")
+            return {}
+
+    @staticmethod
+    def verify_request_stats() -> Optional[bool]:
+        """
+        Confere as estatísticas materializadas contra o histórico completo.
+
+        O histórico não guarda o score do cliente na hora da solicitação e
+        a reconstrução usaria o score atual; por isso apenas os agregados
+        que não dependem da faixa são conferidos (totais por status, volume
+        por hora e esboço geral), e uma alteração de score não gera
+        divergência. Períodos compactados só têm os resumos, então os
+        quantis não são conferidos quando existem.
+
+        Returns:
+            True se conferem, False se divergem, None em caso de erro
+        """
+        try:
+            backend = DataManager.get_backend()
+            stats = DataManager._get_request_stats()
+            stats.flush()
+            reconstruido = DataManager._build_request_aggregates(backend)
+            compactado = next(backend.iter_request_rollups(), None) is not None
+            return stats.aggregates().without_bands().matches(
+                reconstruido.without_bands(), esbocos_exatos=not compactado
+            )
+        except Exception as e:
+            print(f"Erro ao verificar estatísticas de solicitações: {e}")
+            return None
+
+    @staticmethod
+    def compact_request_log(retencao_dias: Optional[int] = None) -> int:
+        """
+        Resume por cliente, mês e status as solicitações anteriores à
+        janela de retenção e as remove do histórico linha a linha.
+
+        As estatísticas materializadas não mudam: as solicitações
+        continuam contabilizadas, agora a partir dos resumos.
+
+        Args:
+            retencao_dias: Dias mantidos linha a linha (padrão:
+                BANCO_REQUESTS_RETENTION_DAYS)
+
+        Returns:
+            Número de solicitações resumidas (0 em caso de erro)
+        """
+        try:
+            if retencao_dias is None:
+                corte = retention_cutoff()
+            else:
+                corte = retention_cutoff(retencao_dias)
+            return DataManager.get_backend().compact_requests(corte)
+        except Exception as e:
+            print(f"Erro ao compactar histórico de solicitações: {e}")
+            return 0
+
+    @staticmethod
+    def get_request_summaries(
+        cpf: Optional[str] = None,
+        inicio: Timestamp = None,
+        fim: Timestamp = None
+    ) -> List[Dict]:
+        """
+        Obtém os resumos mensais das solicitações de todo o histórico,
+        incluindo os períodos já compactados.
+
+        Args:
+            cpf: CPF do cliente; None para todos
+            inicio: Início do período (inclusivo); None para sem limite
+            fim: Fim do período (inclusivo); None para sem limite
+
+        Returns:
+            Lista de resumos (mes, cpf_cliente, status_pedido, quantidade,
+            soma_limite_atual, soma_novo_limite, primeira_solicitacao,
+            ultima_solicitacao) em ordem de mês, CPF e status
+        """
+        try:
+            backend = DataManager.get_backend()
+            return list(backend.iter_request_summaries(cpf=cpf, inicio=inicio, fim=fim))
+        except Exception as e:
+            print(f"Erro ao obter resumos de solicitações: {e}")
+            return []
+
+    @staticmethod
+    def rebuild_request_stats() -> bool:
+        """
+        Reconstrói as estatísticas materializadas a partir do histórico.
+
+        Returns:
+            True se reconstruídas com sucesso, False caso contrário
+        """
+        try:
+            agregados = DataManager._build_request_aggregates(DataManager.get_backend())
+            DataManager._get_request_stats().replace(agregados)
+            return True
+        except Exception as e:
+            print(f"Erro ao reconstruir estatísticas de solicitações: {e}")
+            return False
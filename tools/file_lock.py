@@ -0,0 +1,95 @@
+"""
+Lock consultivo entre processos baseado em arquivo.
+Serializa operações de escrita quando a aplicação roda em vários
+processos (ex: múltiplos workers do Streamlit) sobre os mesmos arquivos.
+Leitores não usam o lock: continuam lendo a última versão gravada.
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+# Tempo máximo (segundos) de espera por um lock de escrita
+LOCK_TIMEOUT_S = float(os.getenv("BANCO_LOCK_TIMEOUT_S", "10"))
+
+# Intervalo entre tentativas de obter o lock
+_POLL_INTERVAL = 0.005
+
+
+class FileLock:
+    """
+    Lock exclusivo entre processos (flock) e reentrante entre threads.
+
+    Em plataformas sem fcntl, protege apenas as threads do processo atual.
+    """
+
+    def __init__(self, target: Path, timeout: float = LOCK_TIMEOUT_S):
+        target = Path(target)
+        self.path = target.with_name(target.name + ".lock")
+        self.timeout = timeout
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def acquire(self) -> None:
+        """
+        Obtém o lock, esperando no máximo self.timeout segundos.
+
+        Raises:
+            TimeoutError: Se o lock não for obtido dentro do prazo
+        """
+        deadline = time.monotonic() + self.timeout
+        if not self._thread_lock.acquire(timeout=self.timeout):
+            raise TimeoutError(f"Tempo esgotado aguardando lock: {self.path}")
+
+        if self._depth > 0:
+            self._depth += 1
+            return
+
+        try:
+            self._acquire_file(deadline)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        self._depth = 1
+
+    def _acquire_file(self, deadline: float) -> None:
+        """Obtém o flock sobre o arquivo .lock até o prazo."""
+        if fcntl is None:
+            return
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self._fd = fd
+                return
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    os.close(fd)
+                    raise TimeoutError(f"Tempo esgotado aguardando lock: {self.path}")
+                time.sleep(_POLL_INTERVAL)
+
+    def release(self) -> None:
+        """Libera o lock (o flock só é liberado no último nível de reentrada)."""
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            finally:
+                os.close(self._fd)
+                self._fd = None
+        self._thread_lock.release()
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.release()
@@ -0,0 +1,439 @@
+"""
+Gerador de dados sintéticos para testes de carga.
+
+Gera, no layout usado pela engine CSV, uma base clientes.csv com CPFs
+válidos (dígitos verificadores corretos), scores e limites com
+distribuições realistas, a política score_limite.csv e o histórico de
+solicitações em segmentos diários com manifesto (data/solicitacoes/).
+
+Os atributos de cada cliente são uma função determinística da semente e
+da sua posição na base (hash contador, sem estado), de modo que blocos de
+clientes e dias de solicitações são gerados de forma independente em
+vários processos, com memória limitada ao tamanho de um bloco, e cada
+solicitação referencia um cliente existente com o seu limite atual.
+
+Uso:
+    python -m tools.generate_synthetic_data --saida /tmp/carga \\
+        --clientes 10M --solicitacoes 20M --dias 90 [--workers 8] [--seed 42]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from tools.atomic_file import atomic_write
+from tools.request_log import (
+    MANIFEST_FILENAME,
+    MANIFEST_VERSION,
+    SEGMENT_MAX_BYTES,
+    SEGMENTS_DIRNAME,
+)
+from tools.score_limit_index import PRODUTO_PADRAO, read_policy_csv
+from tools.storage import CLIENT_FIELDNAMES, REQUEST_FIELDNAMES
+
+DEFAULT_POLICY = Path(__file__).parent.parent / "data" / "score_limite.csv"
+
+# Clientes gerados por tarefa (determina a memória de cada processo)
+CHUNK_SIZE = 250_000
+
+# Maior base suportada pela permutação de CPFs (9 dígitos de base)
+MAX_CLIENTS = 500_000_000
+
+# Permutação afim dos 10^9 números-base de CPF (multiplicador primo com 10)
+_CPF_BASES = 10 ** 9
+_CPF_MULT = 387_420_489  # 3^18
+
+# Distribuição dos scores (normal truncada em 0-1000)
+SCORE_MEDIA = 640
+SCORE_DESVIO = 140
+
+# Idade dos clientes na data final, em anos
+IDADE_MIN, IDADE_MAX = 18, 80
+
+# Peso relativo de cada hora do dia (pico em horário comercial e à noite)
+PESOS_HORA = np.array([
+    0.2, 0.1, 0.1, 0.1, 0.1, 0.2, 0.4, 0.8, 1.4, 2.0, 2.4, 2.5,
+    2.3, 2.2, 2.4, 2.4, 2.2, 2.0, 1.8, 1.9, 2.1, 1.8, 1.0, 0.5,
+])
+
+# Peso de sábados e domingos em relação aos dias úteis
+PESO_FIM_DE_SEMANA = 0.6
+
+NOMES = [
+    "Ana", "Beatriz", "Bruna", "Camila", "Carla", "Daniela", "Fernanda", "Gabriela",
+    "Juliana", "Larissa", "Leticia", "Mariana", "Maria", "Patricia", "Renata", "Vanessa",
+    "Andre", "Bruno", "Carlos", "Daniel", "Eduardo", "Felipe", "Gabriel", "Gustavo",
+    "Joao", "Jose", "Lucas", "Marcelo", "Matheus", "Paulo", "Rafael", "Rodrigo",
+]
+SOBRENOMES = [
+    "Almeida", "Alves", "Araujo", "Barbosa", "Cardoso", "Carvalho", "Costa", "Dias",
+    "Ferreira", "Gomes", "Lima", "Martins", "Melo", "Moreira", "Nascimento", "Oliveira",
+    "Pereira", "Ribeiro", "Rocha", "Rodrigues", "Santos", "Silva", "Souza", "Teixeira",
+]
+
+# Campos derivados do hash de cada cliente (um fluxo independente por campo)
+_CAMPO_CPF, _CAMPO_SCORE, _CAMPO_SCORE2, _CAMPO_LIMITE, _CAMPO_NASC, \
+    _CAMPO_NOME, _CAMPO_SOBRENOME1, _CAMPO_SOBRENOME2 = range(8)
+
+_U64 = np.uint64
+
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    """Finalizador splitmix64: espalha os bits de inteiros de 64 bits."""
+    with np.errstate(over="ignore"):
+        x = x + _U64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> _U64(30))) * _U64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> _U64(27))) * _U64(0x94D049BB133111EB)
+    return x ^ (x >> _U64(31))
+
+
+def _hash(indices: np.ndarray, seed: int, campo: int) -> np.ndarray:
+    """Hash de 64 bits de (semente, campo, índice do cliente)."""
+    with np.errstate(over="ignore"):
+        chave = _mix(_U64(seed) * _U64(8) + _U64(campo))
+        return _mix(indices.astype(_U64) ^ chave)
+
+
+def _uniform(indices: np.ndarray, seed: int, campo: int) -> np.ndarray:
+    """Valores uniformes em (0, 1) derivados do hash."""
+    return ((_hash(indices, seed, campo) >> _U64(11)).astype(np.float64) + 0.5) * 2.0 ** -53
+
+
+def cpf_check_digits(bases: np.ndarray) -> np.ndarray:
+    """
+    Completa números-base de 9 dígitos com os dois dígitos verificadores.
+
+    Args:
+        bases: Inteiros entre 0 e 999.999.999
+
+    Returns:
+        CPFs completos como inteiros de 11 dígitos
+    """
+    bases = bases.astype(np.int64)
+    digitos = (bases[:, None] // 10 ** np.arange(8, -1, -1)) % 10
+    d1 = (digitos @ np.arange(10, 1, -1)) * 10 % 11 % 10
+    d2 = ((digitos @ np.arange(11, 2, -1)) + d1 * 2) * 10 % 11 % 10
+    return bases * 100 + d1 * 10 + d2
+
+
+def _cpfs(indices: np.ndarray, seed: int, total: int) -> np.ndarray:
+    """
+    CPFs válidos e distintos dos clientes (permutação dos números-base).
+    Bases com todos os dígitos iguais (inválidas) são trocadas pela base
+    do índice + total, que nenhum outro cliente usa.
+    """
+    deslocamento = int(_hash(np.array([0]), seed, _CAMPO_CPF)[0] % _U64(_CPF_BASES))
+    posicoes = indices.astype(np.int64)
+    while True:
+        bases = (posicoes * _CPF_MULT + deslocamento) % _CPF_BASES
+        repetidas = bases % 111_111_111 == 0
+        if not repetidas.any():
+            return cpf_check_digits(bases)
+        posicoes = np.where(repetidas, posicoes + total, posicoes)
+
+
+class _Politica:
+    """Faixas de score do produto padrão em arrays para busca vetorizada."""
+
+    def __init__(self, faixas: List[Tuple[float, float, float]]):
+        self.minimos = np.array([f[0] for f in faixas])
+        self.maximos = np.array([f[1] for f in faixas])
+        self.limites = np.array([f[2] for f in faixas])
+
+    def limite_maximo(self, scores: np.ndarray) -> np.ndarray:
+        """Limite máximo de cada score (0 fora das faixas)."""
+        i = np.clip(np.searchsorted(self.minimos, scores, side="right") - 1, 0, None)
+        dentro = (scores >= self.minimos[i]) & (scores <= self.maximos[i])
+        return np.where(dentro, self.limites[i], 0.0)
+
+
+def _client_attributes(
+    indices: np.ndarray,
+    seed: int,
+    total: int,
+    politica: _Politica
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """CPF, score e limite de crédito dos clientes nas posições informadas."""
+    cpfs = _cpfs(indices, seed, total)
+
+    # Normal por Box-Muller, truncada em 0-1000
+    u1 = _uniform(indices, seed, _CAMPO_SCORE)
+    u2 = _uniform(indices, seed, _CAMPO_SCORE2)
+    normal = np.sqrt(-2 * np.log(u1)) * np.cos(2 * np.pi * u2)
+    scores = np.clip(np.rint(SCORE_MEDIA + SCORE_DESVIO * normal), 0, 1000)
+
+    # Limite entre 10% e 100% do máximo da faixa, em múltiplos de R$ 100,00
+    teto = np.maximum(politica.limite_maximo(scores), 500.0)
+    uso = 0.1 + 0.9 * _uniform(indices, seed, _CAMPO_LIMITE) ** 1.5
+    limites = np.maximum(np.round(teto * uso / 100) * 100, 500.0)
+    return cpfs, scores, limites
+
+
+def _client_lines(
+    inicio: int,
+    fim: int,
+    seed: int,
+    total: int,
+    politica: _Politica,
+    data_final: date
+) -> List[str]:
+    """Linhas de clientes.csv dos clientes [inicio, fim)."""
+    indices = np.arange(inicio, fim, dtype=np.int64)
+    cpfs, scores, limites = _client_attributes(indices, seed, total, politica)
+
+    primeiro = np.datetime64(data_final - timedelta(days=IDADE_MAX * 365), "D")
+    dias = (IDADE_MAX - IDADE_MIN) * 365
+    nascimentos = primeiro + (_hash(indices, seed, _CAMPO_NASC) % _U64(dias)).astype(np.int64)
+
+    nome = _hash(indices, seed, _CAMPO_NOME) % _U64(len(NOMES))
+    sobrenome1 = _hash(indices, seed, _CAMPO_SOBRENOME1) % _U64(len(SOBRENOMES))
+    sobrenome2 = _hash(indices, seed, _CAMPO_SOBRENOME2) % _U64(len(SOBRENOMES))
+
+    return [
+        f"{cpf:011d},{nasc},{NOMES[n]} {SOBRENOMES[s1]} {SOBRENOMES[s2]},{limite:.1f},{score:.0f},0\n"
+        for cpf, nasc, n, s1, s2, limite, score in zip(
+            cpfs.tolist(),
+            nascimentos.astype(str).tolist(),
+            nome.tolist(),
+            sobrenome1.tolist(),
+            sobrenome2.tolist(),
+            limites.tolist(),
+            scores.tolist(),
+        )
+    ]
+
+
+def _generate_clients_chunk(args: Tuple) -> Tuple[Path, int]:
+    """Tarefa: grava um bloco de clientes em um arquivo parcial."""
+    destino, inicio, fim, seed, total, faixas, data_final = args
+    linhas = _client_lines(inicio, fim, seed, total, _Politica(faixas), data_final)
+    with open(destino, "w", encoding="utf-8", newline="") as f:
+        f.writelines(linhas)
+    return destino, fim - inicio
+
+
+def _generate_requests_day(args: Tuple) -> List[Dict]:
+    """
+    Tarefa: grava as solicitações de um dia, em ordem cronológica, nas
+    partes de segmento do dia (uma hora por vez, para limitar a memória).
+
+    Returns:
+        Entradas do manifesto das partes gravadas
+    """
+    pasta, dia, quantidade, seed, total, faixas, segment_max_bytes = args
+    politica = _Politica(faixas)
+    rng = np.random.default_rng([seed, dia.toordinal()])
+    por_hora = rng.multinomial(quantidade, PESOS_HORA / PESOS_HORA.sum())
+    meia_noite = np.datetime64(dia.isoformat(), "us")
+    cabecalho = ",".join(REQUEST_FIELDNAMES) + "\n"
+
+    entradas: List[Dict] = []
+    f = None
+
+    def nova_parte():
+        nonlocal f
+        if f is not None:
+            f.close()
+        parte = len(entradas) + 1
+        nome = f"{dia.isoformat()}_{parte:03d}.csv"
+        entradas.append({
+            "arquivo": nome,
+            "dia": dia.isoformat(),
+            "parte": parte,
+            "inicio": None,
+            "fim": None,
+            "linhas": 0,
+            "bytes": 0,
+            "selado": True,
+            "comprimido": False,
+        })
+        f = open(pasta / nome, "w", encoding="utf-8", newline="")
+        f.write(cabecalho)
+        entradas[-1]["bytes"] = len(cabecalho)
+
+    nova_parte()
+    for hora, n in enumerate(por_hora.tolist()):
+        if n == 0:
+            continue
+        indices = rng.integers(0, total, n)
+        _, scores, limites = _client_attributes(indices, seed, total, politica)
+
+        # Pedidos de 10% a ~3x acima do limite atual, em múltiplos de R$ 100,00
+        fator = 1.1 + rng.lognormal(-0.7, 0.8, n)
+        novos = np.ceil(limites * fator / 100) * 100
+        aprovado = novos <= politica.limite_maximo(scores)
+
+        micros = np.sort(rng.integers(0, 3_600_000_000, n)) + hora * 3_600_000_000
+        # Clientes sorteados de forma independente: basta ordenar os horários
+        horarios = (meia_noite + micros.astype("timedelta64[us]")).astype(str).tolist()
+
+        cpfs = _cpfs(indices, seed, total).tolist()
+        for cpf, ts, limite, novo, ok in zip(
+            cpfs, horarios, limites.tolist(), novos.tolist(), aprovado.tolist()
+        ):
+            linha = f"{cpf:011d},{ts},{limite:.1f},{novo:.1f},{'aprovado' if ok else 'rejeitado'}\n"
+            entrada = entradas[-1]
+            if entrada["bytes"] >= segment_max_bytes:
+                nova_parte()
+                entrada = entradas[-1]
+            f.write(linha)
+            entrada["bytes"] += len(linha)
+            entrada["linhas"] += 1
+            if entrada["inicio"] is None:
+                entrada["inicio"] = ts
+            entrada["fim"] = ts
+    f.close()
+    return entradas
+
+
+def _daily_counts(total: int, dias: List[date], seed: int) -> List[int]:
+    """Distribui as solicitações entre os dias (menos nos fins de semana)."""
+    pesos = np.array([PESO_FIM_DE_SEMANA if d.weekday() >= 5 else 1.0 for d in dias])
+    rng = np.random.default_rng([seed, 0])
+    return rng.multinomial(total, pesos / pesos.sum()).tolist()
+
+
+def generate(
+    saida: Path,
+    clientes: int,
+    solicitacoes: int,
+    dias: int = 90,
+    data_final: date = None,
+    politica: Path = DEFAULT_POLICY,
+    workers: int = None,
+    seed: int = 42,
+    chunk_size: int = CHUNK_SIZE,
+    segment_max_bytes: int = SEGMENT_MAX_BYTES
+) -> Dict[str, int]:
+    """
+    Gera uma base sintética completa em saida.
+
+    Args:
+        saida: Diretório de destino (não pode conter clientes.csv)
+        clientes: Número de clientes
+        solicitacoes: Número de solicitações de aumento de limite
+        dias: Número de dias cobertos pelo histórico de solicitações
+        data_final: Último dia do histórico (padrão: ontem)
+        politica: score_limite.csv usado para limites e aprovações
+        workers: Processos em paralelo (padrão: número de CPUs)
+        seed: Semente; a mesma semente gera exatamente os mesmos arquivos
+        chunk_size: Clientes por tarefa
+        segment_max_bytes: Tamanho máximo de cada parte de segmento
+
+    Returns:
+        Quantidade de linhas geradas por arquivo
+
+    Raises:
+        FileExistsError: Se saida já contiver uma base
+        ValueError: Se os parâmetros forem inválidos
+    """
+    if not 0 < clientes <= MAX_CLIENTS:
+        raise ValueError(f"Número de clientes deve estar entre 1 e {MAX_CLIENTS}")
+    if solicitacoes < 0 or dias < 1:
+        raise ValueError("Número de solicitações e de dias inválido")
+
+    saida = Path(saida)
+    if (saida / "clientes.csv").exists() or (saida / SEGMENTS_DIRNAME).exists():
+        raise FileExistsError(f"{saida} já contém uma base; use um diretório novo")
+
+    data_final = data_final or date.today() - timedelta(days=1)
+    faixas = read_policy_csv(politica).get(PRODUTO_PADRAO)
+    if faixas is None:
+        raise ValueError(f"{politica} não tem faixas do produto '{PRODUTO_PADRAO}'")
+    faixas = faixas.as_tuples()
+
+    saida.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(politica, saida / "score_limite.csv")
+    temporario = saida / ".gerando"
+    temporario.mkdir(exist_ok=True)
+    pasta_segmentos = saida / SEGMENTS_DIRNAME
+    pasta_segmentos.mkdir()
+
+    totais = {"clientes": 0, "solicitacoes": 0}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        # Clientes: blocos gerados em paralelo e concatenados em ordem,
+        # removendo cada parte assim que copiada
+        tarefas = [
+            (temporario / f"clientes_{i:06d}.csv", inicio, min(inicio + chunk_size, clientes),
+             seed, clientes, faixas, data_final)
+            for i, inicio in enumerate(range(0, clientes, chunk_size))
+        ]
+        with atomic_write(saida / "clientes.csv", newline="") as destino:
+            destino.write(",".join(CLIENT_FIELDNAMES) + "\n")
+            for parte, linhas in pool.map(_generate_clients_chunk, tarefas):
+                with open(parte, "r", encoding="utf-8", newline="") as f:
+                    shutil.copyfileobj(f, destino, 1024 * 1024)
+                parte.unlink()
+                totais["clientes"] += linhas
+
+        # Solicitações: um dia por tarefa, gravado direto no seu segmento
+        calendario = [data_final - timedelta(days=d) for d in range(dias - 1, -1, -1)]
+        tarefas = [
+            (pasta_segmentos, dia, quantidade, seed, clientes, faixas, segment_max_bytes)
+            for dia, quantidade in zip(calendario, _daily_counts(solicitacoes, calendario, seed))
+        ]
+        segmentos = []
+        for entradas in pool.map(_generate_requests_day, tarefas):
+            segmentos.extend(entradas)
+            totais["solicitacoes"] += sum(e["linhas"] for e in entradas)
+
+    with atomic_write(pasta_segmentos / MANIFEST_FILENAME) as f:
+        json.dump({"versao": MANIFEST_VERSION, "segmentos": segmentos}, f, ensure_ascii=False, indent=2)
+    temporario.rmdir()
+    return totais
+
+
+def _quantity(texto: str) -> int:
+    """Converte quantidades como 500k, 10M ou 1_000_000 em inteiro."""
+    texto = texto.strip().lower().replace("_", "")
+    multiplicador = {"k": 10 ** 3, "m": 10 ** 6}.get(texto[-1:], 1)
+    if multiplicador > 1:
+        texto = texto[:-1]
+    return int(float(texto) * multiplicador)
+
+
+def main() -> None:
+    """Ponto de entrada de linha de comando."""
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos do Banco Ágil para testes de carga")
+    parser.add_argument("--saida", type=Path, required=True, help="Diretório de destino (novo)")
+    parser.add_argument("--clientes", type=_quantity, default=1_000_000, help="Ex: 1M, 100M")
+    parser.add_argument("--solicitacoes", type=_quantity, default=None,
+                        help="Padrão: metade do número de clientes")
+    parser.add_argument("--dias", type=int, default=90, help="Dias cobertos pelo histórico")
+    parser.add_argument("--data-final", type=date.fromisoformat, default=None,
+                        help="Último dia do histórico, AAAA-MM-DD (padrão: ontem)")
+    parser.add_argument("--politica", type=Path, default=DEFAULT_POLICY)
+    parser.add_argument("--workers", type=int, default=None, help="Padrão: número de CPUs")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk", type=_quantity, default=CHUNK_SIZE, help="Clientes por tarefa")
+    args = parser.parse_args()
+
+    solicitacoes = args.solicitacoes if args.solicitacoes is not None else args.clientes // 2
+    inicio = time.perf_counter()
+    totais = generate(
+        args.saida,
+        args.clientes,
+        solicitacoes,
+        dias=args.dias,
+        data_final=args.data_final,
+        politica=args.politica,
+        workers=args.workers,
+        seed=args.seed,
+        chunk_size=args.chunk,
+    )
+    duracao = time.perf_counter() - inicio
+    for arquivo, total in totais.items():
+        print(f"✅ {arquivo}: {total:,} linhas")
+    print(f"⏱️  {duracao:.1f}s ({sum(totais.values()) / duracao:,.0f} linhas/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Migração única dos arquivos CSV para o banco SQLite.
+
+Lê clientes.csv (com o journal de atualizações aplicado), score_limite.csv
+e o histórico de solicitações (arquivo legado e segmentos) em blocos de
+colunas tipadas (tools.csv_ingest), inserindo em lotes dentro de uma
+única transação. Os resumos mensais e por hora das solicitações já
+compactadas (resumos/) são copiados para as tabelas de resumo, para que
+o histórico compactado não se perca na migração.
+
+Uso:
+    python -m tools.migrate_csv_to_sqlite [--data-dir data] [--db data/banco_agil.db]
+"""
+
+import argparse
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from tools.client_shards import client_shard_paths
+from tools.csv_ingest import iter_client_frames, iter_request_frames, read_policy
+from tools.request_log import SegmentedRequestLog
+from tools.request_rollup import SUMMARY_FIELDNAMES
+from tools.score_limit_index import ScoreBands
+from tools.sqlite_storage import SQL_INSERT_REQUEST, SQLiteStorage
+
+BATCH_SIZE = 10_000
+
+SQL_INSERT_CLIENT = (
+    "INSERT OR REPLACE INTO clientes "
+    "(cpf, data_nascimento, nome, limite_credito, score_credito, versao) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+SQL_INSERT_BAND = (
+    "INSERT OR REPLACE INTO score_limite "
+    "(produto, score_minimo, score_maximo, limite_maximo) VALUES (?, ?, ?, ?)"
+)
+SQL_INSERT_ROLLUP = (
+    f"INSERT INTO resumo_solicitacoes ({', '.join(SUMMARY_FIELDNAMES)}) "
+    f"VALUES ({', '.join('?' * len(SUMMARY_FIELDNAMES))})"
+)
+SQL_INSERT_HOURLY_VOLUME = "INSERT INTO resumo_solicitacoes_hora (hora, quantidade) VALUES (?, ?)"
+
+
+def _batches(rows: Iterable[Tuple], size: int = BATCH_SIZE) -> Iterator[List[Tuple]]:
+    """Agrupa um iterável em lotes de tamanho fixo."""
+    iterator = iter(rows)
+    while True:
+        lote = list(islice(iterator, size))
+        if not lote:
+            return
+        yield lote
+
+
+def _iter_clients(data_dir: Path) -> Iterator[Tuple]:
+    """Itera clientes.csv (ou seus shards) aplicando os valores pendentes do journal."""
+    colunas = ["cpf", "data_nascimento", "nome", "limite_credito", "score_credito", "versao"]
+    for filepath in client_shard_paths(data_dir):
+        for bloco in iter_client_frames(filepath, colunas):
+            yield from bloco.itertuples(index=False, name=None)
+
+
+def _iter_bands(filepath: Path) -> Iterator[Tuple]:
+    """Itera score_limite.csv validando as faixas de cada produto."""
+    for produto, lista in read_policy(filepath).items():
+        ScoreBands(lista).validate(produto)
+        for score_min, score_max, limite in lista:
+            yield produto, score_min, score_max, limite
+
+
+def _iter_requests(data_dir: Path) -> Iterator[Tuple]:
+    """Itera o histórico de solicitações (arquivo legado e segmentos)."""
+    colunas = [
+        "cpf_cliente",
+        "data_hora_solicitacao",
+        "limite_atual",
+        "novo_limite_solicitado",
+        "status_pedido",
+    ]
+    for path in SegmentedRequestLog(data_dir).segments():
+        for bloco in iter_request_frames(path):
+            yield from bloco[colunas].itertuples(index=False, name=None)
+
+
+def _iter_rollups(data_dir: Path) -> Iterator[Tuple]:
+    """Itera os resumos mensais das solicitações compactadas."""
+    for resumo in SegmentedRequestLog(data_dir).iter_rollups():
+        yield tuple(resumo[campo] for campo in SUMMARY_FIELDNAMES)
+
+
+def _iter_hourly_volume(data_dir: Path) -> Iterator[Tuple]:
+    """Itera o volume por hora das solicitações compactadas."""
+    yield from SegmentedRequestLog(data_dir).rollup_hourly_volume().items()
+
+
+def migrate(data_dir: Path, db_path: Path) -> Dict[str, int]:
+    """
+    Copia os CSVs de data_dir para o banco SQLite em db_path.
+
+    Args:
+        data_dir: Diretório com os arquivos CSV
+        db_path: Caminho do banco SQLite (criado se não existir)
+
+    Returns:
+        Quantidade de linhas migradas por tabela
+
+    Raises:
+        RuntimeError: Se o banco já tiver sido migrado anteriormente
+    """
+    storage = SQLiteStorage(db_path)
+    conn = storage.connection()
+
+    if (
+        conn.execute("SELECT 1 FROM solicitacoes_aumento_limite LIMIT 1").fetchone()
+        or conn.execute("SELECT 1 FROM resumo_solicitacoes LIMIT 1").fetchone()
+    ):
+        raise RuntimeError(
+            f"O banco {db_path} já contém solicitações; "
+            "a migração deve ser executada sobre um banco novo"
+        )
+
+    etapas = [
+        ("clientes", SQL_INSERT_CLIENT, _iter_clients(data_dir)),
+        ("score_limite", SQL_INSERT_BAND, _iter_bands(data_dir / "score_limite.csv")),
+        (
+            "solicitacoes_aumento_limite",
+            SQL_INSERT_REQUEST,
+            _iter_requests(data_dir),
+        ),
+        ("resumo_solicitacoes", SQL_INSERT_ROLLUP, _iter_rollups(data_dir)),
+        ("resumo_solicitacoes_hora", SQL_INSERT_HOURLY_VOLUME, _iter_hourly_volume(data_dir)),
+    ]
+
+    totais = {}
+    with conn:
+        for tabela, sql, linhas in etapas:
+            total = 0
+            for lote in _batches(linhas):
+                conn.executemany(sql, lote)
+                total += len(lote)
+            totais[tabela] = total
+    return totais
+
+
+def main() -> None:
+    """Ponto de entrada de linha de comando."""
+    default_data_dir = Path(__file__).parent.parent / "data"
+
+    parser = argparse.ArgumentParser(description="Migra os CSVs do Banco Ágil para SQLite")
+    parser.add_argument("--data-dir", type=Path, default=default_data_dir)
+    parser.add_argument("--db", type=Path, default=default_data_dir / "banco_agil.db")
+    args = parser.parse_args()
+
+    totais = migrate(args.data_dir, args.db)
+    for tabela, total in totais.items():
+        print(f"✅ {tabela}: {total} linhas migradas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Leitor de clientes.csv baseado em memory-map.
+Percorre o arquivo sem carregá-lo em memória, materializando apenas os
+campos pedidos, e localiza CPFs buscando diretamente nos bytes antes de
+decodificar qualquer linha. Indicado para processamentos em lote sobre
+toda a base de clientes.
+"""
+
+import csv
+import mmap
+from itertools import repeat
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from tools.client_journal import open_base, pending_updates
+from tools.storage import CLIENT_FIELDNAMES, VERSION_FIELD
+
+# Campos convertidos para float; os demais são decodificados como texto
+NUMERIC_FIELDS = ("limite_credito", "score_credito")
+
+# Tamanho aproximado (bytes) de cada bloco de linhas processado por vez
+CHUNK_SIZE = 64 * 1024
+
+
+class ClientFileScanner:
+    """
+    Varredura preguiçosa de clientes.csv via mmap.
+
+    Assume o formato gerado pelo sistema (campos sem aspas). Linhas com
+    aspas são interpretadas pelo módulo csv, preservando a compatibilidade.
+    """
+
+    def __init__(self, filepath: Path, apply_journal: bool = True):
+        self.filepath = Path(filepath)
+        self.apply_journal = apply_journal
+
+    def _open(self) -> Tuple[BinaryIO, Dict[str, Dict[str, str]]]:
+        """
+        Abre o arquivo base junto com as atualizações do journal ainda não
+        incorporadas a ele (da mesma versão, ver open_base).
+        """
+        if not self.apply_journal:
+            return open(self.filepath, "rb"), {}
+        f, entries, _ = open_base(self.filepath)
+        return f, pending_updates(entries)
+
+    @staticmethod
+    def _split(line: bytes) -> List[bytes]:
+        """Separa uma linha em campos, recorrendo ao csv se houver aspas."""
+        if b'"' not in line:
+            return line.split(b",")
+        row = next(csv.reader([line.decode("utf-8")]))
+        return [campo.encode("utf-8") for campo in row]
+
+    @staticmethod
+    def _chunks(mm: mmap.mmap, inicio: int) -> Iterator[bytes]:
+        """Divide o arquivo em blocos de linhas completas, sem o \\n final."""
+        tamanho = len(mm)
+        pos = inicio
+        while pos < tamanho:
+            fim = min(pos + CHUNK_SIZE, tamanho)
+            if fim < tamanho:
+                corte = mm.rfind(b"\n", pos, fim)
+                fim = corte if corte >= pos else mm.find(b"\n", fim)
+                if fim < 0:
+                    fim = tamanho
+            bloco = mm[pos:fim].rstrip(b"\r\n")
+            if bloco:
+                yield bloco
+            pos = fim + 1
+
+    @staticmethod
+    def _flatten(bloco: bytes, ncolunas: int) -> Optional[List[bytes]]:
+        """
+        Separa um bloco inteiro em uma lista plana de campos.
+
+        Retorna None quando o bloco foge do formato simples (aspas, linhas
+        em branco ou número de campos inconsistente).
+        """
+        if b'"' in bloco:
+            return None
+        if b"\r" in bloco:
+            bloco = bloco.replace(b"\r", b"")
+        campos = bloco.replace(b"\n", b",").split(b",")
+        if len(campos) != (bloco.count(b"\n") + 1) * ncolunas:
+            return None
+        return campos
+
+    def _flatten_lines(self, bloco: bytes, ncolunas: int) -> List[bytes]:
+        """Caminho lento de _flatten: interpreta o bloco linha a linha."""
+        campos: List[bytes] = []
+        for line in bloco.split(b"\n"):
+            line = line.rstrip(b"\r")
+            if not line.strip():
+                continue
+            partes = self._split(line)
+            if len(partes) != ncolunas:
+                raise ValueError(f"Linha malformada em {self.filepath.name}: {line[:80]!r}")
+            campos.extend(partes)
+        return campos
+
+    def scan(self, fields: Optional[Sequence[str]] = None) -> Iterator[Tuple]:
+        """
+        Itera os clientes produzindo apenas os campos pedidos.
+
+        Cada bloco de linhas é separado em colunas de uma só vez e apenas
+        as colunas pedidas são convertidas.
+
+        Args:
+            fields: Campos desejados, na ordem de saída (padrão:
+                CLIENT_FIELDNAMES)
+
+        Yields:
+            Tupla com os valores dos campos (numéricos como float, versão
+            como int; 0 em arquivos sem a coluna de versão)
+        """
+        f, pendentes = self._open()
+        pendentes = {cpf.encode("utf-8"): alteracoes for cpf, alteracoes in pendentes.items()}
+
+        with f:
+            if f.seek(0, 2) == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                cabecalho = mm.readline()
+                colunas = [c.decode("utf-8") for c in self._split(cabecalho.rstrip(b"\r\n"))]
+                fields = list(fields) if fields else CLIENT_FIELDNAMES
+                invalidos = set(fields) - set(colunas) - {VERSION_FIELD}
+                if invalidos:
+                    raise ValueError(f"Campos inválidos: {sorted(invalidos)}")
+                # Arquivos anteriores ao versionamento não têm a coluna de versão
+                indices = [colunas.index(campo) if campo in colunas else None for campo in fields]
+                conversores: List[Callable[[bytes], object]] = [
+                    float if campo in NUMERIC_FIELDS
+                    else int if campo == VERSION_FIELD
+                    else bytes.decode
+                    for campo in fields
+                ]
+                cpf_idx = colunas.index("cpf")
+                ncolunas = len(colunas)
+
+                for bloco in self._chunks(mm, len(cabecalho)):
+                    campos = self._flatten(bloco, ncolunas)
+                    if campos is None:
+                        campos = self._flatten_lines(bloco, ncolunas)
+
+                    if pendentes and not pendentes.keys().isdisjoint(campos[cpf_idx::ncolunas]):
+                        self._apply_pending(campos, colunas, pendentes)
+
+                    yield from zip(*(
+                        map(conv, campos[i::ncolunas]) if i is not None
+                        else self._virtual_versions(campos[cpf_idx::ncolunas], pendentes)
+                        for i, conv in zip(indices, conversores)
+                    ))
+
+    @staticmethod
+    def _virtual_versions(cpfs: List[bytes], pendentes: Dict[bytes, Dict[str, str]]) -> Iterator[int]:
+        """Versões de um bloco de arquivo sem a coluna: 0 ou a do journal."""
+        if not pendentes:
+            return repeat(0, len(cpfs))
+        return (int(pendentes.get(cpf, {}).get(VERSION_FIELD, 0)) for cpf in cpfs)
+
+    @staticmethod
+    def _apply_pending(
+        campos: List[bytes],
+        colunas: List[str],
+        pendentes: Dict[bytes, Dict[str, str]]
+    ) -> None:
+        """Sobrepõe os valores do journal aos campos de um bloco."""
+        ncolunas = len(colunas)
+        cpf_idx = colunas.index("cpf")
+        for base in range(0, len(campos), ncolunas):
+            alteracoes = pendentes.get(campos[base + cpf_idx])
+            if alteracoes:
+                for campo, valor in alteracoes.items():
+                    if campo in colunas:
+                        campos[base + colunas.index(campo)] = valor.encode("utf-8")
+
+    def find_cpf(self, cpf: str) -> Optional[Dict]:
+        """
+        Localiza um cliente buscando o CPF diretamente nos bytes do arquivo.
+
+        Args:
+            cpf: CPF do cliente
+
+        Returns:
+            Dicionário no formato usado pelos agentes, ou None
+        """
+        f, pendentes = self._open()
+        with f:
+            if f.seek(0, 2) == 0:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                colunas = [c.decode("utf-8") for c in self._split(mm.readline().rstrip(b"\r\n"))]
+                if colunas[0] != "cpf":
+                    raise ValueError("A busca por bytes requer 'cpf' como primeira coluna")
+
+                # Sem o início explícito, find partiria da posição após o readline
+                inicio = mm.find(b"\n" + cpf.encode("utf-8") + b",", 0)
+                if inicio < 0:
+                    return None
+                fim = mm.find(b"\n", inicio + 1)
+                line = mm[inicio + 1:fim if fim >= 0 else len(mm)].rstrip(b"\r\n")
+
+        row = dict(zip(colunas, (p.decode("utf-8") for p in self._split(line))))
+        row.update(pendentes.get(cpf, {}))
+        return {
+            "cpf": row["cpf"],
+            "nome": row["nome"],
+            "limite_credito": float(row["limite_credito"]),
+            "score_credito": float(row["score_credito"]),
+            "data_nascimento": row["data_nascimento"],
+            "versao": int(row.get(VERSION_FIELD) or 0),
+        }
+
+
+if __name__ == "__main__":
+    # Compara a varredura via mmap com o caminho atual via csv.DictReader
+    import sys
+    import time
+
+    arquivo = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).parent.parent / "data" / "clientes.csv"
+
+    inicio = time.perf_counter()
+    with open(arquivo, "r", encoding="utf-8") as f:
+        total_dict = sum(float(row["limite_credito"]) for row in csv.DictReader(f))
+    tempo_dict = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    scanner = ClientFileScanner(arquivo, apply_journal=False)
+    total_mmap = sum(limite for (limite,) in scanner.scan(["limite_credito"]))
+    tempo_mmap = time.perf_counter() - inicio
+
+    print(f"DictReader: {tempo_dict:.3f}s (soma dos limites: {total_dict:,.2f})")
+    print(f"mmap:       {tempo_mmap:.3f}s (soma dos limites: {total_mmap:,.2f})")
+    print(f"Ganho:      {tempo_dict / max(tempo_mmap, 1e-9):.1f}x")
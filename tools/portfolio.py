@@ -0,0 +1,220 @@
+"""
+Snapshot colunar da carteira de clientes para análises em lote.
+Guarda CPFs, limites, scores e datas de nascimento em arrays NumPy
+contíguos e oferece agregações vetorizadas (exposição por faixa de
+score, histograma de scores) sem laços linha a linha em Python.
+"""
+
+from itertools import islice
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Campos lidos da base, na ordem esperada por from_rows/from_frames
+SNAPSHOT_FIELDS = ("cpf", "limite_credito", "score_credito", "data_nascimento")
+
+# Linhas convertidas por vez ao montar o snapshot
+_CHUNK_ROWS = 100_000
+
+
+class PortfolioSnapshot:
+    """Carteira de clientes em formato colunar (somente leitura)."""
+
+    def __init__(
+        self,
+        cpf: np.ndarray,
+        limite_credito: np.ndarray,
+        score_credito: np.ndarray,
+        data_nascimento: np.ndarray
+    ):
+        self.cpf = cpf
+        self.limite_credito = limite_credito
+        self.score_credito = score_credito
+        self.data_nascimento = data_nascimento
+
+        # O snapshot é compartilhado pelo cache; impede alterações acidentais
+        for array in (self.cpf, self.limite_credito, self.score_credito, self.data_nascimento):
+            array.flags.writeable = False
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple]) -> "PortfolioSnapshot":
+        """
+        Monta o snapshot a partir de tuplas (cpf, limite, score, nascimento).
+
+        As linhas são convertidas em blocos, limitando a memória
+        temporária ocupada por objetos Python.
+
+        Args:
+            rows: Tuplas na ordem de SNAPSHOT_FIELDS
+
+        Returns:
+            Snapshot da carteira
+        """
+        iterator = iter(rows)
+        partes: List[Tuple[np.ndarray, ...]] = []
+        while True:
+            bloco = list(islice(iterator, _CHUNK_ROWS))
+            if not bloco:
+                break
+            cpfs, limites, scores, nascimentos = zip(*bloco)
+            partes.append((
+                np.array(cpfs, dtype=str),
+                np.array(limites, dtype=np.float64),
+                np.array(scores, dtype=np.float64),
+                np.array(nascimentos, dtype="datetime64[D]"),
+            ))
+
+        if not partes:
+            return cls(
+                np.array([], dtype=str),
+                np.array([], dtype=np.float64),
+                np.array([], dtype=np.float64),
+                np.array([], dtype="datetime64[D]"),
+            )
+        return cls(*(np.concatenate(coluna) for coluna in zip(*partes)))
+
+    @classmethod
+    def from_frames(cls, frames: Iterable[pd.DataFrame]) -> "PortfolioSnapshot":
+        """
+        Monta o snapshot a partir de blocos de colunas já tipadas, como os
+        de StorageBackend.iter_client_frames, sem passar por tuplas.
+
+        Args:
+            frames: DataFrames com as colunas de SNAPSHOT_FIELDS
+
+        Returns:
+            Snapshot da carteira
+        """
+        partes = [
+            (
+                bloco["cpf"].to_numpy(dtype=str),
+                bloco["limite_credito"].to_numpy(dtype=np.float64),
+                bloco["score_credito"].to_numpy(dtype=np.float64),
+                bloco["data_nascimento"].to_numpy(dtype="datetime64[D]"),
+            )
+            for bloco in frames
+        ]
+        if not partes:
+            return cls.from_rows(())
+        return cls(*(np.concatenate(coluna) for coluna in zip(*partes)))
+
+    def __len__(self) -> int:
+        return len(self.cpf)
+
+    def total_exposure(self) -> float:
+        """Soma dos limites de crédito concedidos."""
+        return float(self.limite_credito.sum())
+
+    def score_histogram(
+        self,
+        bins: int = 10,
+        score_range: Tuple[float, float] = (0, 1000)
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Distribuição dos scores da carteira.
+
+        Args:
+            bins: Número de intervalos
+            score_range: Intervalo coberto pelo histograma
+
+        Returns:
+            Tupla (contagens, bordas dos intervalos), como np.histogram
+        """
+        return np.histogram(self.score_credito, bins=bins, range=score_range)
+
+    def exposure_by_score_band(
+        self,
+        faixas: Sequence[Tuple[float, float, float]]
+    ) -> pd.DataFrame:
+        """
+        Exposição (soma dos limites) e número de clientes por faixa de score.
+
+        Args:
+            faixas: Tuplas (score_minimo, score_maximo, limite_maximo)
+                ordenadas e sem sobreposição, como em score_limite.csv
+
+        Returns:
+            DataFrame com uma linha por faixa e as colunas score_minimo,
+            score_maximo, limite_maximo, clientes, exposicao e
+            utilizacao_media (limite médio / limite máximo da faixa)
+        """
+        clientes, exposicao = band_totals(self.score_credito, self.limite_credito, faixas)
+        return exposure_table(faixas, clientes, exposicao)
+
+    def to_dataframe(self, index_by_cpf: bool = False) -> pd.DataFrame:
+        """
+        Converte o snapshot em DataFrame.
+
+        Args:
+            index_by_cpf: Se True, usa o CPF como índice
+
+        Returns:
+            DataFrame com as colunas de SNAPSHOT_FIELDS
+        """
+        df = pd.DataFrame({
+            "cpf": self.cpf,
+            "limite_credito": self.limite_credito,
+            "score_credito": self.score_credito,
+            "data_nascimento": self.data_nascimento,
+        }, copy=False)
+        return df.set_index("cpf") if index_by_cpf else df
+
+
+def band_totals(
+    scores: np.ndarray,
+    limites: np.ndarray,
+    faixas: Sequence[Tuple[float, float, float]]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Número de clientes e soma dos limites por faixa de score.
+
+    Totais de partes da carteira podem ser somados (ver exposure_table).
+
+    Returns:
+        Tupla (clientes, exposição), uma posição por faixa em ordem de score
+    """
+    faixas = sorted(faixas)
+    minimos = np.array([f[0] for f in faixas], dtype=np.float64)
+    maximos = np.array([f[1] for f in faixas], dtype=np.float64)
+
+    indices = np.searchsorted(minimos, scores, side="right") - 1
+    validos = indices >= 0
+    validos[validos] = scores[validos] <= maximos[indices[validos]]
+
+    clientes = np.bincount(indices[validos], minlength=len(faixas))
+    exposicao = np.bincount(indices[validos], weights=limites[validos], minlength=len(faixas))
+    return clientes, exposicao
+
+
+def partition_band_totals(
+    frame: pd.DataFrame,
+    faixas: Sequence[Tuple[float, float, float]]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """band_totals de uma partição da base (colunas score_credito e limite_credito)."""
+    return band_totals(
+        frame["score_credito"].to_numpy(dtype=np.float64),
+        frame["limite_credito"].to_numpy(dtype=np.float64),
+        faixas,
+    )
+
+
+def exposure_table(
+    faixas: Sequence[Tuple[float, float, float]],
+    clientes: np.ndarray,
+    exposicao: np.ndarray
+) -> pd.DataFrame:
+    """Monta o DataFrame de exposição por faixa a partir de band_totals."""
+    faixas = sorted(faixas)
+    limites = np.array([f[2] for f in faixas], dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        utilizacao = np.where(clientes > 0, exposicao / clientes / limites, 0.0)
+
+    return pd.DataFrame({
+        "score_minimo": np.array([f[0] for f in faixas], dtype=np.float64),
+        "score_maximo": np.array([f[1] for f in faixas], dtype=np.float64),
+        "limite_maximo": limites,
+        "clientes": clientes,
+        "exposicao": exposicao,
+        "utilizacao_media": utilizacao,
+    })
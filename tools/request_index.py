@@ -0,0 +1,151 @@
+"""
+Índice secundário CPF -> posições no histórico de solicitações.
+Guarda, para cada segmento do histórico, os offsets (em bytes) das linhas
+de cada CPF. Segmentos em escrita são indexados incrementalmente, lendo
+apenas os bytes acrescentados desde a última consulta; segmentos
+compactados com gzip são indexados uma única vez.
+"""
+
+import csv
+import gzip
+import threading
+from pathlib import Path
+from typing import IO, Dict, List, Optional, Tuple
+
+
+def _split(line: bytes) -> List[str]:
+    """Separa os campos de uma linha CSV em bytes."""
+    texto = line.decode("utf-8")
+    if '"' in texto:
+        return next(csv.reader([texto]))
+    return texto.rstrip("\r\n").split(",")
+
+
+class _SegmentOffsets:
+    """Offsets das linhas de um segmento, agrupados por CPF."""
+
+    __slots__ = ("tamanho", "cabecalho", "coluna_cpf", "por_cpf")
+
+    def __init__(self):
+        self.tamanho = 0
+        self.cabecalho: List[str] = []
+        self.coluna_cpf = 0
+        self.por_cpf: Dict[str, List[int]] = {}
+
+    def consume(self, f: IO[bytes]) -> None:
+        """Indexa as linhas completas a partir de self.tamanho."""
+        pos = self.tamanho
+        f.seek(pos)
+        if pos == 0:
+            line = f.readline()
+            if not line.endswith(b"\n"):
+                return
+            self.cabecalho = _split(line)
+            if "cpf_cliente" not in self.cabecalho:
+                return
+            self.coluna_cpf = self.cabecalho.index("cpf_cliente")
+            pos = len(line)
+
+        coluna = self.coluna_cpf
+        por_cpf = self.por_cpf
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # Escrita em andamento; será indexada depois
+            if coluna == 0 and b'"' not in line:
+                cpf = line[:line.find(b",")].decode("utf-8")
+            else:
+                campos = _split(line)
+                cpf = campos[coluna] if len(campos) > coluna else ""
+            if cpf:
+                por_cpf.setdefault(cpf, []).append(pos)
+            pos += len(line)
+        self.tamanho = pos
+
+
+class RequestCpfIndex:
+    """Índice CPF -> linhas de cada segmento do histórico de solicitações."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._segmentos: Dict[Path, _SegmentOffsets] = {}
+
+    @staticmethod
+    def _resolve(path: Path) -> Optional[Path]:
+        """Caminho atual do segmento (que pode ter sido compactado)."""
+        if path.exists():
+            return path
+        gz_path = path.with_name(path.name + ".gz")
+        if path.suffix != ".gz" and gz_path.exists():
+            return gz_path
+        return None
+
+    def _refresh(self, path: Path) -> _SegmentOffsets:
+        """Atualiza e retorna os offsets do segmento. Requer self._lock."""
+        offsets = self._segmentos.get(path)
+
+        if path.suffix == ".gz":
+            # Segmentos compactados estão selados: indexados uma única vez
+            if offsets is None:
+                offsets = _SegmentOffsets()
+                with gzip.open(path, "rb") as f:
+                    offsets.consume(f)
+                self._segmentos[path] = offsets
+                self._segmentos.pop(path.with_suffix(""), None)
+            return offsets
+
+        tamanho = path.stat().st_size
+        if offsets is None or tamanho < offsets.tamanho:
+            # Segmento novo ou reescrito: reconstrói a partir do início
+            offsets = _SegmentOffsets()
+            self._segmentos[path] = offsets
+        if tamanho > offsets.tamanho:
+            with open(path, "rb") as f:
+                offsets.consume(f)
+        return offsets
+
+    def refresh(self, path: Path) -> None:
+        """Indexa as linhas ainda não indexadas do segmento."""
+        atual = self._resolve(path)
+        if atual is not None:
+            with self._lock:
+                self._refresh(atual)
+
+    def lookup(self, path: Path, cpf: str) -> Tuple[List[str], List[str]]:
+        """
+        Busca as linhas de um CPF em um segmento.
+
+        O custo é proporcional ao número de linhas do CPF mais os bytes
+        acrescentados ao segmento desde a última consulta (em segmentos
+        compactados, a leitura avança pelo arquivo até a última linha).
+
+        Args:
+            path: Caminho do segmento
+            cpf: CPF do cliente
+
+        Returns:
+            Tupla (cabeçalho, linhas do CPF em ordem de gravação)
+        """
+        atual = self._resolve(path)
+        if atual is None:
+            return [], []
+
+        with self._lock:
+            offsets = self._refresh(atual)
+            cabecalho = offsets.cabecalho
+            posicoes = list(offsets.por_cpf.get(cpf, ()))
+
+        if not posicoes:
+            return cabecalho, []
+
+        abrir = gzip.open if atual.suffix == ".gz" else open
+        linhas = []
+        with abrir(atual, "rb") as f:
+            for pos in posicoes:
+                f.seek(pos)
+                linhas.append(f.readline().decode("utf-8"))
+        return cabecalho, linhas
+
+    def invalidate(self) -> None:
+        """Descarta o índice; ele será reconstruído a partir do histórico."""
+        with self._lock:
+            self._segmentos = {}
@@ -0,0 +1,633 @@
+"""
+Histórico de solicitações de aumento de limite particionado no tempo.
+
+As solicitações são gravadas em segmentos diários (divididos em partes
+quando passam do tamanho máximo) dentro de data/solicitacoes/. Um
+manifesto registra o intervalo de tempo, o número de linhas e o estado
+de cada segmento, de modo que consultas por período abrem apenas os
+segmentos que se sobrepõem ao intervalo pedido. Segmentos antigos são
+selados e compactados com gzip.
+
+O arquivo legado solicitacoes_aumento_limite.csv é mantido como o
+primeiro segmento (somente leitura) do histórico.
+"""
+
+import csv
+import gzip
+import itertools
+import json
+import os
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+
+from tools.append_writer import BufferedAppendWriter
+from tools.atomic_file import atomic_write
+from tools.file_lock import FileLock
+from tools.request_index import RequestCpfIndex
+from tools.request_rollup import (
+    SummaryKey,
+    add_request,
+    merge_summaries,
+    overlaps,
+    read_summaries,
+    write_summaries,
+)
+from tools.storage import REQUEST_FIELDNAMES, Statuses, Timestamp, status_set
+
+SEGMENTS_DIRNAME = "solicitacoes"
+ROLLUPS_DIRNAME = "resumos"
+MANIFEST_FILENAME = "manifest.json"
+LEGACY_FILENAME = "solicitacoes_aumento_limite.csv"
+MANIFEST_VERSION = 1
+
+# Tamanho máximo (bytes) de uma parte de segmento antes de abrir a próxima
+SEGMENT_MAX_BYTES = int(os.getenv("BANCO_REQUESTS_SEGMENT_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Idade (dias) a partir da qual segmentos selados são compactados (0 desativa)
+COMPRESS_AFTER_DAYS = int(os.getenv("BANCO_REQUESTS_COMPRESS_AFTER_DAYS", "7"))
+
+# Segmentos ficam abertos por um dia além do seu próprio, dando tempo para
+# que outros processos gravem as linhas que ainda estejam em buffer
+SEAL_AFTER_DAYS = 1
+
+def normalize_bound(valor: Timestamp, fim: bool = False) -> Optional[str]:
+    """
+    Converte um limite de período em texto ISO 8601 comparável.
+
+    Datas sem horário cobrem o dia inteiro: como limite final, viram o
+    último instante do dia.
+
+    Args:
+        valor: Data/hora (str ISO, date ou datetime) ou None
+        fim: Se True, trata o valor como limite final do período
+
+    Returns:
+        Texto ISO 8601 ou None
+    """
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    if isinstance(valor, date):
+        valor = valor.isoformat()
+    if len(valor) == 10 and fim:
+        return f"{valor}T23:59:59.999999"
+    return valor
+
+
+def open_segment(path: Path) -> IO[str]:
+    """Abre um segmento para leitura, compactado ou não."""
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    try:
+        return open(path, "r", encoding="utf-8", newline="")
+    except FileNotFoundError:
+        # O segmento pode ter sido compactado por outro processo
+        return gzip.open(path.with_name(path.name + ".gz"), "rt", encoding="utf-8", newline="")
+
+
+def parse_line(line: str) -> List[str]:
+    """Separa os campos de uma linha CSV, usando o módulo csv só se houver aspas."""
+    if '"' in line:
+        return next(csv.reader([line]))
+    return line.rstrip("\r\n").split(",")
+
+
+def iter_segment_rows(path: Path) -> Iterator[Dict]:
+    """
+    Itera as linhas completas de um segmento.
+
+    Uma última linha sem quebra de linha (escrita em andamento por outro
+    processo) é ignorada, assim como um segmento recém-registrado que
+    ainda não recebeu nenhuma gravação.
+    """
+    try:
+        f = open_segment(path)
+    except FileNotFoundError:
+        return
+
+    with f:
+        linhas = (line for line in f if line.endswith("\n"))
+        for row in csv.DictReader(linhas):
+            if row.get("cpf_cliente"):  # Ignora linhas vazias
+                yield row
+
+
+class SegmentedRequestLog:
+    """Histórico de solicitações em segmentos diários com manifesto."""
+
+    def __init__(self, data_dir: Path, segment_max_bytes: int = SEGMENT_MAX_BYTES):
+        self.data_dir = Path(data_dir)
+        self.segments_dir = self.data_dir / SEGMENTS_DIRNAME
+        self.manifest_path = self.segments_dir / MANIFEST_FILENAME
+        self.segment_max_bytes = segment_max_bytes
+
+        self._lock = threading.Lock()
+        self._manifest_lock: Optional[FileLock] = None
+        self._writer: Optional[BufferedAppendWriter] = None
+        self._dia: Optional[str] = None
+        self._cpf_index = RequestCpfIndex()
+
+    # ------------------------------------------------------------------
+    # Manifesto
+    # ------------------------------------------------------------------
+
+    def _lock_manifest(self) -> FileLock:
+        """Lock entre processos que protege as alterações do manifesto."""
+        if self._manifest_lock is None:
+            self.segments_dir.mkdir(parents=True, exist_ok=True)
+            self._manifest_lock = FileLock(self.manifest_path)
+        return self._manifest_lock
+
+    def read_manifest(self) -> Dict:
+        """
+        Lê o manifesto, criando-o a partir do arquivo legado se necessário.
+
+        Returns:
+            Dicionário {"versao": int, "segmentos": [entrada, ...]}
+        """
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            pass
+
+        with self._lock_manifest():
+            if self.manifest_path.exists():
+                with open(self.manifest_path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+
+            manifest = {"versao": MANIFEST_VERSION, "segmentos": []}
+            legado = self.data_dir / LEGACY_FILENAME
+            if legado.exists():
+                entrada = {
+                    "arquivo": f"../{LEGACY_FILENAME}",
+                    "dia": None,
+                    "parte": 0,
+                    "selado": True,
+                    "comprimido": False,
+                }
+                entrada.update(self._segment_stats(legado))
+                manifest["segmentos"].append(entrada)
+            self._write_manifest(manifest)
+            return manifest
+
+    def _write_manifest(self, manifest: Dict) -> None:
+        """Grava o manifesto atomicamente. Requer o lock do manifesto."""
+        with atomic_write(self.manifest_path) as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    @staticmethod
+    def _segment_stats(path: Path) -> Dict:
+        """Calcula intervalo de tempo, linhas e bytes de um segmento."""
+        inicio = fim = None
+        linhas = 0
+        for row in iter_segment_rows(path):
+            ts = row["data_hora_solicitacao"]
+            inicio = ts if inicio is None or ts < inicio else inicio
+            fim = ts if fim is None or ts > fim else fim
+            linhas += 1
+        return {
+            "inicio": inicio,
+            "fim": fim,
+            "linhas": linhas,
+            "bytes": path.stat().st_size,
+        }
+
+    def _segment_path(self, entrada: Dict) -> Path:
+        return self.segments_dir / entrada["arquivo"]
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+
+    def append(self, row: Dict) -> None:
+        """
+        Adiciona uma solicitação ao segmento do dia do seu timestamp.
+
+        Args:
+            row: Linha com as chaves de REQUEST_FIELDNAMES
+        """
+        dia = row["data_hora_solicitacao"][:10]
+        with self._lock:
+            if (
+                self._writer is None
+                or dia != self._dia
+                or self._writer.size >= self.segment_max_bytes
+            ):
+                self._roll(dia)
+            self._writer.append(row)
+
+    def _roll(self, dia: str) -> None:
+        """Passa a gravar na parte aberta mais recente do dia. Requer self._lock."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+        self.read_manifest()  # Garante que o manifesto existe
+        with self._lock_manifest():
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+
+            partes = [
+                e for e in manifest["segmentos"]
+                if e["dia"] == dia and not e["selado"]
+            ]
+            atual = max(partes, key=lambda e: e["parte"]) if partes else None
+            if atual is not None and self._segment_path(atual).exists() and \
+                    self._segment_path(atual).stat().st_size >= self.segment_max_bytes:
+                atual = None
+
+            if atual is None:
+                parte = 1 + max(
+                    (e["parte"] for e in manifest["segmentos"] if e["dia"] == dia),
+                    default=0
+                )
+                atual = {
+                    "arquivo": f"{dia}_{parte:03d}.csv",
+                    "dia": dia,
+                    "parte": parte,
+                    # Enquanto aberto, o segmento cobre o dia inteiro
+                    "inicio": f"{dia}T00:00:00",
+                    "fim": f"{dia}T23:59:59.999999",
+                    "linhas": None,
+                    "bytes": None,
+                    "selado": False,
+                    "comprimido": False,
+                }
+                manifest["segmentos"].append(atual)
+
+            self._maintain(manifest, aberto=atual)
+            self._write_manifest(manifest)
+
+        self._dia = dia
+        self._writer = BufferedAppendWriter(self._segment_path(atual), REQUEST_FIELDNAMES)
+
+    def _maintain(self, manifest: Dict, aberto: Optional[Dict] = None) -> None:
+        """
+        Sela segmentos de dias encerrados e compacta os antigos.
+        Requer o lock do manifesto.
+
+        Args:
+            manifest: Manifesto a ser atualizado
+            aberto: Segmento que está sendo aberto para escrita (nunca é selado,
+                mesmo quando recebe solicitações retroativas)
+        """
+        hoje = date.today()
+        limite_selo = (hoje - timedelta(days=SEAL_AFTER_DAYS)).isoformat()
+        limite_gzip = (hoje - timedelta(days=COMPRESS_AFTER_DAYS)).isoformat()
+
+        for entrada in manifest["segmentos"]:
+            if entrada["dia"] is None or entrada is aberto:
+                continue
+            path = self._segment_path(entrada)
+
+            if not entrada["selado"] and entrada["dia"] < limite_selo:
+                if path.exists():
+                    entrada.update(self._segment_stats(path))
+                entrada["selado"] = True
+
+            if (
+                COMPRESS_AFTER_DAYS > 0
+                and entrada["selado"]
+                and not entrada["comprimido"]
+                and entrada["dia"] < limite_gzip
+                and path.exists()
+            ):
+                gz_path = path.with_name(path.name + ".gz")
+                with open(path, "rb") as src, atomic_write(gz_path, "wb") as dst:
+                    with gzip.GzipFile(fileobj=dst, mode="wb") as gz:
+                        while True:
+                            bloco = src.read(1024 * 1024)
+                            if not bloco:
+                                break
+                            gz.write(bloco)
+                entrada["arquivo"] = gz_path.name
+                entrada["comprimido"] = True
+                entrada["bytes"] = gz_path.stat().st_size
+                os.unlink(path)
+                # Segmentos selados não recebem mais escritas
+                path.with_name(path.name + ".lock").unlink(missing_ok=True)
+
+    def flush(self) -> None:
+        """Grava as solicitações pendentes do segmento atual."""
+        with self._lock:
+            if self._writer is not None:
+                self._writer.flush()
+
+    def close(self) -> None:
+        """Grava as solicitações pendentes e fecha o segmento atual."""
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+                self._dia = None
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    def segments(self, inicio: Timestamp = None, fim: Timestamp = None) -> List[Path]:
+        """
+        Lista, em ordem cronológica, os segmentos que se sobrepõem ao período.
+
+        Args:
+            inicio: Início do período (inclusivo); None para sem limite
+            fim: Fim do período (inclusivo); None para sem limite
+
+        Returns:
+            Caminhos dos segmentos a serem lidos
+        """
+        inicio = normalize_bound(inicio)
+        fim = normalize_bound(fim, fim=True)
+
+        selecionados = []
+        for entrada in self.read_manifest()["segmentos"]:
+            if entrada["inicio"] is None:
+                continue  # Segmento vazio
+            if fim is not None and entrada["inicio"] > fim:
+                continue
+            if inicio is not None and entrada["fim"] < inicio:
+                continue
+            selecionados.append(entrada)
+
+        selecionados.sort(key=lambda e: (e["inicio"], e["parte"]))
+        return [self._segment_path(e) for e in selecionados]
+
+    def query(
+        self,
+        *,
+        cpf: Optional[str] = None,
+        status: Statuses = None,
+        inicio: Timestamp = None,
+        fim: Timestamp = None,
+        valor_min: Optional[float] = None,
+        valor_max: Optional[float] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[Dict]:
+        """
+        Consulta as solicitações aplicando os filtros durante a leitura.
+
+        O período seleciona os segmentos a abrir; com CPF, apenas as linhas
+        do cliente (localizadas pelo índice secundário) são lidas. Só as
+        linhas aceitas viram dicionários e a leitura para ao atingir o limite.
+
+        Args:
+            cpf: CPF do cliente
+            status: Status aceito (ou coleção de status aceitos)
+            inicio: Início do período (inclusivo)
+            fim: Fim do período (inclusivo)
+            valor_min: Menor novo limite solicitado aceito
+            valor_max: Maior novo limite solicitado aceito
+            limit: Número máximo de solicitações retornadas
+
+        Yields:
+            Linhas no formato de REQUEST_FIELDNAMES (valores como texto)
+        """
+        if limit is not None and limit <= 0:
+            return
+
+        self.flush()
+        inicio_iso = normalize_bound(inicio)
+        fim_iso = normalize_bound(fim, fim=True)
+        statuses = status_set(status)
+        encontrados = 0
+        for path in self.segments(inicio, fim):
+            cabecalho_atual = None
+            for cabecalho, valores in self._scan(path, cpf):
+                if cabecalho is not cabecalho_atual:
+                    if "cpf_cliente" not in cabecalho:
+                        break  # Segmento vazio ou sem cabeçalho válido
+                    cabecalho_atual = cabecalho
+                    colunas = tuple(
+                        cabecalho.index(campo) for campo in (
+                            "cpf_cliente",
+                            "data_hora_solicitacao",
+                            "status_pedido",
+                            "novo_limite_solicitado",
+                        )
+                    )
+                i_cpf, i_ts, i_status, i_valor = colunas
+
+                if len(valores) != len(cabecalho) or not valores[i_cpf]:
+                    continue
+                if cpf is not None and valores[i_cpf] != cpf:
+                    continue
+                ts = valores[i_ts]
+                if inicio_iso is not None and ts < inicio_iso:
+                    continue
+                if fim_iso is not None and ts > fim_iso:
+                    continue
+                if statuses is not None and valores[i_status] not in statuses:
+                    continue
+                if valor_min is not None or valor_max is not None:
+                    valor = float(valores[i_valor])
+                    if valor_min is not None and valor < valor_min:
+                        continue
+                    if valor_max is not None and valor > valor_max:
+                        continue
+
+                yield dict(zip(cabecalho, valores))
+                encontrados += 1
+                if limit is not None and encontrados >= limit:
+                    return
+
+    # ------------------------------------------------------------------
+    # Compactação em resumos mensais
+    # ------------------------------------------------------------------
+
+    def compact(self, antes_de: date) -> int:
+        """
+        Resume as solicitações dos segmentos selados anteriores a antes_de
+        em arquivos por mês (resumos/AAAA-MM.vvvv.csv) e remove os segmentos.
+
+        Os resumos de cada mês são regravados em uma nova versão, combinados
+        com os já existentes, e a troca é feita atomicamente no manifesto:
+        leitores veem o histórico antigo ou o compactado, nunca os dois.
+
+        Args:
+            antes_de: Primeiro dia que continua linha a linha no histórico
+
+        Returns:
+            Número de solicitações resumidas
+        """
+        corte = antes_de.isoformat()
+        self.read_manifest()  # Garante que o manifesto existe
+        with self._lock_manifest():
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+
+            antigos = [
+                e for e in manifest["segmentos"]
+                if e["selado"] and (e["fim"] or e["dia"] or "") < corte
+            ]
+            if not antigos:
+                return 0
+
+            resumos = manifest.setdefault("resumos", {})
+            substituidos: List[Path] = []
+            total = 0
+            (self.segments_dir / ROLLUPS_DIRNAME).mkdir(exist_ok=True)
+
+            # Um mês de segmentos diários por vez (o legado forma um grupo
+            # à parte), limitando a memória aos resumos de um grupo
+            def grupo(entrada: Dict) -> str:
+                return (entrada["dia"] or "")[:7]
+
+            for _, entradas in itertools.groupby(sorted(antigos, key=grupo), key=grupo):
+                novos: Dict[SummaryKey, Dict] = {}
+                horas: Dict[str, int] = {}
+                for entrada in entradas:
+                    for row in iter_segment_rows(self._segment_path(entrada)):
+                        add_request(novos, row)
+                        hora = row["data_hora_solicitacao"][:13]
+                        horas[hora] = horas.get(hora, 0) + 1
+                        total += 1
+
+                chaves = sorted(novos)
+                for mes, do_mes in itertools.groupby(chaves, key=lambda chave: chave[0]):
+                    anterior = resumos.get(mes)
+                    if anterior is not None:
+                        substituidos.append(self.segments_dir / anterior["arquivo"])
+                        substituidos.append(self.segments_dir / anterior["horas"])
+                    resumos[mes] = self._write_rollup(
+                        mes,
+                        anterior,
+                        [novos[chave] for chave in do_mes],
+                        {h: n for h, n in horas.items() if h.startswith(mes)},
+                    )
+
+            manifest["segmentos"] = [e for e in manifest["segmentos"] if e not in antigos]
+            self._write_manifest(manifest)
+
+        # Após a troca do manifesto, os arquivos antigos não são mais lidos
+        for entrada in antigos:
+            path = self._segment_path(entrada)
+            path.unlink(missing_ok=True)
+            path.with_name(path.name + ".lock").unlink(missing_ok=True)
+        for path in substituidos:
+            path.unlink(missing_ok=True)
+        self._cpf_index.invalidate()
+        return total
+
+    def _write_rollup(
+        self,
+        mes: str,
+        anterior: Optional[Dict],
+        novos: List[Dict],
+        horas: Dict[str, int]
+    ) -> Dict:
+        """
+        Grava a próxima versão dos resumos de um mês, combinando os
+        resumos existentes com os novos. Requer o lock do manifesto.
+
+        Returns:
+            Entrada do mês para o manifesto
+        """
+        versao = anterior["versao"] + 1 if anterior else 1
+        arquivo = f"{ROLLUPS_DIRNAME}/{mes}.{versao:04d}.csv"
+        arquivo_horas = f"{ROLLUPS_DIRNAME}/{mes}.{versao:04d}.horas.json"
+
+        if anterior is not None:
+            with open(self.segments_dir / anterior["horas"], "r", encoding="utf-8") as f:
+                for hora, quantidade in json.load(f).items():
+                    horas[hora] = horas.get(hora, 0) + quantidade
+
+        with atomic_write(self.segments_dir / arquivo, newline="") as destino:
+            if anterior is not None:
+                with open(self.segments_dir / anterior["arquivo"], "r", encoding="utf-8", newline="") as f:
+                    linhas = write_summaries(destino, merge_summaries(read_summaries(f), novos))
+            else:
+                linhas = write_summaries(destino, novos)
+        with atomic_write(self.segments_dir / arquivo_horas) as f:
+            json.dump(dict(sorted(horas.items())), f)
+
+        return {
+            "arquivo": arquivo,
+            "horas": arquivo_horas,
+            "versao": versao,
+            "linhas": linhas,
+            "solicitacoes": sum(horas.values()),
+        }
+
+    def iter_rollups(
+        self,
+        cpf: Optional[str] = None,
+        inicio: Timestamp = None,
+        fim: Timestamp = None
+    ) -> Iterator[Dict]:
+        """
+        Percorre os resumos das solicitações compactadas, em ordem de
+        (mês, CPF, status), lendo apenas os meses do período.
+
+        Args:
+            cpf: CPF do cliente
+            inicio: Início do período (inclusivo)
+            fim: Fim do período (inclusivo)
+
+        Yields:
+            Resumos no formato de SUMMARY_FIELDNAMES
+        """
+        inicio_iso = normalize_bound(inicio)
+        fim_iso = normalize_bound(fim, fim=True)
+        resumos = self.read_manifest().get("resumos", {})
+        for mes in sorted(resumos):
+            if inicio_iso is not None and mes < inicio_iso[:7]:
+                continue
+            if fim_iso is not None and mes > fim_iso[:7]:
+                continue
+            try:
+                f = open(self.segments_dir / resumos[mes]["arquivo"], "r", encoding="utf-8", newline="")
+            except FileNotFoundError:
+                continue  # Substituído por uma compactação concorrente
+            with f:
+                for resumo in read_summaries(f):
+                    if cpf is not None and resumo["cpf_cliente"] != cpf:
+                        continue
+                    if overlaps(resumo, inicio_iso, fim_iso):
+                        yield resumo
+
+    def rollup_hourly_volume(self) -> Dict[str, int]:
+        """Volume por hora das solicitações compactadas."""
+        volume: Dict[str, int] = {}
+        for entrada in self.read_manifest().get("resumos", {}).values():
+            try:
+                with open(self.segments_dir / entrada["horas"], "r", encoding="utf-8") as f:
+                    volume.update(json.load(f))
+            except FileNotFoundError:
+                continue
+        return dict(sorted(volume.items()))
+
+    def rebuild_index(self) -> None:
+        """Reconstrói o índice secundário por CPF a partir dos segmentos."""
+        self.flush()
+        self._cpf_index.invalidate()
+        for path in self.segments():
+            self._cpf_index.refresh(path)
+
+    def _scan(self, path: Path, cpf: Optional[str]) -> Iterator[Tuple[List[str], List[str]]]:
+        """
+        Produz (cabeçalho, campos) das linhas completas candidatas de um segmento.
+
+        Com CPF, lê apenas as linhas apontadas pelo índice secundário;
+        sem CPF, percorre o segmento inteiro.
+        """
+        if cpf is not None:
+            cabecalho, linhas = self._cpf_index.lookup(path, cpf)
+            for line in linhas:
+                yield cabecalho, parse_line(line)
+            return
+
+        try:
+            f = open_segment(path)
+        except FileNotFoundError:
+            return
+
+        with f:
+            cabecalho = parse_line(f.readline())
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # Escrita em andamento por outro processo
+                yield cabecalho, parse_line(line)
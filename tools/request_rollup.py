@@ -0,0 +1,152 @@
+"""
+Resumos mensais das solicitações de aumento de limite.
+
+Solicitações mais antigas que a janela de retenção são compactadas em
+um resumo por cliente, mês e status (quantidade, somas dos valores e
+primeira/última data) mais o volume por hora, e as linhas originais são
+removidas do histórico. Este módulo reúne o formato dos resumos, a
+combinação dos resumos com as solicitações ainda não compactadas e o job
+de compactação.
+
+Uso:
+    python -m tools.request_rollup [--data-dir data] [--retencao-dias 365]
+"""
+
+import argparse
+import csv
+import heapq
+import os
+from datetime import date, timedelta
+from pathlib import Path
+from typing import IO, Dict, Iterable, Iterator, Tuple
+
+from tools.storage import SUMMARY_FIELDNAMES
+
+# Dias de solicitações mantidos linha a linha; as anteriores são resumidas
+REQUESTS_RETENTION_DAYS = int(os.getenv("BANCO_REQUESTS_RETENTION_DAYS", "365"))
+
+SummaryKey = Tuple[str, str, str]
+
+
+def retention_cutoff(retencao_dias: int = REQUESTS_RETENTION_DAYS) -> date:
+    """Primeiro dia cujas solicitações são mantidas linha a linha."""
+    if retencao_dias < 2:
+        # Segmentos só são selados depois do dia seguinte ao seu
+        raise ValueError(f"Retenção mínima de 2 dias (recebido: {retencao_dias})")
+    return date.today() - timedelta(days=retencao_dias)
+
+
+def summary_key(resumo: Dict) -> SummaryKey:
+    """Chave de ordenação e agrupamento dos resumos: (mês, CPF, status)."""
+    return resumo["mes"], resumo["cpf_cliente"], resumo["status_pedido"]
+
+
+def add_request(resumos: Dict[SummaryKey, Dict], row: Dict) -> None:
+    """
+    Soma uma solicitação (formato de iter_requests) ao resumo do seu
+    cliente, mês e status.
+    """
+    ts = row["data_hora_solicitacao"]
+    chave = (ts[:7], row["cpf_cliente"], row["status_pedido"])
+    resumo = resumos.get(chave)
+    if resumo is None:
+        resumos[chave] = {
+            "mes": chave[0],
+            "cpf_cliente": chave[1],
+            "status_pedido": chave[2],
+            "quantidade": 1,
+            "soma_limite_atual": float(row["limite_atual"]),
+            "soma_novo_limite": float(row["novo_limite_solicitado"]),
+            "primeira_solicitacao": ts,
+            "ultima_solicitacao": ts,
+        }
+        return
+    resumo["quantidade"] += 1
+    resumo["soma_limite_atual"] += float(row["limite_atual"])
+    resumo["soma_novo_limite"] += float(row["novo_limite_solicitado"])
+    resumo["primeira_solicitacao"] = min(resumo["primeira_solicitacao"], ts)
+    resumo["ultima_solicitacao"] = max(resumo["ultima_solicitacao"], ts)
+
+
+def combine(resumo: Dict, outro: Dict) -> Dict:
+    """Combina dois resumos da mesma chave em um novo resumo."""
+    return {
+        **resumo,
+        "quantidade": resumo["quantidade"] + outro["quantidade"],
+        "soma_limite_atual": resumo["soma_limite_atual"] + outro["soma_limite_atual"],
+        "soma_novo_limite": resumo["soma_novo_limite"] + outro["soma_novo_limite"],
+        "primeira_solicitacao": min(resumo["primeira_solicitacao"], outro["primeira_solicitacao"]),
+        "ultima_solicitacao": max(resumo["ultima_solicitacao"], outro["ultima_solicitacao"]),
+    }
+
+
+def merge_summaries(*fluxos: Iterable[Dict]) -> Iterator[Dict]:
+    """
+    Intercala fluxos de resumos ordenados por (mês, CPF, status),
+    combinando os resumos de mesma chave.
+    """
+    atual = None
+    for resumo in heapq.merge(*fluxos, key=summary_key):
+        if atual is not None and summary_key(atual) == summary_key(resumo):
+            atual = combine(atual, resumo)
+            continue
+        if atual is not None:
+            yield atual
+        atual = resumo
+    if atual is not None:
+        yield atual
+
+
+def overlaps(resumo: Dict, inicio_iso: str = None, fim_iso: str = None) -> bool:
+    """Indica se o intervalo de datas do resumo se sobrepõe ao período."""
+    if inicio_iso is not None and resumo["ultima_solicitacao"] < inicio_iso:
+        return False
+    if fim_iso is not None and resumo["primeira_solicitacao"] > fim_iso:
+        return False
+    return True
+
+
+def write_summaries(f, resumos: Iterable[Dict]) -> int:
+    """Grava resumos (já ordenados) em CSV. Retorna o número de linhas."""
+    writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDNAMES, lineterminator="\n")
+    writer.writeheader()
+    linhas = 0
+    for resumo in resumos:
+        writer.writerow(resumo)
+        linhas += 1
+    return linhas
+
+
+def read_summaries(f: IO[str]) -> Iterator[Dict]:
+    """Lê um arquivo de resumos aberto, convertendo os valores numéricos."""
+    for row in csv.DictReader(f):
+        row["quantidade"] = int(row["quantidade"])
+        row["soma_limite_atual"] = float(row["soma_limite_atual"])
+        row["soma_novo_limite"] = float(row["soma_novo_limite"])
+        yield row
+
+
+def main() -> None:
+    """Ponto de entrada de linha de comando (job de compactação)."""
+    from tools.storage import create_backend
+
+    default_data_dir = Path(__file__).parent.parent / "data"
+
+    parser = argparse.ArgumentParser(
+        description="Resume as solicitações anteriores à janela de retenção"
+    )
+    parser.add_argument("--data-dir", type=Path, default=default_data_dir)
+    parser.add_argument("--retencao-dias", type=int, default=REQUESTS_RETENTION_DAYS)
+    args = parser.parse_args()
+
+    backend = create_backend(args.data_dir)
+    try:
+        corte = retention_cutoff(args.retencao_dias)
+        total = backend.compact_requests(corte)
+    finally:
+        backend.close()
+    print(f"✅ {total} solicitações anteriores a {corte.isoformat()} resumidas")
+
+
+if __name__ == "__main__":
+    main()
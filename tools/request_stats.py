@@ -0,0 +1,580 @@
+"""
+Estatísticas materializadas das solicitações de aumento de limite.
+Mantém contadores e somas por faixa de score e status, volume por hora e
+um esboço (histograma logarítmico) dos valores solicitados por faixa.
+Os agregados são atualizados a cada solicitação registrada e gravados em
+um arquivo JSON ao lado do histórico, de modo que as consultas não
+dependem do tamanho do histórico; podem ser reconstruídos a partir dele
+para verificação.
+"""
+
+import atexit
+import bisect
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from tools.atomic_file import atomic_write
+from tools.client_index import file_signature
+from tools.file_lock import FileLock
+from tools.request_log import normalize_bound
+from tools.storage import Timestamp
+
+STATS_VERSION = 1
+
+# Faixa usada quando o cliente não existe ou o score não está na política
+SEM_FAIXA = "sem_faixa"
+
+# Rótulo único das faixas reunidas em without_bands
+TODAS_FAIXAS = "todas"
+
+# Status cujo novo limite solicitado é considerado concedido
+STATUS_APROVADO = "aprovado"
+
+# Solicitações acumuladas em memória antes de gravar os agregados
+STATS_FLUSH_ROWS = int(os.getenv("BANCO_STATS_FLUSH_ROWS", "64"))
+
+# Intervalo máximo (s) até gravar agregados pendentes
+STATS_FLUSH_INTERVAL_S = float(os.getenv("BANCO_STATS_FLUSH_INTERVAL_S", "5"))
+
+# Erro relativo máximo dos quantis estimados pelo esboço
+SKETCH_RELATIVE_ACCURACY = 0.01
+_GAMMA = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+Faixas = List[Tuple[float, float, float]]
+
+
+def band_label(faixas: Faixas, score: Optional[float]) -> str:
+    """
+    Rótulo da faixa de score da política que contém o score.
+
+    Args:
+        faixas: Faixas (score_minimo, score_maximo, limite_maximo) ordenadas
+        score: Score do cliente (None se desconhecido)
+
+    Returns:
+        Rótulo "minimo-maximo" (ex: "501-600") ou SEM_FAIXA
+    """
+    if score is None:
+        return SEM_FAIXA
+    i = bisect.bisect_right([faixa[0] for faixa in faixas], score) - 1
+    if i < 0 or score > faixas[i][1]:
+        return SEM_FAIXA
+    return f"{faixas[i][0]:g}-{faixas[i][1]:g}"
+
+
+class AmountSketch:
+    """
+    Histograma logarítmico de valores positivos.
+
+    Cada balde cobre um intervalo de razão _GAMMA, de modo que os quantis
+    estimados têm erro relativo de no máximo SKETCH_RELATIVE_ACCURACY, com
+    poucas centenas de baldes para qualquer faixa de valores monetários.
+    """
+
+    __slots__ = ("zeros", "baldes")
+
+    def __init__(self):
+        self.zeros = 0
+        self.baldes: Dict[int, int] = {}
+
+    def add(self, valor: float, quantidade: int = 1) -> None:
+        """Adiciona um valor ao esboço."""
+        if valor <= 0:
+            self.zeros += quantidade
+            return
+        balde = math.ceil(math.log(valor) / _LOG_GAMMA)
+        self.baldes[balde] = self.baldes.get(balde, 0) + quantidade
+
+    def merge(self, outro: "AmountSketch") -> None:
+        """Soma as contagens de outro esboço a este."""
+        self.zeros += outro.zeros
+        for balde, quantidade in outro.baldes.items():
+            self.baldes[balde] = self.baldes.get(balde, 0) + quantidade
+
+    @property
+    def count(self) -> int:
+        return self.zeros + sum(self.baldes.values())
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estima o quantil q (0 a 1) dos valores adicionados.
+
+        Returns:
+            Valor estimado, ou None se o esboço estiver vazio
+        """
+        total = self.count
+        if total == 0:
+            return None
+        posicao = q * (total - 1)
+        acumulado = self.zeros
+        if posicao < acumulado:
+            return 0.0
+        for balde in sorted(self.baldes):
+            acumulado += self.baldes[balde]
+            if posicao < acumulado:
+                # Ponto do balde com o mesmo erro relativo para as duas bordas
+                return 2 * _GAMMA ** balde / (_GAMMA + 1)
+        return 2 * _GAMMA ** max(self.baldes) / (_GAMMA + 1)
+
+    def to_json(self) -> Dict:
+        return {"zeros": self.zeros, "baldes": {str(b): n for b, n in self.baldes.items()}}
+
+    @classmethod
+    def from_json(cls, dados: Dict) -> "AmountSketch":
+        esboco = cls()
+        esboco.zeros = dados.get("zeros", 0)
+        esboco.baldes = {int(b): n for b, n in dados.get("baldes", {}).items()}
+        return esboco
+
+
+class RequestAggregates:
+    """Agregados aditivos de um conjunto de solicitações."""
+
+    __slots__ = ("total", "contadores", "por_hora", "esbocos")
+
+    def __init__(self):
+        self.total = 0
+        # (faixa, status) -> [quantidade, soma do limite atual, soma solicitada]
+        self.contadores: Dict[Tuple[str, str], List[float]] = {}
+        # "AAAA-MM-DDTHH" -> quantidade
+        self.por_hora: Dict[str, int] = {}
+        # faixa -> esboço dos novos limites solicitados
+        self.esbocos: Dict[str, AmountSketch] = {}
+
+    def add(
+        self,
+        faixa: str,
+        status: str,
+        timestamp: str,
+        limite_atual: float,
+        novo_limite: float
+    ) -> None:
+        """Contabiliza uma solicitação."""
+        self.total += 1
+        contador = self.contadores.get((faixa, status))
+        if contador is None:
+            contador = self.contadores[(faixa, status)] = [0, 0.0, 0.0]
+        contador[0] += 1
+        contador[1] += limite_atual
+        contador[2] += novo_limite
+
+        hora = timestamp[:13]
+        self.por_hora[hora] = self.por_hora.get(hora, 0) + 1
+
+        esboco = self.esbocos.get(faixa)
+        if esboco is None:
+            esboco = self.esbocos[faixa] = AmountSketch()
+        esboco.add(novo_limite)
+
+    def add_summary(
+        self,
+        faixa: str,
+        status: str,
+        quantidade: int,
+        soma_atual: float,
+        soma_solicitada: float
+    ) -> None:
+        """
+        Contabiliza um resumo de solicitações compactadas. O volume por hora
+        é somado à parte; no esboço, as solicitações entram pelo valor médio.
+        """
+        self.total += quantidade
+        contador = self.contadores.setdefault((faixa, status), [0, 0.0, 0.0])
+        contador[0] += quantidade
+        contador[1] += soma_atual
+        contador[2] += soma_solicitada
+        esboco = self.esbocos.setdefault(faixa, AmountSketch())
+        esboco.add(soma_solicitada / quantidade, quantidade)
+
+    def merge(self, outro: "RequestAggregates") -> None:
+        """Soma os agregados de outro conjunto de solicitações a este."""
+        self.total += outro.total
+        for chave, (quantidade, soma_atual, soma_solicitada) in outro.contadores.items():
+            contador = self.contadores.setdefault(chave, [0, 0.0, 0.0])
+            contador[0] += quantidade
+            contador[1] += soma_atual
+            contador[2] += soma_solicitada
+        for hora, quantidade in outro.por_hora.items():
+            self.por_hora[hora] = self.por_hora.get(hora, 0) + quantidade
+        for faixa, esboco in outro.esbocos.items():
+            self.esbocos.setdefault(faixa, AmountSketch()).merge(esboco)
+
+    def copy(self) -> "RequestAggregates":
+        copia = RequestAggregates()
+        copia.merge(self)
+        return copia
+
+    def without_bands(self) -> "RequestAggregates":
+        """
+        Cópia com todas as faixas de score reunidas em TODAS_FAIXAS, para
+        comparações que não dependem do score de cada cliente.
+        """
+        copia = RequestAggregates()
+        copia.total = self.total
+        copia.por_hora = dict(self.por_hora)
+        for (_, status), (quantidade, soma_atual, soma_solicitada) in self.contadores.items():
+            contador = copia.contadores.setdefault((TODAS_FAIXAS, status), [0, 0.0, 0.0])
+            contador[0] += quantidade
+            contador[1] += soma_atual
+            contador[2] += soma_solicitada
+        for esboco in self.esbocos.values():
+            copia.esbocos.setdefault(TODAS_FAIXAS, AmountSketch()).merge(esboco)
+        return copia
+
+    def matches(
+        self,
+        outro: "RequestAggregates",
+        rel_tol: float = 1e-9,
+        esbocos_exatos: bool = True
+    ) -> bool:
+        """
+        Compara com outros agregados: contagens devem ser idênticas e somas
+        iguais a menos de erros de arredondamento (a ordem das somas muda).
+        Com esbocos_exatos=False, os esboços são comparados apenas pela
+        quantidade de valores (reconstruções a partir de resumos).
+        """
+        if (
+            self.total != outro.total
+            or self.por_hora != outro.por_hora
+            or self.contadores.keys() != outro.contadores.keys()
+        ):
+            return False
+        for chave, contador in self.contadores.items():
+            outro_contador = outro.contadores[chave]
+            if contador[0] != outro_contador[0]:
+                return False
+            if not all(
+                math.isclose(a, b, rel_tol=rel_tol, abs_tol=1e-6)
+                for a, b in zip(contador[1:], outro_contador[1:])
+            ):
+                return False
+        if not esbocos_exatos:
+            contagens = {faixa: esboco.count for faixa, esboco in self.esbocos.items()}
+            return contagens == {faixa: esboco.count for faixa, esboco in outro.esbocos.items()}
+        esbocos = {faixa: esboco.to_json() for faixa, esboco in self.esbocos.items()}
+        return esbocos == {faixa: esboco.to_json() for faixa, esboco in outro.esbocos.items()}
+
+    def summary(self, faixa: Optional[str] = None) -> Dict:
+        """
+        Resume as solicitações de uma faixa (ou de todas).
+
+        Returns:
+            Dicionário com quantidade, quantidade por status, taxa de
+            aprovação, limite atual médio, valor solicitado médio, valor
+            concedido médio (entre as aprovadas) e quantis estimados do
+            valor solicitado
+        """
+        quantidade = 0
+        por_status: Dict[str, int] = {}
+        soma_atual = soma_solicitada = soma_concedida = 0.0
+        for (faixa_contador, status), contador in self.contadores.items():
+            if faixa is not None and faixa_contador != faixa:
+                continue
+            quantidade += contador[0]
+            por_status[status] = por_status.get(status, 0) + contador[0]
+            soma_atual += contador[1]
+            soma_solicitada += contador[2]
+            if status == STATUS_APROVADO:
+                soma_concedida += contador[2]
+
+        if faixa is not None:
+            esboco = self.esbocos.get(faixa, AmountSketch())
+        else:
+            esboco = AmountSketch()
+            for parcial in self.esbocos.values():
+                esboco.merge(parcial)
+
+        aprovadas = por_status.get(STATUS_APROVADO, 0)
+        return {
+            "solicitacoes": quantidade,
+            "por_status": por_status,
+            "taxa_aprovacao": aprovadas / quantidade if quantidade else None,
+            "limite_atual_medio": soma_atual / quantidade if quantidade else None,
+            "solicitado_medio": soma_solicitada / quantidade if quantidade else None,
+            "concedido_medio": soma_concedida / aprovadas if aprovadas else None,
+            "solicitado_p50": esboco.quantile(0.5),
+            "solicitado_p90": esboco.quantile(0.9),
+        }
+
+    def to_json(self) -> Dict:
+        return {
+            "versao": STATS_VERSION,
+            "total": self.total,
+            "contadores": [
+                [faixa, status, *contador]
+                for (faixa, status), contador in sorted(self.contadores.items())
+            ],
+            "por_hora": dict(sorted(self.por_hora.items())),
+            "esbocos": {faixa: esboco.to_json() for faixa, esboco in sorted(self.esbocos.items())},
+        }
+
+    @classmethod
+    def from_json(cls, dados: Dict) -> "RequestAggregates":
+        if dados.get("versao") != STATS_VERSION:
+            raise ValueError(f"Versão de estatísticas não suportada: {dados.get('versao')}")
+        agregados = cls()
+        agregados.total = dados["total"]
+        agregados.contadores = {
+            (faixa, status): [quantidade, soma_atual, soma_solicitada]
+            for faixa, status, quantidade, soma_atual, soma_solicitada in dados["contadores"]
+        }
+        agregados.por_hora = dict(dados["por_hora"])
+        agregados.esbocos = {
+            faixa: AmountSketch.from_json(esboco) for faixa, esboco in dados["esbocos"].items()
+        }
+        return agregados
+
+
+def build_aggregates(
+    solicitacoes: Iterable[Dict],
+    faixas: Faixas,
+    score_of: Callable[[str], Optional[float]],
+    resumos: Iterable[Dict] = (),
+    volume_resumido: Optional[Mapping[str, int]] = None
+) -> RequestAggregates:
+    """
+    Calcula os agregados a partir do histórico de solicitações.
+
+    O histórico não guarda o score do cliente no momento da solicitação:
+    a faixa é obtida pelo score informado por score_of (o score atual).
+
+    Args:
+        solicitacoes: Solicitações no formato de iter_requests (valores como texto)
+        faixas: Faixas de score da política
+        score_of: Função CPF -> score do cliente (None se não existir)
+        resumos: Resumos das solicitações compactadas (iter_request_rollups)
+        volume_resumido: Volume por hora das solicitações compactadas
+
+    Returns:
+        Agregados das solicitações
+    """
+    agregados = RequestAggregates()
+    scores: Dict[str, Optional[float]] = {}
+    for row in solicitacoes:
+        cpf = row["cpf_cliente"]
+        if cpf not in scores:
+            scores[cpf] = score_of(cpf)
+        agregados.add(
+            band_label(faixas, scores[cpf]),
+            row["status_pedido"],
+            row["data_hora_solicitacao"],
+            float(row["limite_atual"]),
+            float(row["novo_limite_solicitado"]),
+        )
+    for resumo in resumos:
+        cpf = resumo["cpf_cliente"]
+        if cpf not in scores:
+            scores[cpf] = score_of(cpf)
+        agregados.add_summary(
+            band_label(faixas, scores[cpf]),
+            resumo["status_pedido"],
+            resumo["quantidade"],
+            resumo["soma_limite_atual"],
+            resumo["soma_novo_limite"],
+        )
+    for hora, quantidade in (volume_resumido or {}).items():
+        agregados.por_hora[hora] = agregados.por_hora.get(hora, 0) + quantidade
+    return agregados
+
+
+class RequestStats:
+    """
+    Agregados das solicitações persistidos em um arquivo JSON.
+
+    Cada processo acumula suas solicitações em memória e as soma ao
+    arquivo, sob lock, a cada STATS_FLUSH_ROWS solicitações, no máximo
+    STATS_FLUSH_INTERVAL_S segundos depois da primeira pendente (por um
+    timer em segundo plano) ou na saída do processo. As consultas
+    combinam o arquivo (relido quando outro processo o altera) com as
+    solicitações ainda não gravadas.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path],
+        max_rows: int = STATS_FLUSH_ROWS,
+        max_delay: float = STATS_FLUSH_INTERVAL_S
+    ):
+        """
+        Args:
+            path: Arquivo dos agregados, ou None para mantê-los apenas em memória
+            max_rows: Solicitações pendentes que disparam a gravação
+            max_delay: Intervalo máximo (s) entre gravações com pendências
+        """
+        self.path = Path(path) if path is not None else None
+        self.max_rows = max(1, max_rows)
+        self.max_delay = max_delay
+
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(self.path) if self.path is not None else None
+        # Agregados completos (arquivo + pendentes) e apenas os pendentes
+        self._totais = RequestAggregates()
+        self._pendentes = RequestAggregates()
+        self._signature: Optional[Tuple[int, int]] = None
+        self._flushed_at = time.monotonic()
+        # Gravação agendada para as pendentes, se houver
+        self._timer: Optional[threading.Timer] = None
+
+        if self.path is not None:
+            atexit.register(self.close)
+
+    def exists(self) -> bool:
+        """Indica se os agregados já foram gravados alguma vez."""
+        return self.path is not None and self.path.exists()
+
+    def _read(self) -> RequestAggregates:
+        """Lê os agregados gravados (vazios se o arquivo não existir)."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return RequestAggregates.from_json(json.load(f))
+        except FileNotFoundError:
+            return RequestAggregates()
+
+    def _write(self, agregados: RequestAggregates) -> None:
+        """Grava os agregados. Requer self._file_lock."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Sem fsync: os agregados podem ser reconstruídos a partir do histórico
+        with atomic_write(self.path, fsync=False) as f:
+            json.dump(agregados.to_json(), f, ensure_ascii=False)
+        self._signature = file_signature(self.path)
+
+    def _sync(self) -> None:
+        """Relê o arquivo se outro processo o alterou. Requer self._lock."""
+        if self.path is None:
+            return
+        signature = file_signature(self.path) if self.path.exists() else None
+        if signature != self._signature:
+            totais = self._read()
+            totais.merge(self._pendentes)
+            self._totais = totais
+            self._signature = signature
+
+    def _flush_locked(self) -> None:
+        """Soma os pendentes ao arquivo. Requer self._lock."""
+        self._flushed_at = time.monotonic()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self.path is None or self._pendentes.total == 0:
+            return
+        with self._file_lock:
+            gravados = self._read()
+            gravados.merge(self._pendentes)
+            self._write(gravados)
+        self._totais = gravados
+        self._pendentes = RequestAggregates()
+
+    def record(
+        self,
+        faixa: str,
+        status: str,
+        timestamp: str,
+        limite_atual: float,
+        novo_limite: float
+    ) -> None:
+        """
+        Contabiliza uma solicitação registrada.
+
+        Args:
+            faixa: Rótulo da faixa de score do cliente (ver band_label)
+            status: Status da solicitação
+            timestamp: Data/hora ISO 8601 da solicitação
+            limite_atual: Limite atual de crédito
+            novo_limite: Novo limite solicitado
+        """
+        with self._lock:
+            self._totais.add(faixa, status, timestamp, limite_atual, novo_limite)
+            self._pendentes.add(faixa, status, timestamp, limite_atual, novo_limite)
+            if (
+                self._pendentes.total >= self.max_rows
+                or time.monotonic() - self._flushed_at >= self.max_delay
+            ):
+                self._flush_locked()
+            elif self._timer is None and self.path is not None:
+                # Sem novas solicitações, as pendentes são gravadas pelo timer
+                self._timer = threading.Timer(self.max_delay, self._flush_on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush_on_timer(self) -> None:
+        """Grava as pendentes ao fim do intervalo (thread do timer)."""
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Erro ao gravar estatísticas de solicitações: {e}")
+
+    def flush(self) -> None:
+        """Grava imediatamente as solicitações pendentes."""
+        with self._lock:
+            self._flush_locked()
+
+    def replace(self, agregados: RequestAggregates) -> None:
+        """
+        Substitui os agregados gravados (ex: após reconstruí-los do histórico).
+        As solicitações pendentes deste processo são descartadas, pois já
+        estão no histórico usado na reconstrução.
+        """
+        with self._lock:
+            if self._file_lock is not None:
+                with self._file_lock:
+                    self._write(agregados)
+            self._totais = agregados.copy()
+            self._pendentes = RequestAggregates()
+            self._flushed_at = time.monotonic()
+
+    def aggregates(self) -> RequestAggregates:
+        """Cópia dos agregados atuais (arquivo + pendentes)."""
+        with self._lock:
+            self._sync()
+            return self._totais.copy()
+
+    def summary(self, faixa: Optional[str] = None) -> Dict:
+        """
+        Resumo das solicitações de uma faixa de score, ou de todas.
+        O custo depende apenas do número de faixas e status, não do
+        tamanho do histórico.
+
+        Args:
+            faixa: Rótulo da faixa (ex: "501-600"); None para todas
+        """
+        with self._lock:
+            self._sync()
+            return self._totais.summary(faixa)
+
+    def summary_by_band(self) -> Dict[str, Dict]:
+        """Resumo de cada faixa de score com solicitações."""
+        with self._lock:
+            self._sync()
+            return {faixa: self._totais.summary(faixa) for faixa in sorted(self._totais.esbocos)}
+
+    def volume_by_hour(self, inicio: Timestamp = None, fim: Timestamp = None) -> Dict[str, int]:
+        """
+        Número de solicitações por hora ("AAAA-MM-DDTHH"), em ordem.
+
+        Args:
+            inicio: Início do período (inclusivo); None para sem limite
+            fim: Fim do período (inclusivo); None para sem limite
+        """
+        inicio = normalize_bound(inicio)
+        fim = normalize_bound(fim, fim=True)
+        with self._lock:
+            self._sync()
+            return {
+                hora: quantidade
+                for hora, quantidade in sorted(self._totais.por_hora.items())
+                if (inicio is None or hora >= inicio[:13]) and (fim is None or hora <= fim[:13])
+            }
+
+    def close(self) -> None:
+        """Grava as solicitações pendentes."""
+        try:
+            self.flush()
+        finally:
+            if self.path is not None:
+                atexit.unregister(self.close)
@@ -0,0 +1,183 @@
+"""
+Índice de intervalos para a política de score x limite (score_limite.csv).
+Mantém as faixas ordenadas em memória e responde consultas com busca
+binária, recarregando o arquivo apenas quando ele muda.
+"""
+
+import bisect
+import csv
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from tools.binary_snapshot import SNAPSHOT_ENABLED, load_policy_snapshot
+from tools.client_index import file_signature
+
+# Produto usado quando o arquivo não tem a coluna "produto"
+PRODUTO_PADRAO = "padrao"
+
+# Maior distância permitida entre o fim de uma faixa e o início da próxima.
+# As faixas são definidas em pontos inteiros (ex: 0-500, 501-600).
+TOLERANCIA_CONTIGUIDADE = 1.0
+
+
+class ScoreBands:
+    """Faixas de score de um produto, ordenadas pelo score mínimo."""
+
+    __slots__ = ("minimos", "maximos", "limites")
+
+    def __init__(self, faixas: List[Tuple[float, float, float]]):
+        faixas = sorted(faixas)
+        self.minimos = [faixa[0] for faixa in faixas]
+        self.maximos = [faixa[1] for faixa in faixas]
+        self.limites = [faixa[2] for faixa in faixas]
+
+    def validate(self, produto: str) -> None:
+        """
+        Valida que as faixas não se sobrepõem e não deixam lacunas.
+
+        Raises:
+            ValueError: Se alguma faixa for inválida, sobreposta ou descontínua
+        """
+        for i, (score_min, score_max) in enumerate(zip(self.minimos, self.maximos)):
+            if score_min > score_max:
+                raise ValueError(
+                    f"Faixa inválida para '{produto}': {score_min} > {score_max}"
+                )
+            if i == 0:
+                continue
+
+            anterior_max = self.maximos[i - 1]
+            if score_min <= anterior_max:
+                raise ValueError(
+                    f"Faixas sobrepostas para '{produto}': "
+                    f"{self.minimos[i - 1]}-{anterior_max} e {score_min}-{score_max}"
+                )
+            if score_min - anterior_max > TOLERANCIA_CONTIGUIDADE:
+                raise ValueError(
+                    f"Lacuna entre faixas para '{produto}': "
+                    f"{anterior_max} e {score_min}"
+                )
+
+    def as_tuples(self) -> List[Tuple[float, float, float]]:
+        """Faixas como tuplas (score_minimo, score_maximo, limite_maximo)."""
+        return list(zip(self.minimos, self.maximos, self.limites))
+
+    def lookup(self, score: float) -> Optional[float]:
+        """Retorna o limite da faixa que contém o score em O(log n)."""
+        i = bisect.bisect_right(self.minimos, score) - 1
+        if i >= 0 and score <= self.maximos[i]:
+            return self.limites[i]
+        return None
+
+
+def read_policy_csv(filepath: Path) -> Dict[str, ScoreBands]:
+    """
+    Lê score_limite.csv e valida as faixas de cada produto.
+
+    Args:
+        filepath: Caminho de score_limite.csv
+
+    Returns:
+        Dicionário {produto: ScoreBands}
+
+    Raises:
+        ValueError: Se alguma faixa for inválida, sobreposta ou descontínua
+    """
+    # Arquivo pequeno: o módulo csv basta e mantém pandas fora do chat
+    faixas: Dict[str, List[Tuple[float, float, float]]] = {}
+    with open(filepath, "r", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            if not row.get("score_minimo"):
+                continue
+            produto = row.get("produto") or PRODUTO_PADRAO
+            faixas.setdefault(produto, []).append((
+                float(row["score_minimo"]),
+                float(row["score_maximo"]),
+                float(row["limite_maximo"]),
+            ))
+    return _build_bands(faixas)
+
+
+def _build_bands(faixas: Dict[str, List[Tuple[float, float, float]]]) -> Dict[str, ScoreBands]:
+    """Monta e valida as faixas de cada produto."""
+    por_produto = {}
+    for produto, lista in faixas.items():
+        bandas = ScoreBands(lista)
+        bandas.validate(produto)
+        por_produto[produto] = bandas
+    return por_produto
+
+
+class ScoreLimitIndex:
+    """Índice de faixas de score por produto com invalidação por mtime/tamanho."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filepath: Optional[Path] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._por_produto: Dict[str, ScoreBands] = {}
+
+    def _load(self, filepath: Path, signature: Tuple[int, int]) -> None:
+        """Relê a política, valida as faixas e reconstrói o índice."""
+        if SNAPSHOT_ENABLED:
+            por_produto = _build_bands(load_policy_snapshot(filepath))
+        else:
+            por_produto = read_policy_csv(filepath)
+
+        self._por_produto = por_produto
+        self._filepath = filepath
+        self._signature = signature
+
+    def _ensure_fresh(self, filepath: Path) -> Dict[str, ScoreBands]:
+        """Garante que o índice reflete o conteúdo atual do arquivo."""
+        signature = file_signature(filepath)
+        if filepath == self._filepath and signature == self._signature:
+            return self._por_produto
+
+        with self._lock:
+            signature = file_signature(filepath)
+            if filepath != self._filepath or signature != self._signature:
+                self._load(filepath, signature)
+            return self._por_produto
+
+    def get_limit(
+        self,
+        filepath: Path,
+        score: float,
+        produto: Optional[str] = None
+    ) -> Optional[float]:
+        """
+        Busca o limite máximo para um score.
+
+        Args:
+            filepath: Caminho de score_limite.csv
+            score: Score de crédito (0-1000)
+            produto: Produto de crédito (padrão: PRODUTO_PADRAO)
+
+        Returns:
+            Limite máximo da faixa ou None se nenhuma faixa contiver o score
+        """
+        bandas = self._ensure_fresh(filepath).get(produto or PRODUTO_PADRAO)
+        if bandas is None:
+            return None
+        return bandas.lookup(score)
+
+    def get_bands(
+        self,
+        filepath: Path,
+        produto: Optional[str] = None
+    ) -> List[Tuple[float, float, float]]:
+        """
+        Retorna as faixas de um produto, ordenadas pelo score mínimo.
+
+        Args:
+            filepath: Caminho de score_limite.csv
+            produto: Produto de crédito (padrão: PRODUTO_PADRAO)
+
+        Returns:
+            Lista de (score_minimo, score_maximo, limite_maximo)
+        """
+        bandas = self._ensure_fresh(filepath).get(produto or PRODUTO_PADRAO)
+        return bandas.as_tuples() if bandas is not None else []
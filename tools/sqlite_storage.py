@@ -0,0 +1,398 @@
+"""
+Engine de armazenamento em SQLite embarcado.
+Usa busca indexada por CPF, modo WAL e consultas parametrizadas
+(reaproveitadas pelo cache de statements do sqlite3).
+"""
+
+import sqlite3
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Dict, Hashable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from tools.client_journal import normalize_updates
+from tools.request_log import normalize_bound
+from tools.score_limit_index import PRODUTO_PADRAO
+from tools.storage import (
+    CHANGE_FEED_FILENAME,
+    CLIENT_FIELDNAMES,
+    REQUEST_FIELDNAMES,
+    REQUEST_STATS_FILENAME,
+    SUMMARY_FIELDNAMES,
+    VERSION_FIELD,
+    Statuses,
+    StorageBackend,
+    Timestamp,
+    VersionConflictError,
+    status_set,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clientes (
+    cpf TEXT PRIMARY KEY,
+    data_nascimento TEXT NOT NULL,
+    nome TEXT NOT NULL,
+    limite_credito REAL NOT NULL,
+    score_credito REAL NOT NULL,
+    versao INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS score_limite (
+    produto TEXT NOT NULL,
+    score_minimo REAL NOT NULL,
+    score_maximo REAL NOT NULL,
+    limite_maximo REAL NOT NULL,
+    PRIMARY KEY (produto, score_minimo)
+);
+
+CREATE TABLE IF NOT EXISTS solicitacoes_aumento_limite (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cpf_cliente TEXT NOT NULL,
+    data_hora_solicitacao TEXT NOT NULL,
+    limite_atual REAL NOT NULL,
+    novo_limite_solicitado REAL NOT NULL,
+    status_pedido TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_solicitacoes_cpf
+    ON solicitacoes_aumento_limite (cpf_cliente);
+
+CREATE INDEX IF NOT EXISTS idx_solicitacoes_data
+    ON solicitacoes_aumento_limite (data_hora_solicitacao);
+
+CREATE TABLE IF NOT EXISTS resumo_solicitacoes (
+    mes TEXT NOT NULL,
+    cpf_cliente TEXT NOT NULL,
+    status_pedido TEXT NOT NULL,
+    quantidade INTEGER NOT NULL,
+    soma_limite_atual REAL NOT NULL,
+    soma_novo_limite REAL NOT NULL,
+    primeira_solicitacao TEXT NOT NULL,
+    ultima_solicitacao TEXT NOT NULL,
+    PRIMARY KEY (mes, cpf_cliente, status_pedido)
+);
+
+CREATE INDEX IF NOT EXISTS idx_resumo_solicitacoes_cpf
+    ON resumo_solicitacoes (cpf_cliente);
+
+CREATE TABLE IF NOT EXISTS resumo_solicitacoes_hora (
+    hora TEXT PRIMARY KEY,
+    quantidade INTEGER NOT NULL
+);
+"""
+
+SQL_GET_CLIENT = (
+    "SELECT cpf, nome, limite_credito, score_credito, data_nascimento, versao "
+    "FROM clientes WHERE cpf = ?"
+)
+SQL_MAX_CLIENT_ROWID = "SELECT MAX(rowid) FROM clientes"
+SQL_CLIENT_EXISTS = "SELECT 1 FROM clientes WHERE cpf = ?"
+SQL_CLIENT_VERSION = "SELECT versao FROM clientes WHERE cpf = ?"
+SQL_CLIENT_COLUMNS = "PRAGMA table_info(clientes)"
+# Bancos criados antes do versionamento dos registros
+SQL_ADD_VERSION_COLUMN = "ALTER TABLE clientes ADD COLUMN versao INTEGER NOT NULL DEFAULT 0"
+# Toda alteração avança a versão; a forma condicionada só grava na versão esperada
+SQL_UPDATE_FIELD = {
+    campo: f"UPDATE clientes SET {campo} = ?, versao = versao + 1 WHERE cpf = ?"
+    for campo in ("score_credito", "limite_credito")
+}
+SQL_UPDATE_FIELD_IF_VERSION = {
+    campo: sql + " AND versao = ?" for campo, sql in SQL_UPDATE_FIELD.items()
+}
+SQL_LIMIT_BY_SCORE = (
+    "SELECT score_maximo, limite_maximo FROM score_limite "
+    "WHERE produto = ? AND score_minimo <= ? "
+    "ORDER BY score_minimo DESC LIMIT 1"
+)
+SQL_SCORE_BANDS = (
+    "SELECT score_minimo, score_maximo, limite_maximo FROM score_limite "
+    "WHERE produto = ? ORDER BY score_minimo"
+)
+SQL_INSERT_REQUEST = (
+    "INSERT INTO solicitacoes_aumento_limite "
+    "(cpf_cliente, data_hora_solicitacao, limite_atual, "
+    "novo_limite_solicitado, status_pedido) VALUES (?, ?, ?, ?, ?)"
+)
+SQL_SELECT_REQUESTS = (
+    "SELECT cpf_cliente, data_hora_solicitacao, limite_atual, "
+    "novo_limite_solicitado, status_pedido "
+    "FROM solicitacoes_aumento_limite"
+)
+# Soma as solicitações antigas aos resumos existentes (mesma chave)
+SQL_ROLLUP_REQUESTS = (
+    "INSERT INTO resumo_solicitacoes "
+    "SELECT substr(data_hora_solicitacao, 1, 7), cpf_cliente, status_pedido, "
+    "COUNT(*), SUM(limite_atual), SUM(novo_limite_solicitado), "
+    "MIN(data_hora_solicitacao), MAX(data_hora_solicitacao) "
+    "FROM solicitacoes_aumento_limite WHERE data_hora_solicitacao < ? "
+    "GROUP BY 1, 2, 3 "
+    "ON CONFLICT (mes, cpf_cliente, status_pedido) DO UPDATE SET "
+    "quantidade = quantidade + excluded.quantidade, "
+    "soma_limite_atual = soma_limite_atual + excluded.soma_limite_atual, "
+    "soma_novo_limite = soma_novo_limite + excluded.soma_novo_limite, "
+    "primeira_solicitacao = min(primeira_solicitacao, excluded.primeira_solicitacao), "
+    "ultima_solicitacao = max(ultima_solicitacao, excluded.ultima_solicitacao)"
+)
+SQL_ROLLUP_HOURS = (
+    "INSERT INTO resumo_solicitacoes_hora "
+    "SELECT substr(data_hora_solicitacao, 1, 13), COUNT(*) "
+    "FROM solicitacoes_aumento_limite WHERE data_hora_solicitacao < ? "
+    "GROUP BY 1 "
+    "ON CONFLICT (hora) DO UPDATE SET quantidade = quantidade + excluded.quantidade"
+)
+SQL_DELETE_OLD_REQUESTS = (
+    "DELETE FROM solicitacoes_aumento_limite WHERE data_hora_solicitacao < ?"
+)
+SQL_SELECT_ROLLUPS = f"SELECT {', '.join(SUMMARY_FIELDNAMES)} FROM resumo_solicitacoes"
+SQL_ROLLUP_HOURLY_VOLUME = "SELECT hora, quantidade FROM resumo_solicitacoes_hora ORDER BY hora"
+
+
+class SQLiteStorage(StorageBackend):
+    """Armazenamento em um único arquivo SQLite."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        conn = self.connection()
+        conn.executescript(SCHEMA)
+        if VERSION_FIELD not in {row["name"] for row in conn.execute(SQL_CLIENT_COLUMNS)}:
+            with conn:
+                conn.execute(SQL_ADD_VERSION_COLUMN)
+
+    def connection(self) -> sqlite3.Connection:
+        """Retorna a conexão da thread atual, abrindo-a se necessário."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row_to_client(row: sqlite3.Row) -> Dict:
+        """Converte uma linha da tabela no formato usado pelos agentes."""
+        return {
+            "cpf": row["cpf"],
+            "nome": row["nome"],
+            "limite_credito": float(row["limite_credito"]),
+            "score_credito": float(row["score_credito"]),
+            "data_nascimento": row["data_nascimento"],
+            "versao": row["versao"],
+        }
+
+    def authenticate_client(self, cpf: str, data_nascimento: str) -> Optional[Dict]:
+        cliente = self.get_client_by_cpf(cpf)
+        if cliente and cliente["data_nascimento"] == data_nascimento:
+            return cliente
+        return None
+
+    def get_client_by_cpf(self, cpf: str) -> Optional[Dict]:
+        row = self.connection().execute(SQL_GET_CLIENT, (cpf,)).fetchone()
+        return self._row_to_client(row) if row else None
+
+    def request_stats_path(self) -> Optional[Path]:
+        return self.db_path.with_name(f"{self.db_path.stem}_{REQUEST_STATS_FILENAME}")
+
+    def change_feed_path(self) -> Optional[Path]:
+        return self.db_path.with_name(f"{self.db_path.stem}_{CHANGE_FEED_FILENAME}")
+
+    def clients_signature(self) -> Optional[Hashable]:
+        # Inclusões avançam o maior rowid; atualizações de score/limite não
+        (maior,) = self.connection().execute(SQL_MAX_CLIENT_ROWID).fetchone()
+        return maior
+
+    def estimate_client_count(self) -> Optional[int]:
+        # Sem exclusões, o maior rowid limita o número de clientes
+        (maior,) = self.connection().execute(SQL_MAX_CLIENT_ROWID).fetchone()
+        return maior or 0
+
+    def iter_clients(self, fields: Optional[Sequence[str]] = None) -> Iterator[Tuple]:
+        fields = list(fields) if fields else CLIENT_FIELDNAMES
+        invalidos = set(fields) - set(CLIENT_FIELDNAMES)
+        if invalidos:
+            raise ValueError(f"Campos inválidos: {sorted(invalidos)}")
+
+        # Cursor dedicado para que a iteração não conflite com outras consultas
+        cursor = self.connection().cursor()
+        cursor.row_factory = None
+        yield from cursor.execute(f"SELECT {', '.join(fields)} FROM clientes")
+
+    def _update_client_field(
+        self,
+        cpf: str,
+        campo: str,
+        valor: float,
+        versao_esperada: Optional[int]
+    ) -> Optional[int]:
+        """
+        Atualiza um campo; condicionada, a versão é conferida no próprio
+        UPDATE. A nova versão é lida na mesma transação.
+        """
+        conn = self.connection()
+        with conn:
+            if versao_esperada is None:
+                cursor = conn.execute(SQL_UPDATE_FIELD[campo], (valor, cpf))
+            else:
+                cursor = conn.execute(SQL_UPDATE_FIELD_IF_VERSION[campo], (valor, cpf, versao_esperada))
+            row = conn.execute(SQL_CLIENT_VERSION, (cpf,)).fetchone()
+            if cursor.rowcount == 0:
+                if row is not None:
+                    raise VersionConflictError(cpf, versao_esperada, row[0])
+                return None
+            return row[0]
+
+    def update_client_score(
+        self,
+        cpf: str,
+        novo_score: float,
+        versao_esperada: Optional[int] = None
+    ) -> Optional[int]:
+        return self._update_client_field(cpf, "score_credito", novo_score, versao_esperada)
+
+    def update_client_limit(
+        self,
+        cpf: str,
+        novo_limite: float,
+        versao_esperada: Optional[int] = None
+    ) -> Optional[int]:
+        return self._update_client_field(cpf, "limite_credito", novo_limite, versao_esperada)
+
+    def bulk_update(self, atualizacoes: Mapping[str, Mapping[str, float]]) -> List[str]:
+        lote = normalize_updates(atualizacoes)
+        nao_encontrados = []
+
+        # Uma única transação: ou todo o lote é gravado, ou nada é
+        conn = self.connection()
+        with conn:
+            for cpf, campos in lote.items():
+                if not campos:
+                    if conn.execute(SQL_CLIENT_EXISTS, (cpf,)).fetchone() is None:
+                        nao_encontrados.append(cpf)
+                    continue
+                # Nomes de coluna validados por normalize_updates
+                atribuicoes = ", ".join(f"{campo} = ?" for campo in campos)
+                cursor = conn.execute(
+                    f"UPDATE clientes SET {atribuicoes}, versao = versao + 1 WHERE cpf = ?",
+                    (*campos.values(), cpf)
+                )
+                if cursor.rowcount == 0:
+                    nao_encontrados.append(cpf)
+
+        return sorted(nao_encontrados)
+
+    def get_limit_by_score(self, score: float, produto: Optional[str] = None) -> Optional[float]:
+        row = self.connection().execute(
+            SQL_LIMIT_BY_SCORE, (produto or PRODUTO_PADRAO, score)
+        ).fetchone()
+        if row and score <= row["score_maximo"]:
+            return float(row["limite_maximo"])
+        return None
+
+    def get_score_bands(self, produto: Optional[str] = None) -> List[Tuple[float, float, float]]:
+        cursor = self.connection().execute(SQL_SCORE_BANDS, (produto or PRODUTO_PADRAO,))
+        return [tuple(row) for row in cursor]
+
+    def register_limit_request(
+        self,
+        cpf: str,
+        limite_atual: float,
+        novo_limite: float,
+        status: str,
+        timestamp: str
+    ) -> None:
+        conn = self.connection()
+        with conn:
+            conn.execute(
+                SQL_INSERT_REQUEST,
+                (cpf, timestamp, limite_atual, novo_limite, status)
+            )
+
+    def iter_requests(
+        self,
+        *,
+        cpf: Optional[str] = None,
+        status: Statuses = None,
+        inicio: Timestamp = None,
+        fim: Timestamp = None,
+        valor_min: Optional[float] = None,
+        valor_max: Optional[float] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[Dict]:
+        # Monta o WHERE apenas com os filtros informados (sempre parametrizado)
+        condicoes: List[str] = []
+        params: List = []
+        if cpf is not None:
+            condicoes.append("cpf_cliente = ?")
+            params.append(cpf)
+        statuses = status_set(status)
+        if statuses is not None:
+            condicoes.append(f"status_pedido IN ({', '.join('?' * len(statuses))})")
+            params.extend(sorted(statuses))
+        if inicio is not None:
+            condicoes.append("data_hora_solicitacao >= ?")
+            params.append(normalize_bound(inicio))
+        if fim is not None:
+            condicoes.append("data_hora_solicitacao <= ?")
+            params.append(normalize_bound(fim, fim=True))
+        if valor_min is not None:
+            condicoes.append("novo_limite_solicitado >= ?")
+            params.append(valor_min)
+        if valor_max is not None:
+            condicoes.append("novo_limite_solicitado <= ?")
+            params.append(valor_max)
+
+        sql = SQL_SELECT_REQUESTS
+        if condicoes:
+            sql += " WHERE " + " AND ".join(condicoes)
+        sql += " ORDER BY data_hora_solicitacao, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(max(limit, 0))
+
+        # Cursor dedicado; mantém o mesmo formato do CSV (valores como texto)
+        cursor = self.connection().cursor()
+        for row in cursor.execute(sql, params):
+            yield {campo: str(row[campo]) for campo in REQUEST_FIELDNAMES}
+
+    def compact_requests(self, antes_de: date) -> int:
+        corte = antes_de.isoformat()
+        # Resumos e remoção na mesma transação; o espaço liberado é
+        # reaproveitado pelas próximas inserções
+        conn = self.connection()
+        with conn:
+            conn.execute(SQL_ROLLUP_REQUESTS, (corte,))
+            conn.execute(SQL_ROLLUP_HOURS, (corte,))
+            return conn.execute(SQL_DELETE_OLD_REQUESTS, (corte,)).rowcount
+
+    def iter_request_rollups(
+        self,
+        *,
+        cpf: Optional[str] = None,
+        inicio: Timestamp = None,
+        fim: Timestamp = None
+    ) -> Iterator[Dict]:
+        condicoes: List[str] = []
+        params: List = []
+        if cpf is not None:
+            condicoes.append("cpf_cliente = ?")
+            params.append(cpf)
+        if inicio is not None:
+            condicoes.append("ultima_solicitacao >= ?")
+            params.append(normalize_bound(inicio))
+        if fim is not None:
+            condicoes.append("primeira_solicitacao <= ?")
+            params.append(normalize_bound(fim, fim=True))
+
+        sql = SQL_SELECT_ROLLUPS
+        if condicoes:
+            sql += " WHERE " + " AND ".join(condicoes)
+        sql += " ORDER BY mes, cpf_cliente, status_pedido"
+
+        cursor = self.connection().cursor()
+        for row in cursor.execute(sql, params):
+            yield dict(row)
+
+    def rollup_hourly_volume(self) -> Dict[str, int]:
+        return dict(self.connection().execute(SQL_ROLLUP_HOURLY_VOLUME).fetchall())
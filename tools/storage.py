@@ -0,0 +1,451 @@
+"""
+Interface de armazenamento do DataManager.
+Define as operações que cada engine de persistência (CSV, SQLite)
+precisa implementar e escolhe a engine a partir da configuração.
+"""
+
+import os
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from itertools import islice
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    FrozenSet,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Engine de armazenamento: "csv" (padrão) ou "sqlite"
+STORAGE_BACKEND = os.getenv("BANCO_STORAGE_BACKEND", "csv")
+
+# Caminho do banco SQLite (padrão: data/banco_agil.db)
+SQLITE_PATH = os.getenv("BANCO_SQLITE_PATH")
+
+T = TypeVar("T")
+
+# Limite de período em consultas: texto ISO 8601, date ou datetime
+Timestamp = Union[str, date, datetime, None]
+
+# Filtro de status: um status ou uma coleção de status aceitos
+Statuses = Union[str, Iterable[str], None]
+
+# Arquivo das estatísticas materializadas das solicitações
+REQUEST_STATS_FILENAME = "estatisticas.json"
+
+# Feed de alterações de clientes (um evento JSON por linha)
+CHANGE_FEED_FILENAME = "alteracoes_clientes.jsonl"
+
+# versao: contador de alterações do registro (controle otimista de
+# concorrência); arquivos sem a coluna são lidos com versão 0
+VERSION_FIELD = "versao"
+CLIENT_FIELDNAMES = [
+    "cpf",
+    "data_nascimento",
+    "nome",
+    "limite_credito",
+    "score_credito",
+    VERSION_FIELD,
+]
+
+REQUEST_FIELDNAMES = [
+    "cpf_cliente",
+    "data_hora_solicitacao",
+    "limite_atual",
+    "novo_limite_solicitado",
+    "status_pedido"
+]
+
+# Resumo das solicitações de um cliente em um mês, por status
+SUMMARY_FIELDNAMES = [
+    "mes",
+    "cpf_cliente",
+    "status_pedido",
+    "quantidade",
+    "soma_limite_atual",
+    "soma_novo_limite",
+    "primeira_solicitacao",
+    "ultima_solicitacao",
+]
+
+
+def status_set(status: Statuses) -> Optional[FrozenSet[str]]:
+    """Normaliza o filtro de status em um conjunto (None aceita todos)."""
+    if status is None:
+        return None
+    if isinstance(status, str):
+        return frozenset((status,))
+    return frozenset(status)
+
+
+class VersionConflictError(RuntimeError):
+    """Escrita condicionada a uma versão do cliente que já não é a atual."""
+
+    def __init__(self, cpf: str, esperada: int, atual: int):
+        super().__init__(f"Conflito de versão do cliente {cpf}: esperada {esperada}, atual {atual}")
+        self.cpf = cpf
+        self.esperada = esperada
+        self.atual = atual
+
+
+class StorageBackend(ABC):
+    """
+    Contrato de uma engine de armazenamento.
+
+    As implementações podem lançar exceções; o DataManager é quem as
+    captura e converte nos retornos esperados pelos agentes.
+    """
+
+    @abstractmethod
+    def authenticate_client(self, cpf: str, data_nascimento: str) -> Optional[Dict]:
+        """Retorna o cliente se CPF e data de nascimento conferem."""
+
+    @abstractmethod
+    def get_client_by_cpf(self, cpf: str) -> Optional[Dict]:
+        """Retorna o cliente com o CPF informado."""
+
+    def get_current_client(self, cpf: str) -> Optional[Dict]:
+        """
+        Busca o cliente refletindo todas as escritas já gravadas, inclusive
+        de outros processos, mesmo que a leitura precise esperar por elas.
+
+        Usado por quem vai gravar sobre os dados lidos (ex: após um
+        conflito de versão); por padrão, igual a get_client_by_cpf.
+        """
+        return self.get_client_by_cpf(cpf)
+
+    @abstractmethod
+    def iter_clients(self, fields: Optional[Sequence[str]] = None) -> Iterator[Tuple]:
+        """Percorre todos os clientes produzindo apenas os campos pedidos."""
+
+    def iter_client_frames(
+        self,
+        fields: Optional[Sequence[str]] = None,
+        chunksize: Optional[int] = None
+    ) -> Iterator["pd.DataFrame"]:
+        """
+        Percorre todos os clientes em blocos de colunas tipadas (DataFrames),
+        para processamentos em lote.
+
+        A implementação padrão agrupa as tuplas de iter_clients.
+        """
+        # Importação tardia: pandas só é carregado quando usado
+        import pandas as pd
+
+        from tools.csv_ingest import CHUNK_ROWS
+
+        fields = list(fields) if fields else CLIENT_FIELDNAMES
+        iterator = iter(self.iter_clients(fields))
+        while True:
+            bloco = list(islice(iterator, chunksize or CHUNK_ROWS))
+            if not bloco:
+                return
+            yield pd.DataFrame.from_records(bloco, columns=fields)
+
+    def client_partitions(self) -> int:
+        """Número de partições da base de clientes (ver map_client_partitions)."""
+        return 1
+
+    def map_client_partitions(
+        self,
+        func: Callable[["pd.DataFrame"], T],
+        fields: Optional[Sequence[str]] = None
+    ) -> List[T]:
+        """
+        Aplica func a cada partição da base de clientes (um DataFrame com
+        os campos pedidos) e retorna um resultado por partição.
+
+        Engines particionadas processam as partições em paralelo, uma por
+        processo: func deve ser serializável (função de módulo ou
+        functools.partial de uma). A implementação padrão trata a base
+        inteira como uma única partição.
+        """
+        import pandas as pd
+
+        fields = list(fields) if fields else CLIENT_FIELDNAMES
+        blocos = list(self.iter_client_frames(fields))
+        if not blocos:
+            blocos = [pd.DataFrame(columns=fields)]
+        return [func(pd.concat(blocos, ignore_index=True))]
+
+    def update_client_partitions(
+        self,
+        func: Callable[["pd.DataFrame"], Mapping[str, Mapping[str, float]]],
+        fields: Optional[Sequence[str]] = None
+    ) -> Dict[str, Dict[str, float]]:
+        """
+        Calcula com func as alterações de cada partição da base (no formato
+        de bulk_update) e as grava, em paralelo nas engines particionadas.
+
+        Returns:
+            Alterações gravadas {cpf: {campo: valor}}
+        """
+        from tools.client_journal import normalize_updates
+
+        alteracoes: Dict[str, Dict[str, float]] = {}
+        for parcial in self.map_client_partitions(func, fields):
+            alteracoes.update(normalize_updates(parcial))
+        nao_encontrados = set(self.bulk_update(alteracoes))
+        return {
+            cpf: campos for cpf, campos in alteracoes.items()
+            if campos and cpf not in nao_encontrados
+        }
+
+    @abstractmethod
+    def update_client_score(
+        self,
+        cpf: str,
+        novo_score: float,
+        versao_esperada: Optional[int] = None
+    ) -> Optional[int]:
+        """
+        Atualiza o score de crédito do cliente, avançando sua versão.
+
+        Returns:
+            Versão do registro após a alteração, ou None se o cliente não
+            existe
+
+        Raises:
+            VersionConflictError: Se versao_esperada for informada e o
+                registro estiver em outra versão (nada é gravado)
+        """
+
+    @abstractmethod
+    def update_client_limit(
+        self,
+        cpf: str,
+        novo_limite: float,
+        versao_esperada: Optional[int] = None
+    ) -> Optional[int]:
+        """
+        Atualiza o limite de crédito do cliente, avançando sua versão.
+
+        Returns:
+            Versão do registro após a alteração, ou None se o cliente não
+            existe
+
+        Raises:
+            VersionConflictError: Se versao_esperada for informada e o
+                registro estiver em outra versão (nada é gravado)
+        """
+
+    @abstractmethod
+    def bulk_update(self, atualizacoes: Mapping[str, Mapping[str, float]]) -> List[str]:
+        """
+        Aplica atualizações de score/limite de vários clientes atomicamente.
+
+        Args:
+            atualizacoes: Mapeamento {cpf: {campo: valor}}
+
+        Returns:
+            CPFs do lote que não foram encontrados
+        """
+
+    @abstractmethod
+    def get_limit_by_score(self, score: float, produto: Optional[str] = None) -> Optional[float]:
+        """Retorna o limite máximo permitido para o score."""
+
+    @abstractmethod
+    def get_score_bands(self, produto: Optional[str] = None) -> List[Tuple[float, float, float]]:
+        """Retorna as faixas (score_minimo, score_maximo, limite_maximo)."""
+
+    @abstractmethod
+    def register_limit_request(
+        self,
+        cpf: str,
+        limite_atual: float,
+        novo_limite: float,
+        status: str,
+        timestamp: str
+    ) -> None:
+        """Registra uma solicitação de aumento de limite."""
+
+    @abstractmethod
+    def iter_requests(
+        self,
+        *,
+        cpf: Optional[str] = None,
+        status: Statuses = None,
+        inicio: Timestamp = None,
+        fim: Timestamp = None,
+        valor_min: Optional[float] = None,
+        valor_max: Optional[float] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[Dict]:
+        """
+        Percorre as solicitações em ordem cronológica aplicando os filtros
+        durante a leitura, sem materializar o histórico.
+
+        Filtros None não restringem a consulta; valor_min/valor_max se
+        referem ao novo limite solicitado e inicio/fim são inclusivos.
+        """
+
+    def get_all_requests(self) -> List[Dict]:
+        """Retorna todas as solicitações de aumento de limite."""
+        return list(self.iter_requests())
+
+    def get_requests_by_period(
+        self,
+        inicio: Timestamp = None,
+        fim: Timestamp = None
+    ) -> List[Dict]:
+        """Retorna as solicitações feitas entre inicio e fim (inclusivos)."""
+        return list(self.iter_requests(inicio=inicio, fim=fim))
+
+    def compact_requests(self, antes_de: date) -> int:
+        """
+        Resume por cliente, mês e status as solicitações anteriores a
+        antes_de e remove as linhas originais do histórico.
+
+        Returns:
+            Número de solicitações resumidas (0 se a engine não compacta)
+        """
+        return 0
+
+    def iter_request_rollups(
+        self,
+        *,
+        cpf: Optional[str] = None,
+        inicio: Timestamp = None,
+        fim: Timestamp = None
+    ) -> Iterator[Dict]:
+        """
+        Percorre os resumos das solicitações já compactadas, em ordem de
+        (mês, CPF, status), com os valores numéricos convertidos.
+
+        inicio/fim selecionam os resumos cujo intervalo de datas se
+        sobrepõe ao período.
+        """
+        return iter(())
+
+    def rollup_hourly_volume(self) -> Dict[str, int]:
+        """Volume por hora ("AAAA-MM-DDTHH") das solicitações compactadas."""
+        return {}
+
+    def iter_request_summaries(
+        self,
+        *,
+        cpf: Optional[str] = None,
+        inicio: Timestamp = None,
+        fim: Timestamp = None
+    ) -> Iterator[Dict]:
+        """
+        Resumos por cliente, mês e status de todo o histórico: combina os
+        resumos das solicitações compactadas com as solicitações ainda
+        mantidas linha a linha.
+
+        O período é exato para as solicitações não compactadas e tem
+        granularidade de resumo (cliente/mês/status) para as compactadas.
+
+        Yields:
+            Resumos no formato de SUMMARY_FIELDNAMES, em ordem de
+            (mês, CPF, status)
+        """
+        from tools.request_rollup import add_request, merge_summaries
+
+        recentes: Dict = {}
+        for row in self.iter_requests(cpf=cpf, inicio=inicio, fim=fim):
+            add_request(recentes, row)
+        yield from merge_summaries(
+            self.iter_request_rollups(cpf=cpf, inicio=inicio, fim=fim),
+            (recentes[chave] for chave in sorted(recentes)),
+        )
+
+    def clients_signature(self) -> Optional[Hashable]:
+        """
+        Valor que muda quando o conjunto de CPFs da base muda (inclusões),
+        mas não com alterações de score ou limite. Usado pelo filtro de
+        CPFs conhecidos, que o consulta antes de rejeitar um CPF: deve ser
+        barato.
+
+        Returns:
+            Assinatura comparável, ou None se a engine não oferece uma
+            (o filtro fica desativado)
+        """
+        return None
+
+    def estimate_client_count(self) -> Optional[int]:
+        """
+        Estimativa barata (sem varrer a base) do número de clientes, usada
+        para dimensionar o filtro de CPFs conhecidos.
+
+        Returns:
+            Número aproximado de clientes, ou None se a engine não o estima
+        """
+        return None
+
+    def request_stats_path(self) -> Optional[Path]:
+        """
+        Arquivo onde ficam as estatísticas materializadas das solicitações,
+        ao lado do histórico.
+
+        Returns:
+            Caminho do arquivo, ou None para mantê-las apenas em memória
+        """
+        return None
+
+    def change_feed_path(self) -> Optional[Path]:
+        """
+        Arquivo do feed de alterações de clientes, compartilhado pelos
+        processos que usam a mesma base.
+
+        Returns:
+            Caminho do arquivo, ou None se a engine não publica alterações
+        """
+        return None
+
+    def compact(self) -> int:
+        """
+        Executa a manutenção periódica da engine, se houver.
+
+        Returns:
+            Número de registros incorporados pela manutenção
+        """
+        return 0
+
+    def close(self) -> None:
+        """Grava dados pendentes e libera os recursos da engine."""
+
+
+def create_backend(data_dir: Path, backend: Optional[str] = None) -> StorageBackend:
+    """
+    Cria a engine de armazenamento configurada.
+
+    Args:
+        data_dir: Diretório dos arquivos de dados
+        backend: Nome da engine; se omitido, usa BANCO_STORAGE_BACKEND
+
+    Returns:
+        Instância da engine escolhida
+
+    Raises:
+        ValueError: Se a engine não for reconhecida
+    """
+    backend = (backend or STORAGE_BACKEND).lower()
+
+    if backend == "csv":
+        from tools.csv_storage import CSVStorage
+        return CSVStorage(data_dir)
+
+    if backend == "sqlite":
+        from tools.sqlite_storage import SQLiteStorage
+        db_path = Path(SQLITE_PATH) if SQLITE_PATH else data_dir / "banco_agil.db"
+        return SQLiteStorage(db_path)
+
+    raise ValueError(
+        f"Engine de armazenamento '{backend}' não reconhecida. "
+        "Engines disponíveis: ['csv', 'sqlite']"
+    )